@@ -1,14 +1,50 @@
-from flask import Blueprint, jsonify, g
+from flask import Blueprint, jsonify, g, request
 import logging
+from app.config.settings import Config
 from app.middleware.auth import token_required
 from app.application.ChatService import chat_service
+from app.application.SearchService import search_service
 from app.domain.entities import Message
+from app.repository.message_repository import MessagePage
 logger = logging.getLogger("app")
 
 # Create the Blueprint
 chats_bp = Blueprint("chats", __name__, url_prefix="/chats")
 
 
+def _paging_args():
+    """
+    Reads the `since`, `before` and `limit` query parameters of the chat history
+    endpoints. Returns None when none is given, so the whole history is returned as before.
+
+    Raises:
+        ValueError: If the limit is not a positive integer.
+    """
+    since = request.args.get("since") or None
+    before = request.args.get("before") or None
+    limit = request.args.get("limit")
+    if since is None and before is None and limit is None:
+        return None
+    if limit is None:
+        limit = Config.CHAT_PAGE_MAX_MESSAGES
+    else:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    return since, before, min(limit, Config.CHAT_PAGE_MAX_MESSAGES)
+
+
+def _page_response(page: MessagePage):
+    return jsonify({
+        "data": [message.model_dump() for message in page.messages],
+        "paging": {
+            "has_more": page.has_more,
+            "prev_cursor": page.prev_cursor,
+            "next_cursor": page.next_cursor,
+        },
+    }), 200
+
+
 @chats_bp.route("/", methods=["GET"])
 @token_required
 def get_user_chats():
@@ -28,15 +64,64 @@ def get_user_chats():
             {"error": "Ocurrió un error inesperado al obtener los chats."}
         ), 500
 
+@chats_bp.route("/search", methods=["GET"])
+@token_required
+def search_messages():
+    """
+    Search the messages of the current user's chats, ignoring case and accents.
+
+    Query parameters: `q` (required), `chat_id` to search a single chat, and `limit`
+    and `offset` to paginate the results, which come best match first.
+    """
+    try:
+        current_user_id = g.current_user.id
+        text = request.args.get("q", "").strip()
+        if not text:
+            return jsonify({"error": "Se requiere el parámetro q."}), 400
+        try:
+            limit = min(int(request.args.get("limit", 20)), Config.SEARCH_PAGE_MAX_RESULTS)
+            offset = int(request.args.get("offset", 0))
+            if limit < 1 or offset < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "Parámetros de paginación inválidos."}), 400
+
+        chat_id = request.args.get("chat_id") or None
+        page = search_service.search_messages(current_user_id, text, chat_id, limit, offset)
+        if page is None:
+            return jsonify({"error": "No tienes permiso para acceder a este chat."}), 403
+        return jsonify({
+            "data": page["results"],
+            "paging": {"total": page["total"], "limit": limit, "offset": offset},
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error searching messages for user {g.current_user.id}: {e}", exc_info=True)
+        return jsonify({"error": "Ha ocurrido un error inesperado"}), 500
+
+
 @chats_bp.route("/user/<target_user_id>", methods=["GET"])
 @token_required
 def get_chat_by_user_id(target_user_id: str):
     """
     Get all messages for a specific chat, sorted by timestamp.
     The user must be a participant in the chat to access its messages.
+
+    With `since=<cursor>`, `before=<cursor>` and/or `limit=N`, only that window of the
+    history is returned, along with the cursors to continue from.
     """
     try:
         current_user_id = g.current_user.id
+        try:
+            paging = _paging_args()
+        except ValueError:
+            return jsonify({"error": "Parámetros de paginación inválidos."}), 400
+        if paging is not None:
+            chat = chat_service.chat_repository.find_chat_by_users(current_user_id, target_user_id)
+            if not chat:
+                return jsonify({"data": [], "paging": {"has_more": False, "prev_cursor": None, "next_cursor": None}}), 200
+            return _page_response(chat_service.load_chat_page(chat, current_user_id, *paging))
+
         messages = chat_service.find_chat_by_user_ids(current_user_id, target_user_id)
         if messages is None:
             return jsonify({"data": []}), 200
@@ -44,6 +129,9 @@ def get_chat_by_user_id(target_user_id: str):
         messages_dict = [message.model_dump() for message in messages]
         return jsonify({"data": messages_dict}), 200
         
+    except ValueError as e:
+        # Cursor mal formado
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"server error: {e}")
         return jsonify({"error": "Ha ocurrido un error inesperado"}), 500
@@ -55,9 +143,15 @@ def get_chat_messages(chat_id):
     """
     Get all messages for a specific chat, sorted by timestamp.
     The user must be a participant in the chat to access its messages.
+
+    Accepts the same `since`, `before` and `limit` parameters as /chats/user/<id>.
     """
     try:
         current_user_id = g.current_user.id
+        try:
+            paging = _paging_args()
+        except ValueError:
+            return jsonify({"error": "Parámetros de paginación inválidos."}), 400
         
         # Verify the user is part of this chat
         chat = chat_service.chat_repository.find_by_id(chat_id)
@@ -70,10 +164,16 @@ def get_chat_messages(chat_id):
             logger.warning(f"User {current_user_id} attempted to access chat {chat_id} without permission.")
             return jsonify({"error": "No tienes permiso para acceder a este chat."}), 403
         
+        if paging is not None:
+            return _page_response(chat_service.load_chat_page(chat, current_user_id, *paging))
+
         messages: list[Message] = chat_service.load_chat_msgs(chat, current_user_id)
         messages_dict = [message.model_dump() for message in messages]
         return jsonify({"data": messages_dict }), 200
         
+    except ValueError as e:
+        # Cursor mal formado
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"server error: {e}")
         return jsonify({"error": "Ha ocurrido un error inesperado"})
@@ -1,8 +1,17 @@
-from flask import Blueprint
+from flask import Blueprint, jsonify
+from app.infraestructure.snapshot_cache import snapshot_cache
 
 routes_health = Blueprint("health", __name__)
 
 
 @routes_health.route('/')
 def health_check():
-    return "Api Funcionando en Flask!!"
\ No newline at end of file
+    return "Api Funcionando en Flask!!"
+
+
+@routes_health.route('/cache')
+def cache_stats():
+    """
+    Returns the hit/miss counters of the decrypted snapshot cache.
+    """
+    return jsonify({"data": snapshot_cache.stats()}), 200
@@ -1,6 +1,7 @@
 import logging
 from flask import Blueprint, jsonify, request, g
 from app.application.PostService import post_service
+from app.config.settings import Config
 from app.middleware.auth import token_required
 
 logger = logging.getLogger("app")
@@ -14,12 +15,45 @@ def get_posts():
     """
     Get all posts for the feed, enriched with user and tag information.
     Optionally filters posts by tag_id if a 'filter=tag_id' query parameter is provided.
+    With 'limit=N' (and 'before=<timestamp,id>' from the previous page), only one page
+    of the feed is returned, along with the cursor of the next one.
+    With 'order=relevance', the feed is ordered for the current user instead of by date,
+    and paged with 'limit' and 'offset'.
     Requires a valid token.
     """
     try:
+        if request.args.get('order') == 'relevance':
+            try:
+                limit = min(int(request.args.get('limit', 20)), Config.FEED_PAGE_MAX_POSTS)
+                offset = int(request.args.get('offset', 0))
+                if limit < 1 or offset < 0:
+                    raise ValueError("invalid page")
+            except ValueError:
+                return jsonify({"error": "Parámetros de paginación inválidos."}), 400
+            entries, has_more = post_service.get_ranked_feed(g.current_user, limit, offset)
+            return jsonify({
+                "data": entries,
+                "paging": {"has_more": has_more, "limit": limit, "offset": offset},
+            }), 200
+
         tag_id_filter = request.args.get('filter')
-        feed = post_service.get_all_posts_for_feed(tag_id=tag_id_filter)
-        return jsonify({"data": feed}), 200
+        before = request.args.get('before') or None
+        limit = request.args.get('limit')
+        if limit is None and before is None:
+            feed = post_service.get_all_posts_for_feed(tag_id=tag_id_filter)
+            return jsonify({"data": feed}), 200
+
+        try:
+            limit = Config.FEED_PAGE_MAX_POSTS if limit is None else int(limit)
+            if limit < 1:
+                raise ValueError("limit must be positive")
+            page = post_service.get_feed_page(tag_id_filter, before, min(limit, Config.FEED_PAGE_MAX_POSTS))
+        except ValueError:
+            return jsonify({"error": "Parámetros de paginación inválidos."}), 400
+        return jsonify({
+            "data": page.entries,
+            "paging": {"has_more": page.has_more, "next_cursor": page.next_cursor},
+        }), 200
     except Exception as e:
         logger.error(f"Error retrieving posts for feed: {e}", exc_info=True)
         return jsonify({"error": "Ocurrió un error inesperado al obtener las publicaciones."}), 500
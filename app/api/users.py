@@ -3,6 +3,7 @@ import logging
 from pydantic import ValidationError
 from app.application.LoginService import login_service
 from app.application.UserService import user_service
+from app.config.settings import Config
 from app.domain.exceptions import (
     UserAlreadyExistsException,
     InvalidCredentialsException,
@@ -15,13 +16,61 @@ logger = logging.getLogger("app")
 users_bp = Blueprint("users", __name__, url_prefix="/users")
 
 
+_LIST_PARAMS = ("fields", "career", "tag_ids", "is_active", "after", "limit")
+
+
+def _csv_arg(name: str) -> list:
+    value = request.args.get(name)
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def _list_users_args() -> dict:
+    """
+    Reads the projection, filter and paging query parameters of GET /users.
+
+    Raises:
+        ValueError: If is_active is not a boolean or the limit is not a positive integer.
+    """
+    is_active = request.args.get("is_active")
+    if is_active is not None:
+        if is_active.lower() not in ("true", "false"):
+            raise ValueError("is_active must be true or false")
+        is_active = is_active.lower() == "true"
+    limit = int(request.args.get("limit", 20))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return {
+        "fields": _csv_arg("fields"),
+        "career": request.args.get("career") or None,
+        "tag_ids": _csv_arg("tag_ids"),
+        "is_active": is_active,
+        "after": request.args.get("after") or None,
+        "limit": min(limit, Config.USERS_PAGE_MAX),
+    }
+
+
 @users_bp.route("/", methods=["GET"])
 @token_required
 def get_all_users():
     """
     Get all users from the database. Requires a valid token.
+    With any of 'fields', 'career', 'tag_ids', 'is_active', 'after' or 'limit', only one
+    page of users (ordered by id) is returned, along with the cursor of the next one:
+    'fields' (comma separated, default id,name,avatar_url,career) selects the attributes
+    of each user, 'tag_ids' (comma separated) keeps the users having all of those tags,
+    and 'after' is the cursor of the previous page.
     """
     try:
+        if any(name in request.args for name in _LIST_PARAMS):
+            try:
+                users, next_cursor = user_service.list_users(**_list_users_args())
+            except ValueError:
+                return jsonify({"error": "Parámetros de consulta inválidos."}), 400
+            return jsonify({
+                "data": users,
+                "paging": {"has_more": next_cursor is not None, "next_cursor": next_cursor},
+            }), 200
+
         # The `current_user` is attached to `g` by the `@token_required` decorator.
         # We can add logic here, e.g., to check if g.current_user is an admin.
         # For now, we just proceed.
@@ -35,6 +84,29 @@ def get_all_users():
         ), 500
 
 
+@users_bp.route("/recommendations", methods=["GET"])
+@token_required
+def get_recommendations():
+    """
+    Get the users with the most interests (tags and career) in common with the current
+    user, best match first. Accepts 'limit' (default 20). Requires a valid token.
+    """
+    try:
+        try:
+            limit = int(request.args.get("limit", 20))
+            if limit < 1:
+                raise ValueError("limit must be positive")
+        except ValueError:
+            return jsonify({"error": "Parámetros de paginación inválidos."}), 400
+        recommendations = user_service.get_recommendations(g.current_user, limit)
+        return jsonify({"data": recommendations}), 200
+    except Exception as e:
+        logger.error(f"Error retrieving recommendations for user {g.current_user.id}: {e}", exc_info=True)
+        return jsonify(
+            {"error": "Ocurrió un error inesperado al obtener recomendaciones."}
+        ), 500
+
+
 @users_bp.route("/me", methods=["GET", "PUT"])
 @token_required
 def get_current_user():
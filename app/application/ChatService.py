@@ -1,18 +1,22 @@
 from app.repository.user_repository import UserRepository
 from app.repository.chat_repository import ChatRepository
-from app.repository.message_repository import MessageRepository
-from app.infraestructure.file_service import FileManager
-from app.infraestructure.encription_service import EncryptionManager
+from app.repository.message_repository import MessagePage, MessageRepository
+from app.repository.pending_delivery_repository import PendingDeliveryRepository
 from app.application.UserService import UserService
+from app.application.PresenceService import PresenceService
+from app.container import provide
+from app.config.settings import Config
 from app.domain.entities import Chat, Message, User
 from flask_socketio import join_room, emit, send
 from app.extensions import socketio
 from datetime import datetime
 import logging
-from app.repository.tag_repository import TagRepository
 
 logger = logging.getLogger('app')
 
+# Characters of the last message kept in the chat summary shown in the inbox
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
 
 class ChatService:
     """
@@ -25,6 +29,8 @@ class ChatService:
         chatRepository: ChatRepository,
         messageRepository: MessageRepository,
         user_service: UserService,
+        presence_service: PresenceService,
+        pending_delivery_repository: PendingDeliveryRepository,
     ) -> None:
         """
         Initializes the ChatService with necessary repositories and services.
@@ -34,43 +40,53 @@ class ChatService:
             chatRepository: The repository for chat data.
             messageRepository: The repository for message data.
             user_service: The service for user-related operations.
+            presence_service: The service tracking which users are online.
+            pending_delivery_repository: The queues of messages for offline users.
         """
         self.user_repository = userRepository
         self.chat_repository = chatRepository
         self.message_repository = messageRepository
         self.user_service = user_service
+        self.presence_service = presence_service
+        self.pending_delivery_repository = pending_delivery_repository
 
     # ----------- Main socket event handlers ------------------
-    def manage_connection(self, user_id: str):
+    def manage_connection(self, user_id: str, session_id: str):
         """
         Manages a new user connection by joining them to a personal room
-        and updating their status to 'online'.
+        and registering the session, which sets them 'online'.
 
         Args:
             user_id: The ID of the user connecting.
+            session_id: The ID of the socket session.
         """
         # Each user joins a room named after their own user_id.
         join_room(user_id)
 
-        # Setting up online the user
-        self.user_service.set_user_status(user_id, True)
-        logger.info(f"Setting user with id {user_id} to online")
+        # Setting up online the user (persisted in the background)
+        if self.presence_service.connect(user_id, session_id):
+            logger.info(f"Setting user with id {user_id} to online")
 
         # Notifing a successful connection:
         send("Connected to server successfully and joined personal room.")
 
-    def manage_disconnection(self, user_id: str | None):
+        # Messages received while offline arrive in a single event
+        self._send_pending_notifications(user_id)
+
+    def manage_disconnection(self, user_id: str | None, session_id: str):
         """
-        Manages a user disconnection by updating their status to 'offline'.
+        Manages a user disconnection by closing the session. The user goes
+        'offline' when their last session is closed.
 
         Args:
             user_id: The ID of the user disconnecting. Can be None if the
             user was not authenticated.
+            session_id: The ID of the socket session.
         """
         if user_id:
             logger.info(f"User with ID {user_id} is disconnecting...")
-            # Setting offline the user
-            self.user_service.set_user_status(user_id, False)
+            # Setting offline the user if it was its last session
+            self.presence_service.disconnect(user_id, session_id)
         else:
             logger.info("An anonymous user is disconnecting.")
 
@@ -94,15 +110,8 @@ class ChatService:
             return
 
         # Check if a chat already exists between these two users
-        chat = self.chat_repository.find_chat_by_users(user_a_id, user_b_id)
-
-        if not chat:
-            # Chat does not exist, create a new one
-            chat = Chat(user_a=user_a_id, user_b=user_b_id)
-            self.chat_repository.add(chat)
-            logger.info(
-                f"New chat {chat.id} created between {user_a.id} and {user_b.id}"
-            )
+        existing_chat = self.chat_repository.find_chat_by_users(user_a_id, user_b_id)
+        chat = existing_chat or Chat(user_a=user_a_id, user_b=user_b_id)
 
         # Create and save the first message
         first_message = Message(
@@ -114,6 +123,18 @@ class ChatService:
         )
         self.message_repository.add(first_message)
         logger.info(f"First message for chat {chat.id} saved.")
+
+        if existing_chat:
+            chat = self.chat_repository.modify(
+                chat.id, lambda stored: self._record_message(stored, first_message)
+            ) or chat
+        else:
+            # Chat does not exist, create a new one with its summary already filled
+            self._record_message(chat, first_message)
+            self.chat_repository.add(chat)
+            logger.info(
+                f"New chat {chat.id} created between {user_a.id} and {user_b.id}"
+            )
         # Notifying the reciever
         self._send_notification(user_a, chat, user_b, first_message)
 
@@ -127,42 +148,73 @@ class ChatService:
             chat_id: The ID of the chat the message belongs to.
             content: The content of the message.
         """
+        # No UnitOfWork here: it writes each repository with its own save_changes, so it
+        # would not make the message and the chat summary atomic either, and it would
+        # overwrite the summary blindly. The message is written first and the summary is
+        # then updated under the chat's write lock, so messages sent at the same time by
+        # both participants do not overwrite each other's counters
         chat = self.chat_repository.find_by_id(chat_id)
-
         if not chat:
             emit("server_error", {"msg": "El chat no fue encontrado"}, to=user_id)
             logger.error(
                 f"User {user_id} attempted to join non-existent chat {chat_id}."
             )
             return
-        # Update the last_message_at timestamp of the chat
-        chat.last_message_at = datetime.now()
-        self.chat_repository.update(chat)
-        # Create the new message
-        new_message = Message(
-            conversation_id=chat_id, sender_id=user_id, content=content, delivered=False
-        )
-        self.message_repository.add(new_message)
         sender = self.user_repository.find_by_id(user_id)
         reciever = self.user_repository.find_by_id(
             chat.user_a if chat.user_a != user_id else chat.user_b
         )
         if not sender or not reciever:
-            # One of the users was not found
+            # One of the users was not found, nothing is stored
             logger.warning(
                 "Attempted to send dm but users not found"
             )
             return
+        # Create the new message
+        new_message = Message(
+            conversation_id=chat_id, sender_id=user_id, content=content, delivered=False
+        )
+        self.message_repository.add(new_message)
+        chat = self.chat_repository.modify(
+            chat_id, lambda stored: self._record_message(stored, new_message)
+        ) or chat
         self._send_notification(sender, chat, reciever, new_message)
 
 
     # ----------- Helper functions ------------------
+
+    @staticmethod
+    def _record_message(chat: Chat, message: Message) -> None:
+        """
+        Updates the materialized summary of a chat with a new message: its preview and
+        time, and the unread counter of the participant who did not send it.
+
+        Args:
+            chat: The chat to update in place.
+            message: The message just sent.
+        """
+        chat.last_message_at = message.timestamp
+        chat.last_message_preview = message.content[:LAST_MESSAGE_PREVIEW_LENGTH]
+        recipient_id = chat.user_b if message.sender_id == chat.user_a else chat.user_a
+        chat.unread_counts[recipient_id] = chat.unread_counts.get(recipient_id, 0) + 1
     
+    @staticmethod
+    def _notification(sender: User, message: Message) -> dict:
+        return {
+            "chat_id": message.conversation_id,
+            "sender_id": sender.id,
+            "sender_name": sender.name,
+            "message": message.content,
+            "message_id": message.id,
+            "timestamp": message.timestamp.isoformat(),
+        }
+
     def _send_notification(
         self, sender: User, chat: Chat, reciever: User, message: Message
     ):
         """
-        Sends a real-time notification to a user about a new message.
+        Sends a real-time notification to a user about a new message. If the user is
+        offline, the message is queued and notified when they connect again.
 
         Args:
             sender: The user who sent the message.
@@ -170,20 +222,42 @@ class ChatService:
             reciever: The user who should receive the notification.
             message: The message that was sent.
         """
+        # Solo cuentan las sesiones abiertas: el is_active guardado puede quedar atrasado
+        if not self.presence_service.is_online(reciever.id):
+            logger.info(f"User {reciever.id} is offline, queueing message {message.id}")
+            self.pending_delivery_repository.enqueue(
+                reciever.id, chat.id, message.id, message.timestamp, Config.OFFLINE_QUEUE_MAX_MESSAGES
+            )
+            return
         logger.info(f"Sending dm to {reciever.name} from: {sender.name}")
-        timestamp_str = message.timestamp.isoformat()
-        socketio.emit(
-            "new_notification",
-            {
-                "chat_id": chat.id,
-                "sender_id": sender.id,
-                "sender_name": sender.name,
-                "message": message.content,
-                "message_id": message.id,
-                "timestamp": timestamp_str
-            },
-            to=reciever.id,
-        )
+        socketio.emit("new_notification", self._notification(sender, message), to=reciever.id)
+
+    def _send_pending_notifications(self, user_id: str) -> None:
+        """
+        Sends the messages queued while a user was offline that are still undelivered,
+        oldest first, in a single notifications_batch event. The queue is only emptied once
+        the event was emitted, so the messages stay queued if it fails.
+
+        Args:
+            user_id: The ID of the user connecting.
+        """
+        queued = self.pending_delivery_repository.peek(user_id)
+        if not queued:
+            return
+        # Los mensajes que ya se leyeron por REST quedaron marcados como entregados
+        messages = [
+            message for message in self.message_repository.find_by_ids(queued).values()
+            if not message.delivered
+        ]
+        senders = self.user_repository.find_by_ids(list({message.sender_id for message in messages}))
+        messages.sort(key=lambda message: message.timestamp)
+        notifications = [
+            self._notification(senders[message.sender_id], message)
+            for message in messages if message.sender_id in senders
+        ]
+        if notifications:
+            emit("notifications_batch", {"notifications": notifications})
+        self.pending_delivery_repository.acknowledge(user_id, queued)
 
 
     def get_chats_for_user(self, user_id: str) -> list:
@@ -200,9 +274,16 @@ class ChatService:
         chats = self.chat_repository.find_all_by_user(user_id)
         response = []
 
+        # Users of every chat are loaded at once; unread counts and the last message come
+        # from the summary kept in each chat, so the messages store is not read at all
+        other_user_ids = {
+            chat.id: chat.user_b if chat.user_a == user_id else chat.user_a for chat in chats
+        }
+        other_users = self.user_repository.find_by_ids(list(other_user_ids.values()))
+
         for chat in chats:
-            other_user_id = chat.user_b if chat.user_a == user_id else chat.user_a
-            other_user = self.user_repository.find_by_id(other_user_id)
+            other_user_id = other_user_ids[chat.id]
+            other_user = other_users.get(other_user_id)
 
             if not other_user:
                 logger.warning(
@@ -210,17 +291,13 @@ class ChatService:
                 )
                 continue
 
-            unread_count = self.message_repository.count_unread_by_chat(
-                chat.id, user_id
-            )
-            
-            last_message = self.message_repository.find_last_by_conversation_id(chat.id)
-            
+            unread_count = chat.unread_counts.get(user_id, 0)
+
             last_message_data = None
-            if last_message:
+            if chat.last_message_preview is not None:
                 last_message_data = {
-                    "content": last_message.content,
-                    "timestamp": last_message.timestamp.isoformat()
+                    "content": chat.last_message_preview,
+                    "timestamp": chat.last_message_at.isoformat()
                 }
 
             response.append(
@@ -230,8 +307,9 @@ class ChatService:
                     "other_user": {
                         "id": other_user.id,
                         "name": other_user.name,
-                        "is_active": other_user.is_active,
-                            "avatar_url": other_user.avatar_url,
+                        # From the open sessions of every worker, not the stored flag
+                        "is_active": self.presence_service.is_online(other_user.id),
+                        "avatar_url": other_user.avatar_url,
                     },
                     "unread_messages": unread_count,
                     "last_message": last_message_data,
@@ -265,14 +343,65 @@ class ChatService:
         messages = self.message_repository.find_by_conversation_id(chat.id)
         current_user_id = user.id if isinstance(user, User) else user
 
-        for message in messages:
-            if message.sender_id != current_user_id and not message.delivered:
-                message.delivered = True
-                self.message_repository.update(message)
+        # Received messages are marked as delivered with a single write
+        undelivered = [
+            message for message in messages
+            if message.sender_id != current_user_id and not message.delivered
+        ]
+        self._mark_read(chat, current_user_id, undelivered)
 
+        for message in messages:
             if isinstance(message.timestamp, datetime):
                 message.timestamp = message.timestamp.isoformat()
         return messages
+
+    def load_chat_page(self, chat: Chat, user: User | str, since: str | None = None,
+                       before: str | None = None, limit: int | None = None) -> MessagePage:
+        """
+        Loads a window of the messages of a chat by cursor (see MessageRepository.find_page)
+        and, like load_chat_msgs, marks the received ones as delivered.
+
+        Only the undelivered messages are read besides the page, so syncing an open chat
+        costs the size of what changed instead of the whole history.
+
+        Args:
+            chat (Chat): The chat to read.
+            user (User | str): The user reading it.
+            since (str, optional): Cursor of the newest message the client already has.
+            before (str, optional): Cursor of the oldest message the client already has.
+            limit (int, optional): The maximum number of messages.
+
+        Returns:
+            MessagePage: The page, with its timestamps in ISO format.
+
+        Raises:
+            ValueError: If a cursor is malformed.
+        """
+        page = self.message_repository.find_page(chat.id, since=since, before=before, limit=limit)
+        current_user_id = user.id if isinstance(user, User) else user
+
+        undelivered = self.message_repository.query(
+            'conversation_id == ? & sender_id != ? & delivered == ?', chat.id, current_user_id, False
+        )
+        self._mark_read(chat, current_user_id, undelivered)
+
+        delivered_ids = {message.id for message in undelivered}
+        for message in page.messages:
+            if message.id in delivered_ids:
+                message.delivered = True
+            if isinstance(message.timestamp, datetime):
+                message.timestamp = message.timestamp.isoformat()
+        return page
+
+    def _mark_read(self, chat: Chat, user_id: str, undelivered: list[Message]) -> None:
+        for message in undelivered:
+            message.delivered = True
+        if undelivered:
+            self.message_repository.update_many(undelivered)
+        if undelivered or chat.unread_counts.get(user_id):
+            self.chat_repository.modify(
+                chat.id, lambda stored: stored.unread_counts.pop(user_id, None)
+            )
     
     def get_all(self):
         chats = self.chat_repository.find_all()
@@ -281,15 +410,5 @@ class ChatService:
 
 
 
-# Initialize dependencies for the ChatService
-file_manager = FileManager()
-encryption_manager = EncryptionManager()
-user_repository = UserRepository(file_manager, encryption_manager)
-chat_repository = ChatRepository(file_manager, encryption_manager)
-message_repository = MessageRepository(file_manager, encryption_manager)
-tag_repository = TagRepository(file_manager, encryption_manager)
-user_service = UserService(user_repository, tag_repository)
-
-chat_service = ChatService(
-    user_repository, chat_repository, message_repository, user_service
-)
+# Built by the container on first use
+chat_service: ChatService = provide('chat_service')
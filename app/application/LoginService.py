@@ -1,8 +1,6 @@
 import logging
 import jwt
 from datetime import datetime, timedelta
-from app.infraestructure.encription_service import EncryptionManager
-from app.infraestructure.file_service import FileManager
 from app.repository.user_repository import UserRepository
 from app.domain.entities import User
 from app.utils.hashing import verify_password
@@ -11,14 +9,17 @@ from app.domain.exceptions import (
     InvalidCredentialsException,
 )
 from app.config.settings import Config
-from app.application.UserService import user_service, UserService
+from app.application.UserService import UserService
+from app.application.PresenceService import PresenceService
+from app.container import provide
 
 logger = logging.getLogger('app')
 
 class LoginService:
-    def __init__(self, user_repository: UserRepository, user_service: UserService):
+    def __init__(self, user_repository: UserRepository, user_service: UserService, presence_service: PresenceService):
         self.user_repository = user_repository
         self.user_service = user_service
+        self.presence_service = presence_service
 
     def _create_access_token(self, user_id: str) -> str:
         """
@@ -69,8 +70,8 @@ class LoginService:
             logger.warning(f"Login failed for user '{email}': incorrect password.")
             raise InvalidCredentialsException()
 
-        # Setting user status as active
-        self.user_service.set_user_status(user.id, True)
+        # Setting user status as active (written with the next presence flush)
+        self.presence_service.mark_active(user.id)
         
         logger.info(f"User '{email}' logged in successfully.")
         
@@ -79,8 +80,5 @@ class LoginService:
 
 
 
-# Initialize dependencies for the LoginService
-file_manager = FileManager()
-encryption_manager = EncryptionManager()
-user_repository = UserRepository(file_manager, encryption_manager)
-login_service = LoginService(user_repository, user_service)
+# Built by the container on first use
+login_service: LoginService = provide('login_service')
@@ -3,9 +3,10 @@ from typing import List, Dict, Any
 from app.repository.post_repository import PostRepository
 from app.repository.user_repository import UserRepository
 from app.repository.tag_repository import TagRepository
-from app.domain.entities import Post
-from app.infraestructure.encription_service import EncryptionManager
-from app.infraestructure.file_service import FileManager
+from app.repository.post_feed import FeedPage, PostFeed
+from app.application.ranking import FeedRanker
+from app.domain.entities import Post, User
+from app.container import provide
 logger = logging.getLogger(__name__)
 
 
@@ -15,57 +16,50 @@ class PostService:
         post_repository: PostRepository,
         user_repository: UserRepository,
         tag_repository: TagRepository,
+        post_feed: PostFeed,
+        feed_ranker: FeedRanker,
     ):
         self.post_repository = post_repository
         self.user_repository = user_repository
         self.tag_repository = tag_repository
+        self.post_feed = post_feed
+        self.feed_ranker = feed_ranker
 
     def get_all_posts_for_feed(self, tag_id: str | None = None ) -> List[Dict[str, Any]]:
         """
-        Retrieves all posts and enriches them with user and tag information for the feed.
-        If a tag_id is provided, it filters the posts by that tag.
+        Retrieves all posts enriched with user and tag information for the feed, newest
+        first. If a tag_id is provided, it filters the posts by that tag.
+
+        The entries come from the materialized feed, already joined and sorted, which is
+        kept up to date as posts and profiles change.
         """
         logger.info("Retrieving all posts for the feed.")
         if tag_id:
             logger.info(f"Filtering posts by tag_id: {tag_id}")
-            posts = self.post_repository.find_many_by_attribute('tag_id', tag_id)
-        else:
-            posts = self.post_repository.find_all()
-
-        users = self.user_repository.find_all()
-        tags = self.tag_repository.find_all()
+        return self.post_feed.entries(tag_id or None)
 
-        user_map = {user.id: user for user in users}
-        tag_map = {tag.id: tag for tag in tags}
-
-        feed = []
-        for post in posts:
-            user = user_map.get(post.user_id)
-            tag = tag_map.get(post.tag_id)
+    def get_feed_page(self, tag_id: str | None = None, before: str | None = None, limit: int = 20) -> FeedPage:
+        """
+        Retrieves a page of the feed, newest first, starting after the `before` cursor
+        (the next_cursor of the previous page). If a tag_id is provided, only the posts of
+        that tag are paged, from its own sorted posting list.
 
-            if user and tag:
-                feed.append(
-                    {
-                        "id": post.id,
-                        "description": post.description,
-                        "timestamp": post.timestamp,
-                        "user": {
-                            "id": user.id,
-                            "name": user.name,
-                            "career": user.career,
-                            "avatar_url": user.avatar_url,
-                        },
-                        "tag": {
-                            "id": tag.id,
-                            "name": tag.name,
-                        },
-                    }
-                )
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        logger.info(f"Retrieving a page of {limit} posts for the feed (tag_id: {tag_id}).")
+        return self.post_feed.page(tag_id or None, before, limit)
 
-        # Sort feed by timestamp, newest first
-        feed.sort(key=lambda x: x["timestamp"], reverse=True)
+    def get_ranked_feed(self, viewer: User, limit: int = 20, offset: int = 0) -> tuple[List[Dict[str, Any]], bool]:
+        """
+        Retrieves a page of the feed ordered by relevance to the viewer: posts of the tags
+        they follow and of authors sharing their tags first, newer posts before older ones.
 
-        return feed
+        Returns:
+            tuple: The entries of the page, and whether more ranked posts follow.
+        """
+        logger.info(f"Retrieving the ranked feed of user {viewer.id}.")
+        return self.feed_ranker.rank(viewer, limit, offset)
 
     def create_post(self, user_id: str, tag_id: str, description: str) -> Post:
         """
@@ -95,11 +89,5 @@ class PostService:
         return self.post_repository.delete(post_id)
 
 
-# Dependency-injected instance of the service
-
-file_manager = FileManager()
-encryption_manager = EncryptionManager()
-tag_repository = TagRepository(file_manager, encryption_manager)
-user_repository = UserRepository(file_manager, encryption_manager)
-post_repository = PostRepository(file_manager, encryption_manager)
-post_service = PostService(post_repository, user_repository, tag_repository)
+# Dependency-injected instance of the service, built by the container on first use
+post_service: PostService = provide('post_service')
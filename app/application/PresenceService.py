@@ -0,0 +1,299 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from app.container import provide
+from app.repository.presence_repository import PresenceRepository
+from app.repository.user_repository import UserRepository
+from app.repository.write_behind import FlushScheduler
+
+logger = logging.getLogger('app')
+
+
+class PresenceService:
+    """
+    Tracks which users are online from their open socket sessions, kept in memory.
+
+    A user is online while at least one of their sessions (one per tab or device) is open,
+    so connecting a second tab or closing one of two does not change their status. The
+    `is_active` flag of the stored users follows the in-memory state, but only the latest
+    status of each user is written, in one bulk update per flush interval, instead of
+    rewriting the users file on every connect and disconnect.
+
+    With several workers, each one publishes its online users to the presence repository
+    when they change, and touches its heartbeat every third of the worker TTL. A user is
+    online while any
+    live worker has a session of them, so closing the session on one worker does not set
+    `is_active=False` while another one still holds a session. The sessions of other
+    workers are seen once they flush, and those of a worker that stops publishing are
+    dropped after the worker TTL.
+
+    Sessions that stop sending heartbeats for longer than the session TTL are expired, so a
+    client that vanished without a disconnect event does not stay online forever.
+    """
+    def __init__(self, user_repository: UserRepository, presence_repository: PresenceRepository,
+                 flush_interval_ms: int = 2000, session_ttl_seconds: int = 0, worker_ttl_seconds: int = 30):
+        """
+        Args:
+            user_repository: The repository where `is_active` is persisted.
+            presence_repository: The repository shared by the workers to publish their users.
+            flush_interval_ms (int): How long status changes are coalesced before writing them.
+            session_ttl_seconds (int): Seconds without a heartbeat before a session expires.
+                0 disables the expiry.
+            worker_ttl_seconds (int): Seconds after which the users published by a worker
+                that stopped refreshing them are no longer online.
+        """
+        self.user_repository = user_repository
+        self.presence_repository = presence_repository
+        self.flush_interval_ms = flush_interval_ms
+        self.session_ttl_seconds = session_ttl_seconds
+        self.worker_ttl_seconds = worker_ttl_seconds
+        self.worker_id = str(uuid.uuid4())
+        self._lock = threading.Lock()
+        # user_id -> {session_id: momento del ultimo heartbeat}
+        self._sessions: Dict[str, Dict[str, float]] = {}
+        # user_id -> ultimo estado aun no escrito
+        self._pending: Dict[str, bool] = {}
+        # Ultimo conjunto de usuarios publicado, para no reescribirlo si no cambio
+        self._published: Optional[frozenset] = None
+        self._scheduler: Optional[FlushScheduler] = None
+        self._sweeper: Optional[threading.Thread] = None
+
+    # ----------- Sessions ------------------
+
+    def connect(self, user_id: str, session_id: str) -> bool:
+        """
+        Registers an open session of a user.
+
+        Returns:
+            bool: True if the user was offline and is now online.
+        """
+        with self._lock:
+            sessions = self._sessions.setdefault(user_id, {})
+            came_online = not sessions
+            sessions[session_id] = time.monotonic()
+            if came_online:
+                self._pending[user_id] = True
+        if came_online:
+            self._notify()
+        return came_online
+
+    def disconnect(self, user_id: str, session_id: str) -> bool:
+        """
+        Closes a session of a user. Unknown sessions are ignored.
+
+        Returns:
+            bool: True if it was the last session and the user is now offline.
+        """
+        with self._lock:
+            went_offline = self._close(user_id, session_id)
+        if went_offline:
+            self._notify()
+        return went_offline
+
+    def heartbeat(self, user_id: str, session_id: str) -> bool:
+        """
+        Renews the TTL of a session.
+
+        Returns:
+            bool: True if the session is open, False if it was unknown or already expired.
+        """
+        with self._lock:
+            sessions = self._sessions.get(user_id)
+            if not sessions or session_id not in sessions:
+                return False
+            sessions[session_id] = time.monotonic()
+        return True
+
+    def mark_active(self, user_id: str) -> None:
+        """
+        Queues `is_active=True` for a user without opening a session (e.g. on login).
+        """
+        with self._lock:
+            self._pending[user_id] = True
+        self._notify()
+
+    def is_online(self, user_id: str) -> bool:
+        """
+        Returns whether the user has an open session in this process or in another live
+        worker (as of its last flush).
+        """
+        return user_id in self._sessions or self._online_elsewhere(user_id)
+
+    def _online_elsewhere(self, user_id: str) -> bool:
+        workers = self.presence_repository.find_workers_of(user_id, self._live_since())
+        return any(worker.id != self.worker_id for worker in workers)
+
+    def _live_since(self) -> datetime:
+        return datetime.now() - timedelta(seconds=self.worker_ttl_seconds)
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """
+        Closes the sessions whose last heartbeat is older than the TTL.
+
+        Args:
+            now (float, optional): Current time.monotonic() value, for tests.
+
+        Returns:
+            List[str]: The users that went offline.
+        """
+        if self.session_ttl_seconds <= 0:
+            return []
+        deadline = (time.monotonic() if now is None else now) - self.session_ttl_seconds
+        offline = []
+        with self._lock:
+            expired = [
+                (user_id, session_id)
+                for user_id, sessions in self._sessions.items()
+                for session_id, last_seen in sessions.items()
+                if last_seen < deadline
+            ]
+            for user_id, session_id in expired:
+                if self._close(user_id, session_id):
+                    offline.append(user_id)
+        if offline:
+            logger.info(f"Presence sessions expired for {len(offline)} users.")
+            self._notify()
+        return offline
+
+    def _close(self, user_id: str, session_id: str) -> bool:
+        # El llamador tiene el lock
+        sessions = self._sessions.get(user_id)
+        if not sessions or sessions.pop(session_id, None) is None:
+            return False
+        if sessions:
+            return False
+        del self._sessions[user_id]
+        self._pending[user_id] = False
+        return True
+
+    # ----------- Persistence ------------------
+
+    def publish(self) -> bool:
+        """
+        Publishes the online users of this worker, if they changed since they were last
+        published.
+
+        Returns:
+            bool: True if the users were written.
+        """
+        with self._lock:
+            online = frozenset(self._sessions)
+        if online == self._published:
+            return False
+        self.presence_repository.publish(self.worker_id, online)
+        self._published = online
+        return True
+
+    def reap(self) -> List[str]:
+        """
+        Drops the records of the workers that stopped publishing (e.g. their process died)
+        and queues a status update of their users.
+
+        Returns:
+            List[str]: The IDs of the dropped workers.
+        """
+        stale = [
+            worker for worker in self.presence_repository.find_stale(self._live_since())
+            if worker.id != self.worker_id
+        ]
+        if not stale:
+            return []
+        self.presence_repository.remove([worker.id for worker in stale])
+        with self._lock:
+            for worker in stale:
+                for user_id in worker.user_ids:
+                    self._pending.setdefault(user_id, False)
+        logger.info(f"Dropped the presence of {len(stale)} stale workers.")
+        self._notify()
+        return [worker.id for worker in stale]
+
+    def flush(self) -> int:
+        """
+        Publishes the online users of this worker and writes the pending status changes
+        with a single bulk update. A user that went offline here stays active if another
+        worker has a session of them. Users whose stored status already matches (e.g. they
+        reconnected before the flush) are not written.
+
+        Returns:
+            int: The number of users written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            # Primero se publica: de dos workers que se desconectan a la vez, el ultimo ve al otro
+            self.publish()
+            pending = {user_id: is_active or self.is_online(user_id) for user_id, is_active in pending.items()}
+            stored = self.user_repository.find_by_ids(list(pending))
+            changed = {
+                user_id: is_active for user_id, is_active in pending.items()
+                if user_id in stored and stored[user_id].is_active != is_active
+            }
+            if changed:
+                self.user_repository.modify_many(
+                    list(changed), lambda user: setattr(user, 'is_active', changed[user.id])
+                )
+        except Exception:
+            with self._lock:
+                # Un cambio mas reciente que llego durante el flush tiene prioridad
+                for user_id, is_active in pending.items():
+                    self._pending.setdefault(user_id, is_active)
+            raise
+        logger.info(f"Flushed presence of {len(changed)} users.")
+        return len(changed)
+
+    def _notify(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.notify()
+
+    def _sweep(self) -> None:
+        interval = max(self.worker_ttl_seconds / 3, 1)
+        if self.session_ttl_seconds > 0:
+            interval = min(interval, max(self.session_ttl_seconds / 2, 1))
+        while True:
+            time.sleep(interval)
+            try:
+                self.expire()
+                self.publish()
+                self.presence_repository.heartbeat(self.worker_id)
+                self.reap()
+            except Exception:
+                logger.exception("Presence sweep failed.")
+
+    def stop(self) -> None:
+        """
+        Closes the sessions of this worker and removes its record, so its users go offline
+        unless another worker has a session of them.
+        """
+        with self._lock:
+            for user_id in self._sessions:
+                self._pending[user_id] = False
+            self._sessions.clear()
+        self.flush()
+        self.presence_repository.remove([self.worker_id])
+
+    def start(self) -> None:
+        """
+        Starts the background flush and the sweep that expires sessions (if a TTL is set),
+        keeps this worker alive for the others and drops stale workers. The sessions of this
+        worker are closed when the process exits.
+        """
+        if self._scheduler is None:
+            self._scheduler = FlushScheduler(self.flush, self.flush_interval_ms, "presence-flush")
+            atexit.register(self.stop)
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(target=self._sweep, name="presence-sweep", daemon=True)
+            self._sweeper.start()
+        logger.info(
+            f"Presence tracking started for worker {self.worker_id}: flush every {self.flush_interval_ms}ms, "
+            f"session TTL {self.session_ttl_seconds or 'disabled'}s, worker TTL {self.worker_ttl_seconds}s."
+        )
+
+
+# Built by the container on first use
+presence_service: PresenceService = provide('presence_service')
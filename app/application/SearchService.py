@@ -0,0 +1,69 @@
+import logging
+from datetime import datetime
+from typing import Optional
+from app.container import provide
+from app.repository.chat_repository import ChatRepository
+from app.repository.message_repository import MessageRepository
+from app.repository.search_index import MessageSearchIndex
+
+logger = logging.getLogger('app')
+
+
+class SearchService:
+    """
+    Searches the content of the messages a user can read.
+    """
+    def __init__(self, search_index: MessageSearchIndex, chat_repository: ChatRepository,
+                 message_repository: MessageRepository):
+        self.search_index = search_index
+        self.chat_repository = chat_repository
+        self.message_repository = message_repository
+
+    def search_messages(self, user_id: str, text: str, chat_id: Optional[str] = None,
+                        limit: int = 20, offset: int = 0) -> Optional[dict]:
+        """
+        Finds the messages of the user's chats (or of one of them) containing every word
+        of the text, ignoring case and accents, best matches first.
+
+        Args:
+            user_id (str): The user searching; only their chats are searched.
+            text (str): The words to search.
+            chat_id (str, optional): Restricts the search to this chat.
+            limit (int): The size of the page.
+            offset (int): How many results to skip.
+
+        Returns:
+            dict | None: The page of results, each one a message with its chat and score,
+            and the total number of results. None if the chat is not one of the user's.
+        """
+        if chat_id is not None:
+            chat = self.chat_repository.find_by_id(chat_id)
+            if chat is None or user_id not in (chat.user_a, chat.user_b):
+                return None
+            conversation_ids = [chat.id]
+        else:
+            conversation_ids = [chat.id for chat in self.chat_repository.find_all_by_user(user_id)]
+
+        hits, total = self.search_index.search(text, conversation_ids, limit, offset)
+        messages = self.message_repository.find_by_ids([hit.message_id for hit in hits])
+        missing = [hit.message_id for hit in hits if hit.message_id not in messages]
+        if missing:
+            # Borrados desde que se indexaron
+            self.search_index.remove_messages(missing)
+
+        results = []
+        for hit in hits:
+            message = messages.get(hit.message_id)
+            if message is None:
+                continue
+            data = message.model_dump()
+            if isinstance(message.timestamp, datetime):
+                data["timestamp"] = message.timestamp.isoformat()
+            data["score"] = hit.score
+            results.append(data)
+        logger.info(f"Search by {user_id} in {len(conversation_ids)} chats: {total} results.")
+        return {"results": results, "total": total - len(missing)}
+
+
+# Built by the container on first use
+search_service: SearchService = provide('search_service')
@@ -2,8 +2,7 @@ import logging
 from typing import List
 from app.domain.entities import Tag
 from app.repository.tag_repository import TagRepository
-from app.infraestructure.file_service import FileManager
-from app.infraestructure.encription_service import EncryptionManager
+from app.container import provide
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +18,5 @@ class TagService:
         tags = self.tag_repository.find_all()
         return tags
 
-# Initialize dependencies for the TagService
-file_manager = FileManager()
-encryption_manager = EncryptionManager()
-tag_repository = TagRepository(file_manager, encryption_manager)
-tag_service = TagService(tag_repository)
\ No newline at end of file
+# Built by the container on first use
+tag_service: TagService = provide('tag_service')
@@ -1,26 +1,42 @@
 import logging
-from typing import List
+from typing import List, Optional, Set
 from app.domain.entities import User
 from app.repository.user_repository import UserRepository
 from app.repository.tag_repository import TagRepository
-from app.infraestructure.file_service import FileManager
-from app.infraestructure.encription_service import EncryptionManager
+from app.application.recommendations import UserRecommender
+from app.container import provide
 from app.application.upload_service import upload_service
 
 logger = logging.getLogger(__name__)
 
+# Campos de un usuario en las vistas de lista, y los que se pueden pedir (nunca el password)
+USER_LIST_FIELDS = ('id', 'name', 'avatar_url', 'career')
+USER_PUBLIC_FIELDS = tuple(field for field in User.model_fields if field != 'password')
+
 class UserService:
-    def __init__(self, user_repository: UserRepository, tag_repository: TagRepository):
+    def __init__(self, user_repository: UserRepository, tag_repository: TagRepository,
+                 user_recommender: UserRecommender):
         self.user_repository = user_repository
         self.tag_repository = tag_repository
+        self.user_recommender = user_recommender
         self._tags_cache = None
+        self._tags_version = None
 
     def _get_all_tags(self):
-        if self._tags_cache is None:
+        # Los tags los escribe otro proceso: la cache se descarta cuando cambia el archivo
+        version = self.tag_repository.data_version()
+        if self._tags_cache is None or version != self._tags_version:
             logger.info("Caching all tags.")
             self._tags_cache = self.tag_repository.find_all()
+            self._tags_version = version
         return self._tags_cache
 
+    def on_tags_changed(self, tag_ids: Optional[Set[str]]) -> None:
+        """
+        Change listener of the tags repository: drops the cached tags.
+        """
+        self._tags_cache = None
+
     def get_all_users(self) -> List[User]:
         """
         Retrieves all users from the repository.
@@ -29,6 +45,34 @@ class UserService:
         users = self.user_repository.find_all()
         return users
 
+    def list_users(self, fields: List[str] | None = None, career: str | None = None, tag_ids: List[str] = (),
+                   is_active: bool | None = None, after: str | None = None, limit: int = 20) -> tuple[List[dict], str | None]:
+        """
+        Returns a page of users, ordered by id, with only the requested fields (by default
+        the ones of a list view). Filters by career, tags (users having all of them) and
+        status are answered by the repository indexes.
+
+        Returns:
+            tuple[List[dict], str | None]: The projected users of the page, and the cursor
+            of the next page (None if it is the last one).
+
+        Raises:
+            ValueError: If a field is unknown or not public.
+        """
+        fields = list(dict.fromkeys(fields or USER_LIST_FIELDS))
+        unknown = [field for field in fields if field not in USER_PUBLIC_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown user fields: {', '.join(unknown)}")
+        # El id siempre se lee: es el cursor de la siguiente pagina
+        projection = fields if 'id' in fields else ['id', *fields]
+        logger.info(f"Listing users: career={career}, tag_ids={list(tag_ids)}, is_active={is_active}, after={after}.")
+        users, has_more = self.user_repository.find_page(career, tag_ids, is_active, after, limit, projection)
+        next_cursor = users[-1]['id'] if has_more else None
+        if projection is not fields:
+            for user in users:
+                del user['id']
+        return users, next_cursor
+
     def get_user_by_id(self, user_id: str) -> User | None:
         """
         Retrieves a single user by their ID.
@@ -86,6 +130,32 @@ class UserService:
         return user
     
 
+    def get_recommendations(self, user: User, limit: int = 20) -> List[dict]:
+        """
+        Returns the users with the most interests in common with the given user, best
+        first, with the names of the tags they share and their similarity score.
+        """
+        logger.info(f"Retrieving recommendations for user {user.id}.")
+        recommendations = self.user_recommender.recommend(user, limit)
+        users = self.user_repository.find_by_ids([r.user_id for r in recommendations])
+        tags_map = {tag.id: tag.name for tag in self._get_all_tags()}
+
+        result = []
+        for recommendation in recommendations:
+            recommended = users.get(recommendation.user_id)
+            if recommended is None:
+                continue
+            result.append({
+                "id": recommended.id,
+                "name": recommended.name,
+                "career": recommended.career,
+                "avatar_url": recommended.avatar_url,
+                # Los tags que ya no existen no se muestran
+                "shared_tags": [tags_map[tag_id] for tag_id in recommendation.shared_tag_ids if tag_id in tags_map],
+                "score": recommendation.score,
+            })
+        return result
+
     def set_user_status(self, user_id: str, is_active: bool) -> None:
         """
         Sets the user's status to active or inactive.
@@ -131,9 +201,5 @@ class UserService:
         return user
 
 
-# Initialize dependencies for the UserService
-file_manager = FileManager()
-encryption_manager = EncryptionManager()
-user_repository = UserRepository(file_manager, encryption_manager)
-tag_repository = TagRepository(file_manager, encryption_manager)
-user_service = UserService(user_repository, tag_repository)
+# Built by the container on first use
+user_service: UserService = provide('user_service')
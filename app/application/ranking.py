@@ -0,0 +1,212 @@
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+import numpy as np
+from app.domain.entities import User
+from app.repository.post_feed import PostFeed
+from app.repository.user_repository import UserRepository
+import logging
+
+logger = logging.getLogger('app')
+
+
+class RankingWeights(NamedTuple):
+    """
+    Weights of each signal in the relevance score of a post for a viewer.
+    """
+    tag: float = 1.0
+    author: float = 0.5
+    recency: float = 1.0
+    half_life_hours: float = 48.0
+
+
+class _FeedArrays(NamedTuple):
+    feed_version: int
+    post_ids: List[str]
+    post_tag: np.ndarray       # columna del tag de cada publicacion
+    post_author: np.ndarray    # fila del autor de cada publicacion
+    post_time: np.ndarray      # timestamp (segundos) de cada publicacion
+    author_tags: np.ndarray    # autores x tags, 1 si el autor tiene el tag
+    author_rows: Dict[str, int]
+    tag_columns: Dict[str, int]
+
+
+class _CachedRanking(NamedTuple):
+    feed_version: int
+    viewer_tags: frozenset
+    computed_at: float
+    post_ids: List[str]
+
+
+class FeedRanker:
+    """
+    Orders the feed by relevance to a viewer: posts of a tag the viewer follows, posts of
+    authors who share tags with the viewer, and newer posts score higher.
+
+    Tag membership is kept as NumPy arrays aligned with the materialized feed (the tag
+    column of each post, and an authors x tags matrix), so every post is scored at once
+    with a few vector operations instead of a Python loop. The arrays are rebuilt when
+    the feed changes, and the best top_k posts of each viewer are cached for
+    cache_seconds, so paging through a ranked feed is a slice like the chronological one.
+    """
+    def __init__(self, post_feed: PostFeed, user_repository: UserRepository,
+                 weights: RankingWeights = RankingWeights(), top_k: int = 200, cache_seconds: int = 60):
+        """
+        Args:
+            post_feed (PostFeed): The feed being ranked.
+            user_repository (UserRepository): Where the tags of the authors are read.
+            weights (RankingWeights): The weight of each signal.
+            top_k (int): How many posts are ranked and cached per viewer.
+            cache_seconds (int): How long a viewer's ranking is reused; recency changes
+                with time, so it cannot be cached forever.
+        """
+        self.post_feed = post_feed
+        self.user_repository = user_repository
+        self.weights = weights
+        self.top_k = top_k
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._arrays: Optional[_FeedArrays] = None
+        # Usuarios modificados desde la ultima consulta (lock aparte: lo llena un listener)
+        self._changes_lock = threading.Lock()
+        self._changed_users: Set[str] = set()
+        self._cache: Dict[str, _CachedRanking] = {}
+
+    def on_users_changed(self, user_ids: Optional[Set[str]]) -> None:
+        with self._changes_lock:
+            if user_ids is None:
+                # Datos reemplazados: se reconstruye todo
+                self._arrays = None
+            else:
+                self._changed_users.update(user_ids)
+
+    # ----------- Arrays ------------------
+
+    def _build_arrays(self) -> _FeedArrays:
+        feed_version, entries = self.post_feed.snapshot()
+        author_rows: Dict[str, int] = {}
+        for entry in entries:
+            author_rows.setdefault(entry["user"]["id"], len(author_rows))
+        authors = self.user_repository.find_by_ids(list(author_rows))
+
+        tag_columns: Dict[str, int] = {}
+        for entry in entries:
+            tag_columns.setdefault(entry["tag"]["id"], len(tag_columns))
+        for author in authors.values():
+            for tag_id in author.tag_ids:
+                tag_columns.setdefault(tag_id, len(tag_columns))
+
+        author_tags = np.zeros((len(author_rows), len(tag_columns)), dtype=np.float32)
+        for author_id, row in author_rows.items():
+            author = authors.get(author_id)
+            if author is not None and author.tag_ids:
+                author_tags[row, [tag_columns[tag_id] for tag_id in author.tag_ids]] = 1.0
+
+        return _FeedArrays(
+            feed_version=feed_version,
+            post_ids=[entry["id"] for entry in entries],
+            post_tag=np.fromiter((tag_columns[entry["tag"]["id"]] for entry in entries), dtype=np.int32, count=len(entries)),
+            post_author=np.fromiter((author_rows[entry["user"]["id"]] for entry in entries), dtype=np.int32, count=len(entries)),
+            post_time=np.fromiter((entry["timestamp"].timestamp() for entry in entries), dtype=np.float64, count=len(entries)),
+            author_tags=author_tags,
+            author_rows=author_rows,
+            tag_columns=tag_columns,
+        )
+
+    def _update_authors(self, arrays: _FeedArrays, user_ids: Set[str]) -> Optional[_FeedArrays]:
+        """
+        Applies the tag changes of some authors to their rows. Returns None when a new tag
+        appeared and the arrays have to be rebuilt.
+        """
+        relevant = [user_id for user_id in user_ids if user_id in arrays.author_rows]
+        if not relevant:
+            return arrays
+        users = self.user_repository.find_by_ids(relevant)
+        author_tags = None
+        for user_id in relevant:
+            tag_ids = users[user_id].tag_ids if user_id in users else []
+            if any(tag_id not in arrays.tag_columns for tag_id in tag_ids):
+                return None
+            row = np.zeros(len(arrays.tag_columns), dtype=np.float32)
+            row[[arrays.tag_columns[tag_id] for tag_id in tag_ids]] = 1.0
+            current = arrays.author_tags if author_tags is None else author_tags
+            if not np.array_equal(current[arrays.author_rows[user_id]], row):
+                if author_tags is None:
+                    # Copia: una consulta en curso puede estar usando la matriz anterior
+                    author_tags = arrays.author_tags.copy()
+                author_tags[arrays.author_rows[user_id]] = row
+        return arrays if author_tags is None else arrays._replace(author_tags=author_tags)
+
+    def _current_arrays(self) -> _FeedArrays:
+        self.post_feed.refresh()
+        with self._lock:
+            with self._changes_lock:
+                changed, self._changed_users = self._changed_users, set()
+            arrays = self._arrays
+            if arrays is not None and arrays.feed_version == self.post_feed.version and changed:
+                updated = self._update_authors(arrays, changed)
+                if updated is not arrays:
+                    # Otros tags del autor: los rankings guardados ya no valen
+                    self._cache.clear()
+                arrays = self._arrays = updated
+            if arrays is None or arrays.feed_version != self.post_feed.version:
+                arrays = self._arrays = self._build_arrays()
+                self._cache.clear()
+                logger.info(f"Feed ranking arrays built for {len(arrays.post_ids)} posts.")
+            return arrays
+
+    # ----------- Scoring ------------------
+
+    def score(self, arrays: _FeedArrays, viewer_tags: Set[str], now: Optional[float] = None) -> np.ndarray:
+        """
+        Returns the relevance score of every post of the arrays for a viewer.
+        """
+        weights = self.weights
+        viewer_mask = np.zeros(len(arrays.tag_columns), dtype=np.float32)
+        columns = [arrays.tag_columns[tag_id] for tag_id in viewer_tags if tag_id in arrays.tag_columns]
+        viewer_mask[columns] = 1.0
+
+        # 1 si la publicacion es de un tag que sigue el viewer
+        tag_match = viewer_mask[arrays.post_tag]
+        # Fraccion de los tags del viewer que comparte el autor
+        shared = arrays.author_tags @ viewer_mask / max(len(viewer_tags), 1)
+        author_match = shared[arrays.post_author]
+        # Decae a la mitad cada half_life_hours
+        age_hours = np.maximum((time.time() if now is None else now) - arrays.post_time, 0) / 3600
+        recency = np.exp2(-age_hours / weights.half_life_hours)
+
+        return weights.tag * tag_match + weights.author * author_match + weights.recency * recency
+
+    def _top(self, arrays: _FeedArrays, viewer_tags: Set[str]) -> List[str]:
+        if not arrays.post_ids:
+            return []
+        scores = self.score(arrays, viewer_tags)
+        k = min(self.top_k, len(scores))
+        # Solo se ordenan los k mejores; a igual score, la mas reciente primero
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((-arrays.post_time[best], -scores[best]))]
+        return [arrays.post_ids[position] for position in best]
+
+    def rank(self, viewer: User, limit: int = 20, offset: int = 0) -> tuple[List[dict], bool]:
+        """
+        Returns a page of the feed ordered by relevance to the viewer. Only the best
+        top_k posts are ranked, so pages past them are empty.
+
+        Returns:
+            tuple[List[dict], bool]: The feed entries of the page, and whether there are
+            more ranked posts after it.
+        """
+        arrays = self._current_arrays()
+        viewer_tags = frozenset(viewer.tag_ids)
+        cached = self._cache.get(viewer.id)
+        if (
+            cached is None or cached.feed_version != arrays.feed_version
+            or cached.viewer_tags != viewer_tags
+            or time.monotonic() - cached.computed_at > self.cache_seconds
+        ):
+            cached = _CachedRanking(arrays.feed_version, viewer_tags, time.monotonic(), self._top(arrays, viewer_tags))
+            self._cache[viewer.id] = cached
+
+        page_ids = cached.post_ids[offset:offset + limit]
+        entries = [entry for entry in map(self.post_feed.get, page_ids) if entry is not None]
+        return entries, offset + limit < len(cached.post_ids)
@@ -0,0 +1,261 @@
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+import numpy as np
+from app.domain.entities import User
+from app.repository.user_repository import UserRepository
+import logging
+
+logger = logging.getLogger('app')
+
+SIMILARITIES = ('jaccard', 'cosine')
+
+
+class Recommendation(NamedTuple):
+    """
+    A user similar to the viewer, with the tags they share and the similarity score.
+    """
+    user_id: str
+    score: float
+    shared_tag_ids: List[str]
+
+
+class _CachedRecommendations(NamedTuple):
+    version: int
+    profile: tuple
+    recommendations: List[Recommendation]
+
+
+class UserRecommender:
+    """
+    Recommends "people like you": the users whose tags are most similar to the viewer's
+    (Jaccard or cosine), with a bonus for studying the same career.
+
+    The user x tag matrix is kept sparse, by column: for each tag, the sorted array of the
+    rows of the users who have it, plus the number of tags and the career of each row. The
+    overlap of a viewer with every user is then a single np.bincount over the columns of
+    the viewer's tags, and the similarity of all users is computed at once from it, so a
+    request never scans the users file.
+
+    Profile changes reach the matrix through the change listener of the user repository
+    and only move the rows whose tags or career changed (presence updates cost nothing).
+    Changes made by other processes are picked up by rebuilding the matrix, at most every
+    refresh_seconds. The top_k recommendations of each viewer are cached until the matrix
+    or their profile changes.
+    """
+    def __init__(self, user_repository: UserRepository, similarity: str = 'jaccard', career_weight: float = 0.25,
+                 top_k: int = 50, refresh_seconds: int = 60):
+        """
+        Args:
+            user_repository (UserRepository): The users being recommended.
+            similarity (str): 'jaccard' or 'cosine'.
+            career_weight (float): Added to the score of users of the viewer's career.
+            top_k (int): How many recommendations are computed and cached per viewer.
+            refresh_seconds (int): Minimum age of the matrix before it is rebuilt because
+                another process changed the users.
+        """
+        if similarity not in SIMILARITIES:
+            raise ValueError(f"Unknown similarity '{similarity}', expected one of {SIMILARITIES}.")
+        self.user_repository = user_repository
+        self.similarity = similarity
+        self.career_weight = career_weight
+        self.top_k = top_k
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._data_version: Optional[tuple] = None
+        # Se incrementa con cada cambio de la matriz; invalida los resultados guardados
+        self.version = 0
+        self._rows: Dict[str, int] = {}
+        self._user_ids: List[str] = []
+        self._tags: List[frozenset] = []
+        self._careers: List[Optional[str]] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        self._degrees = np.zeros(0, dtype=np.float32)
+        self._career_codes = np.zeros(0, dtype=np.int32)
+        self._career_ids: Dict[str, int] = {}
+        self._cache: Dict[str, _CachedRecommendations] = {}
+        self._changes_lock = threading.Lock()
+        self._changed_users: Set[str] = set()
+        self._stale = False
+
+    # ----------- Change notifications ------------------
+
+    def on_users_changed(self, user_ids: Optional[Set[str]]) -> None:
+        with self._changes_lock:
+            if user_ids is None:
+                self._stale = True
+            else:
+                self._changed_users.update(user_ids)
+
+    # ----------- Matrix ------------------
+
+    def _career_code(self, career: Optional[str]) -> int:
+        # 0 es "sin carrera": nunca cuenta como coincidencia
+        if not career:
+            return 0
+        return self._career_ids.setdefault(career.strip().casefold(), len(self._career_ids) + 1)
+
+    def rebuild(self) -> int:
+        """
+        Builds the matrix from every stored user.
+
+        Returns:
+            int: The number of users.
+        """
+        with self._changes_lock:
+            self._changed_users, self._stale = set(), False
+        data_version = self.user_repository.data_version()
+        users = self.user_repository.find_all()
+        columns: Dict[str, List[int]] = {}
+        with self._lock:
+            self._rows, self._user_ids, self._tags, self._careers = {}, [], [], []
+            self._career_ids = {}
+            for row, user in enumerate(users):
+                tags = frozenset(user.tag_ids)
+                self._rows[user.id] = row
+                self._user_ids.append(user.id)
+                self._tags.append(tags)
+                self._careers.append(user.career)
+                for tag_id in tags:
+                    columns.setdefault(tag_id, []).append(row)
+            self._columns = {tag_id: np.array(rows, dtype=np.int32) for tag_id, rows in columns.items()}
+            self._degrees = np.fromiter((len(tags) for tags in self._tags), dtype=np.float32, count=len(users))
+            self._career_codes = np.fromiter(
+                (self._career_code(career) for career in self._careers), dtype=np.int32, count=len(users)
+            )
+            self._data_version = data_version
+            self._built_at = time.monotonic()
+            self.version += 1
+            self._cache.clear()
+            logger.info(f"Recommendation matrix built for {len(users)} users and {len(self._columns)} tags.")
+            return len(users)
+
+    def _move(self, user: User) -> bool:
+        # El llamador tiene el lock. Devuelve si la fila cambio.
+        tags = frozenset(user.tag_ids)
+        row = self._rows.get(user.id)
+        if row is None:
+            row = len(self._user_ids)
+            self._rows[user.id] = row
+            self._user_ids.append(user.id)
+            self._tags.append(frozenset())
+            self._careers.append(None)
+            self._degrees = np.append(self._degrees, np.float32(0))
+            self._career_codes = np.append(self._career_codes, np.int32(0))
+        elif self._tags[row] == tags and self._careers[row] == user.career:
+            return False
+        old_tags = self._tags[row]
+        for tag_id in old_tags - tags:
+            column = self._columns[tag_id]
+            self._columns[tag_id] = column[column != row]
+        for tag_id in tags - old_tags:
+            column = self._columns.get(tag_id, np.zeros(0, dtype=np.int32))
+            self._columns[tag_id] = np.insert(column, np.searchsorted(column, row), row)
+        self._tags[row] = tags
+        self._careers[row] = user.career
+        self._degrees[row] = len(tags)
+        self._career_codes[row] = self._career_code(user.career)
+        return True
+
+    def _remove(self, user_id: str) -> None:
+        # La fila queda vacia (sin tags ni carrera) para no renumerar las demas
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+        for tag_id in self._tags[row]:
+            column = self._columns[tag_id]
+            self._columns[tag_id] = column[column != row]
+        self._user_ids[row] = None
+        self._tags[row] = frozenset()
+        self._careers[row] = None
+        self._degrees[row] = 0
+        self._career_codes[row] = 0
+
+    def refresh(self) -> None:
+        """
+        Applies the notified profile changes, or rebuilds the matrix if it was never
+        built or the users were replaced or changed by another process.
+        """
+        with self._changes_lock:
+            stale = self._stale
+        if self._built_at is None or stale:
+            self.rebuild()
+            return
+        if (
+            time.monotonic() - self._built_at > self.refresh_seconds
+            and self.user_repository.data_version() != self._data_version
+        ):
+            self.rebuild()
+            return
+        with self._changes_lock:
+            changed, self._changed_users = self._changed_users, set()
+        if not changed:
+            return
+        users = self.user_repository.find_by_ids(list(changed))
+        with self._lock:
+            moved = False
+            for user_id in changed:
+                if user_id in users:
+                    moved = self._move(users[user_id]) or moved
+                elif user_id in self._rows:
+                    self._remove(user_id)
+                    moved = True
+            if moved:
+                self.version += 1
+
+    # ----------- Scoring ------------------
+
+    def scores(self, tag_ids: Set[str], career: Optional[str] = None) -> np.ndarray:
+        """
+        Returns the similarity of every row of the matrix to a profile.
+        """
+        with self._lock:
+            count = len(self._user_ids)
+            columns = [self._columns[tag_id] for tag_id in tag_ids if tag_id in self._columns]
+            overlap = (
+                np.bincount(np.concatenate(columns), minlength=count).astype(np.float32)
+                if columns else np.zeros(count, dtype=np.float32)
+            )
+            viewer_degree = np.float32(len(tag_ids))
+            if self.similarity == 'jaccard':
+                union = self._degrees + viewer_degree - overlap
+                similarity = np.divide(overlap, union, out=np.zeros(count, dtype=np.float32), where=union > 0)
+            else:
+                norms = np.sqrt(self._degrees * viewer_degree)
+                similarity = np.divide(overlap, norms, out=np.zeros(count, dtype=np.float32), where=norms > 0)
+            code = self._career_ids.get(career.strip().casefold()) if career else None
+            if code is not None and self.career_weight:
+                similarity += self.career_weight * (self._career_codes == code)
+            return similarity
+
+    def recommend(self, viewer: User, limit: int = 20) -> List[Recommendation]:
+        """
+        Returns the users most similar to the viewer, best first, excluding the viewer.
+        Users with nothing in common (no shared tag nor career) are not recommended.
+        """
+        self.refresh()
+        profile = (frozenset(viewer.tag_ids), viewer.career)
+        cached = self._cache.get(viewer.id)
+        if cached is None or cached.version != self.version or cached.profile != profile:
+            with self._lock:
+                similarity = self.scores(profile[0], viewer.career)
+                own_row = self._rows.get(viewer.id)
+                if own_row is not None:
+                    similarity[own_row] = 0
+                candidates = np.flatnonzero(similarity > 0)
+                if len(candidates) > self.top_k:
+                    candidates = candidates[np.argpartition(-similarity[candidates], self.top_k - 1)[:self.top_k]]
+                # Mejor score primero; a igual score, por id para que el orden sea estable
+                ranked = sorted(candidates.tolist(), key=lambda row: (-similarity[row], self._user_ids[row]))
+                recommendations = [
+                    Recommendation(
+                        self._user_ids[row],
+                        round(float(similarity[row]), 4),
+                        sorted(self._tags[row] & profile[0]),
+                    )
+                    for row in ranked
+                ]
+                cached = _CachedRecommendations(self.version, profile, recommendations)
+                self._cache[viewer.id] = cached
+        return cached.recommendations[:limit]
@@ -14,12 +14,85 @@ class Config:
     # --- File Storage Path ---
     BASE_PATH = os.getenv("NFS_PATH", "db")
 
+    # --- Number of shard files for messages (routed by conversation_id) ---
+    MESSAGE_SHARDS = int(os.getenv("MESSAGE_SHARDS", "16"))
+
+    # --- Append-only log compaction (seconds, 0 disables the background job) ---
+    LOG_COMPACTION_INTERVAL_SECONDS = int(os.getenv("LOG_COMPACTION_INTERVAL_SECONDS", "300"))
+
+    # --- Durability of chat/message writes: "immediate" (flush on each) or "batched" (write-behind) ---
+    REPOSITORY_DURABILITY = os.getenv("REPOSITORY_DURABILITY", "immediate")
+    REPOSITORY_FLUSH_INTERVAL_MS = int(os.getenv("REPOSITORY_FLUSH_INTERVAL_MS", "50"))
+    REPOSITORY_FLUSH_MAX_OPS = int(os.getenv("REPOSITORY_FLUSH_MAX_OPS", "100"))
+
+    # --- Storage backend: "json" (encrypted JSON files) or "sqlite" ---
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_PATH, "nexu.db"))
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    # Idle SQLite connections kept open for reuse
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+
+    # --- Presence: coalescing window of is_active writes, and heartbeat TTL of sessions (0 disables it) ---
+    PRESENCE_FLUSH_INTERVAL_MS = int(os.getenv("PRESENCE_FLUSH_INTERVAL_MS", "2000"))
+    PRESENCE_SESSION_TTL_SECONDS = int(os.getenv("PRESENCE_SESSION_TTL_SECONDS", "0"))
+    # Seconds after which the online users published by a worker that stopped refreshing them are ignored
+    PRESENCE_WORKER_TTL_SECONDS = int(os.getenv("PRESENCE_WORKER_TTL_SECONDS", "30"))
+
+    # --- Socket.IO pub/sub between workers: redis://, kafka://, zmq+tcp:// or unix:///path (local broker). Empty: single process ---
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "nexu-socketio")
+
+    # --- Server: async mode of Socket.IO ("threading" for the dev server; app.wsgi uses "gevent" or "eventlet") ---
+    SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "5000"))
+    # --- Native threads for blocking file I/O and encryption under gevent/eventlet ---
+    BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
     # --- JWT Settings ---
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ALGORITHM = "HS256"
     
     ACCESS_TOKEN_EXPIRE_MINUTES = 525600 # 1 year for development convenience
     
+    # --- Largest page of messages returned by the chat history endpoints ---
+    CHAT_PAGE_MAX_MESSAGES = int(os.getenv("CHAT_PAGE_MAX_MESSAGES", "200"))
+
+    # --- Largest page of users returned by GET /users ---
+    USERS_PAGE_MAX = int(os.getenv("USERS_PAGE_MAX", "100"))
+
+    # --- Materialized post feed: full rebuild after this many seconds (0 = only on changes) ---
+    FEED_MAX_AGE_SECONDS = int(os.getenv("FEED_MAX_AGE_SECONDS", "300"))
+    # --- Largest page of posts returned by GET /posts ---
+    FEED_PAGE_MAX_POSTS = int(os.getenv("FEED_PAGE_MAX_POSTS", "100"))
+
+    # --- Feed ordered by relevance (?order=relevance): weight of each signal ---
+    FEED_RANK_WEIGHT_TAG = float(os.getenv("FEED_RANK_WEIGHT_TAG", "1.0"))
+    FEED_RANK_WEIGHT_AUTHOR = float(os.getenv("FEED_RANK_WEIGHT_AUTHOR", "0.5"))
+    FEED_RANK_WEIGHT_RECENCY = float(os.getenv("FEED_RANK_WEIGHT_RECENCY", "1.0"))
+    FEED_RANK_HALF_LIFE_HOURS = float(os.getenv("FEED_RANK_HALF_LIFE_HOURS", "48"))
+    FEED_RANK_TOP_K = int(os.getenv("FEED_RANK_TOP_K", "200"))
+    FEED_RANK_CACHE_SECONDS = int(os.getenv("FEED_RANK_CACHE_SECONDS", "60"))
+
+    # --- "People like you" recommendations (GET /users/recommendations) ---
+    RECOMMENDATIONS_SIMILARITY = os.getenv("RECOMMENDATIONS_SIMILARITY", "jaccard")  # jaccard | cosine
+    RECOMMENDATIONS_CAREER_WEIGHT = float(os.getenv("RECOMMENDATIONS_CAREER_WEIGHT", "0.25"))
+    RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "50"))
+    RECOMMENDATIONS_REFRESH_SECONDS = int(os.getenv("RECOMMENDATIONS_REFRESH_SECONDS", "60"))
+
+    # --- Full-text search over messages ---
+    SEARCH_INDEX_FLUSH_INTERVAL_MS = int(os.getenv("SEARCH_INDEX_FLUSH_INTERVAL_MS", "5000"))
+    # Records appended to the search index log by a worker before it folds the log into the index file
+    SEARCH_INDEX_COMPACT_EVERY = int(os.getenv("SEARCH_INDEX_COMPACT_EVERY", "100"))
+    SEARCH_PAGE_MAX_RESULTS = int(os.getenv("SEARCH_PAGE_MAX_RESULTS", "50"))
+
+    # --- Messages queued per offline user, notified in one batch when they connect ---
+    OFFLINE_QUEUE_MAX_MESSAGES = int(os.getenv("OFFLINE_QUEUE_MAX_MESSAGES", "500"))
+
+    # --- Verified tokens kept in memory by the auth decorators ---
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
     # --- CLOUDINARY Settings ---
     CLOUDINARY_CLOUD_NAME = os.environ.get("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY = os.environ.get("CLOUDINARY_API_KEY")
@@ -0,0 +1,287 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.repository.user_repository import UserRepository
+from app.repository.chat_repository import ChatRepository
+from app.repository.message_repository import MessageRepository
+from app.repository.post_repository import PostRepository
+from app.repository.tag_repository import TagRepository
+from app.repository.pending_delivery_repository import PendingDeliveryRepository
+from app.repository.presence_repository import PresenceRepository
+import logging
+
+logger = logging.getLogger('app')
+
+
+class Container:
+    """
+    Owns the single instance of each infrastructure object, repository and service of
+    the process, so every service shares the same repositories (and their caches, indexes
+    and locks).
+
+    Each name is registered with a factory that receives the container and is only called
+    the first time the name is resolved, e.g. `container.user_repository`. Modules that
+    need an instance at import time expose a proxy to it instead (see provide).
+
+    Factories subscribe their instances to repository writes through add_change_listener,
+    so the listeners are removed when the instance is dropped (reset, override, register).
+    """
+    def __init__(self) -> None:
+        self._factories: Dict[str, Callable[["Container"], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        # Listeners de cambios registrados por la factory de cada nombre
+        self._listeners: Dict[str, List[Tuple[Any, Callable]]] = {}
+        # Nombres que se estan construyendo, el ultimo es el de la factory en curso
+        self._building: List[str] = []
+        # Reentrante: una factory resuelve sus dependencias mientras se construye
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[["Container"], Any]) -> None:
+        """
+        Registers (or replaces) the factory of a name, dropping its current instance.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._remove_listeners([name])
+
+    def resolve(self, name: str) -> Any:
+        """
+        Returns the instance of a name, building it on first use.
+
+        Raises:
+            KeyError: If nothing is registered under the name.
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Nothing is registered in the container as '{name}'.")
+                self._building.append(name)
+                try:
+                    self._instances[name] = self._factories[name](self)
+                except Exception:
+                    self._remove_listeners([name])
+                    raise
+                finally:
+                    self._building.pop()
+            return self._instances[name]
+
+    def add_change_listener(self, repository, listener: Callable[[Optional[Set[str]]], None]) -> None:
+        """
+        Subscribes the instance being built to the writes of a repository (see
+        BaseRepository.add_change_listener) until the container drops it.
+        """
+        repository.add_change_listener(listener)
+        owner = self._building[-1] if self._building else ''
+        self._listeners.setdefault(owner, []).append((repository, listener))
+
+    def _remove_listeners(self, names) -> None:
+        for name in list(names):
+            for repository, listener in self._listeners.pop(name, ()):
+                repository.remove_change_listener(listener)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.resolve(name)
+        except KeyError as e:
+            raise AttributeError(str(e)) from None
+
+    @contextmanager
+    def override(self, **instances):
+        """
+        Replaces instances, e.g. with test doubles, inside the block. Everything else is
+        rebuilt on demand from the overrides, and the previous instances are restored on exit.
+
+            with container.override(user_repository=MagicMock()):
+                container.user_service.get_all_users()
+        """
+        with self._lock:
+            previous, previous_listeners = self._instances, self._listeners
+            self._instances, self._listeners = dict(instances), {}
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._remove_listeners(self._listeners)
+                self._instances, self._listeners = previous, previous_listeners
+
+    def reset(self) -> None:
+        """
+        Drops every instance, and the change listeners of their factories, so they are
+        built again on next use.
+        """
+        with self._lock:
+            self._remove_listeners(self._listeners)
+            self._instances.clear()
+
+    def init_app(self, flask_app) -> None:
+        flask_app.extensions['container'] = self
+
+
+class _Provided:
+    """
+    Stand-in for an instance of the container that builds it on first attribute access.
+    """
+    __slots__ = ('_name',)
+
+    def __init__(self, name: str) -> None:
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(container.resolve(self._name), attribute)
+
+    def __setattr__(self, attribute: str, value: Any) -> None:
+        setattr(container.resolve(self._name), attribute, value)
+
+    def __repr__(self) -> str:
+        return f"<provided {self._name}: {container.resolve(self._name)!r}>"
+
+
+def provide(name: str) -> Any:
+    """
+    Returns a proxy to an instance of the container, for modules that expose it at import
+    time (e.g. `user_service`) without building it yet. Tests can still patch the module
+    attribute as before.
+    """
+    return _Provided(name)
+
+
+def _chat_service(c: Container):
+    from app.application.ChatService import ChatService
+    return ChatService(
+        c.user_repository, c.chat_repository, c.message_repository, c.user_service,
+        c.presence_service, c.pending_delivery_repository,
+    )
+
+
+def _login_service(c: Container):
+    from app.application.LoginService import LoginService
+    return LoginService(c.user_repository, c.user_service, c.presence_service)
+
+
+def _post_service(c: Container):
+    from app.application.PostService import PostService
+    return PostService(c.post_repository, c.user_repository, c.tag_repository, c.post_feed, c.feed_ranker)
+
+
+def _feed_ranker(c: Container):
+    from app.application.ranking import FeedRanker, RankingWeights
+    from app.config.settings import Config
+    weights = RankingWeights(
+        tag=Config.FEED_RANK_WEIGHT_TAG,
+        author=Config.FEED_RANK_WEIGHT_AUTHOR,
+        recency=Config.FEED_RANK_WEIGHT_RECENCY,
+        half_life_hours=Config.FEED_RANK_HALF_LIFE_HOURS,
+    )
+    feed_ranker = FeedRanker(c.post_feed, c.user_repository, weights, Config.FEED_RANK_TOP_K, Config.FEED_RANK_CACHE_SECONDS)
+    # Los tags de un autor no estan en las entradas del feed
+    c.add_change_listener(c.user_repository, feed_ranker.on_users_changed)
+    return feed_ranker
+
+
+def _post_feed(c: Container):
+    from app.repository.post_feed import PostFeed
+    from app.config.settings import Config
+    post_feed = PostFeed(c.post_repository, c.user_repository, c.tag_repository, Config.FEED_MAX_AGE_SECONDS)
+    c.add_change_listener(c.post_repository, post_feed.on_posts_changed)
+    c.add_change_listener(c.user_repository, post_feed.on_users_changed)
+    return post_feed
+
+
+def _presence_service(c: Container):
+    from app.application.PresenceService import PresenceService
+    from app.config.settings import Config
+    return PresenceService(
+        c.user_repository, c.presence_repository, Config.PRESENCE_FLUSH_INTERVAL_MS,
+        Config.PRESENCE_SESSION_TTL_SECONDS, Config.PRESENCE_WORKER_TTL_SECONDS,
+    )
+
+
+def _search_service(c: Container):
+    from app.application.SearchService import SearchService
+    return SearchService(c.message_search_index, c.chat_repository, c.message_repository)
+
+
+def _message_search_index(c: Container):
+    from app.repository.search_index import MessageSearchIndex
+    from app.config.settings import Config
+    search_index = MessageSearchIndex(
+        c.file_manager, c.encryption_manager, c.message_repository, Config.SEARCH_INDEX_FLUSH_INTERVAL_MS,
+        Config.SEARCH_INDEX_COMPACT_EVERY,
+    )
+    # Los mensajes nuevos se indexan en segundo plano
+    c.add_change_listener(c.message_repository, search_index.on_messages_changed)
+    return search_index
+
+
+def _tag_service(c: Container):
+    from app.application.TagService import TagService
+    return TagService(c.tag_repository)
+
+
+def _user_service(c: Container):
+    from app.application.UserService import UserService
+    user_service = UserService(c.user_repository, c.tag_repository, c.user_recommender)
+    c.add_change_listener(c.tag_repository, user_service.on_tags_changed)
+    return user_service
+
+
+def _user_recommender(c: Container):
+    from app.application.recommendations import UserRecommender
+    from app.config.settings import Config
+    user_recommender = UserRecommender(
+        c.user_repository,
+        similarity=Config.RECOMMENDATIONS_SIMILARITY,
+        career_weight=Config.RECOMMENDATIONS_CAREER_WEIGHT,
+        top_k=Config.RECOMMENDATIONS_TOP_K,
+        refresh_seconds=Config.RECOMMENDATIONS_REFRESH_SECONDS,
+    )
+    c.add_change_listener(c.user_repository, user_recommender.on_users_changed)
+    return user_recommender
+
+
+def _auth_cache(c: Container):
+    from app.middleware.auth_cache import AuthCache
+    from app.config.settings import Config
+    auth_cache = AuthCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL_SECONDS)
+    # Cualquier escritura de un usuario descarta sus tokens
+    c.add_change_listener(c.user_repository, auth_cache.invalidate_users)
+    return auth_cache
+
+
+container = Container()
+
+# Infrastructure
+container.register('file_manager', lambda c: FileManager())
+container.register('encryption_manager', lambda c: EncryptionManager())
+
+# Repositories
+container.register('user_repository', lambda c: UserRepository(c.file_manager, c.encryption_manager))
+container.register('chat_repository', lambda c: ChatRepository(c.file_manager, c.encryption_manager))
+container.register('message_repository', lambda c: MessageRepository(c.file_manager, c.encryption_manager))
+container.register('post_repository', lambda c: PostRepository(c.file_manager, c.encryption_manager))
+container.register('tag_repository', lambda c: TagRepository(c.file_manager, c.encryption_manager))
+container.register('pending_delivery_repository', lambda c: PendingDeliveryRepository(c.file_manager, c.encryption_manager))
+container.register('presence_repository', lambda c: PresenceRepository(c.file_manager, c.encryption_manager))
+container.register('message_search_index', _message_search_index)
+container.register('post_feed', _post_feed)
+
+# Services (imported when first built, so the service modules can import the container)
+container.register('user_recommender', _user_recommender)
+container.register('user_service', _user_service)
+container.register('tag_service', _tag_service)
+container.register('feed_ranker', _feed_ranker)
+container.register('post_service', _post_service)
+container.register('presence_service', _presence_service)
+container.register('login_service', _login_service)
+container.register('chat_service', _chat_service)
+container.register('search_service', _search_service)
+container.register('auth_cache', _auth_cache)
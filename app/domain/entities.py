@@ -1,7 +1,8 @@
+from dataclasses import dataclass
 from enum import Enum
 import os
 from pydantic import BaseModel, Field, model_validator, field_validator
-from typing import Any, Optional, List
+from typing import Any, Callable, Dict, Optional, List, Union, get_args, get_origin
 from app.config.settings import Config
 from app.utils.hashing import hash_password
 from datetime import datetime, date
@@ -11,13 +12,143 @@ class DbFile(Enum):
     USERS = os.path.join(Config.BASE_PATH, "Usuarios.json.enc")
     CHATS = os.path.join(Config.BASE_PATH, "Chats.json.enc")
     MESSAGES = os.path.join(Config.BASE_PATH, "Mensajes.json.enc")
+    MESSAGES_LOG = os.path.join(Config.BASE_PATH, "Mensajes.log.enc")
     POSTS = os.path.join(Config.BASE_PATH, "Publicaciones.json.enc")
     TAGS = os.path.join(Config.BASE_PATH, "Tags.json.enc")
+    PENDING_DELIVERIES = os.path.join(Config.BASE_PATH, "Entregas.json.enc")
+    PENDING_DELIVERIES_LOG = os.path.join(Config.BASE_PATH, "Entregas.log.enc")
+    MESSAGE_SEARCH_INDEX = os.path.join(Config.BASE_PATH, "IndiceMensajes.json.enc")
+    MESSAGE_SEARCH_INDEX_LOG = os.path.join(Config.BASE_PATH, "IndiceMensajes.log.enc")
+    PRESENCE = os.path.join(Config.BASE_PATH, "Presencia.json.enc")
     TEST = os.path.join(Config.BASE_PATH, "Test.json.enc")
 
 
+@dataclass(frozen=True)
+class ShardFile:
+    """
+    Archivo de datos cuya ruta se calcula en tiempo de ejecucion (p. ej. un shard de mensajes).
+    Expone la misma interfaz que DbFile (name y value) para poder usarse en su lugar.
+    """
+    name: str
+    value: str
+
+
+DataFile = DbFile | ShardFile
+
+
+class _StorageLoader:
+    """
+    Construye instancias de una clase de entidad a partir de registros de nuestro propio
+    almacenamiento sin pasar por la validacion de pydantic: se arma el __dict__ de la
+    instancia directamente, igual que model_construct pero sin su costo por campo.
+    Solo se convierten las fechas guardadas como texto ISO y se copian las listas y dicts (con
+    los que tengan dentro, p. ej. Dict[str, List[str]]), para que la entidad no comparta objetos
+    mutables con la cache de snapshots.
+    """
+    def __init__(self, entity_class: type) -> None:
+        self.entity_class = entity_class
+        self.fields = entity_class.model_fields
+        self.field_names = frozenset(self.fields)
+        self.converters: list[tuple[str, Callable[[str], Any]]] = []
+        self.containers: list[tuple[str, Callable[[Any], Any]]] = []
+        for name, field in self.fields.items():
+            annotation = self._unwrap_optional(field.annotation)
+            if annotation is datetime:
+                self.converters.append((name, datetime.fromisoformat))
+            elif annotation is date:
+                self.converters.append((name, date.fromisoformat))
+            else:
+                copier = self._copier(annotation)
+                if copier is not None:
+                    self.containers.append((name, copier))
+
+        self.load = self._build()
+
+    @staticmethod
+    def _unwrap_optional(annotation: Any) -> Any:
+        if get_origin(annotation) is Union:
+            arguments = [argument for argument in get_args(annotation) if argument is not type(None)]
+            if len(arguments) == 1:
+                return arguments[0]
+        return annotation
+
+    @classmethod
+    def _copier(cls, annotation: Any) -> Callable[[Any], Any] | None:
+        """
+        Devuelve la funcion que copia un valor del tipo anotado hasta su ultimo nivel de
+        listas y dicts, o None si el tipo no es un contenedor.
+        """
+        origin = get_origin(annotation)
+        if origin is list:
+            arguments = get_args(annotation)
+            inner = cls._copier(cls._unwrap_optional(arguments[0])) if arguments else None
+            if inner is None:
+                return list
+            return lambda value: [element if element is None else inner(element) for element in value]
+        if origin is dict:
+            arguments = get_args(annotation)
+            inner = cls._copier(cls._unwrap_optional(arguments[1])) if len(arguments) == 2 else None
+            if inner is None:
+                return dict
+            return lambda value: {key: element if element is None else inner(element) for key, element in value.items()}
+        return None
+
+    def _build(self) -> Callable[[dict], Any]:
+        # Todo lo que usa load se resuelve aqui una vez, para que cada llamada sea barata
+        entity_class = self.entity_class
+        fields = self.fields
+        field_names = self.field_names
+        converters = tuple(self.converters)
+        containers = tuple(self.containers)
+        new = entity_class.__new__
+        set_attribute = object.__setattr__
+
+        def load(item: dict):
+            values = dict(item)
+            if len(values) != len(field_names) or not field_names.issuperset(values):
+                # Registros con campos de mas (se ignoran) o de menos (se usan los defaults)
+                values = {
+                    name: values[name] if name in values else field.get_default(call_default_factory=True)
+                    for name, field in fields.items()
+                }
+            for name, convert in converters:
+                value = values[name]
+                if value.__class__ is str:
+                    values[name] = convert(value)
+            for name, copy in containers:
+                value = values[name]
+                if value is not None:
+                    values[name] = copy(value)
+            entity = new(entity_class)
+            set_attribute(entity, '__dict__', values)
+            set_attribute(entity, '__pydantic_fields_set__', set(values))
+            set_attribute(entity, '__pydantic_extra__', None)
+            set_attribute(entity, '__pydantic_private__', None)
+            return entity
+
+        return load
+
+
+# Loader de cada clase de entidad, creado la primera vez que se usa
+_STORAGE_LOADERS: dict[type, _StorageLoader] = {}
+
+
 class BaseEntity(BaseModel):
     id: str = Field(default="")
+
+    @classmethod
+    def from_storage(cls, item: dict):
+        """
+        Construye la entidad a partir de un registro leido de nuestro propio almacenamiento,
+        sin validarlo: los registros ya se validaron al crearse, asi que no se vuelven a
+        correr los validadores (id, hash de contraseña). Los datos que vienen de la API se
+        siguen validando con el constructor normal.
+        """
+        loader = _STORAGE_LOADERS.get(cls)
+        if loader is None:
+            loader = _STORAGE_LOADERS[cls] = _StorageLoader(cls)
+        return loader.load(item)
+
     @model_validator(mode='before')
     @classmethod
     def create_id(cls, data:Any) -> Any:
@@ -74,6 +205,9 @@ class Chat(BaseEntity):
     user_a: str
     user_b: str
     last_message_at: datetime = Field(default_factory=datetime.now)
+    # Resumen materializado para la bandeja de entrada, se actualiza en cada mensaje
+    last_message_preview: Optional[str] = None
+    unread_counts: Dict[str, int] = Field(default_factory=dict)
 
     @model_validator(mode='before')
     @classmethod
@@ -102,6 +236,16 @@ class Message(BaseEntity):
     timestamp: datetime = Field(default_factory=datetime.now)
     delivered: bool
 
+class PendingDelivery(BaseEntity):
+    # Mensajes aun no notificados a un usuario desconectado, del mas antiguo al mas nuevo,
+    # como [timestamp, chat_id, message_id]; el id es el del usuario
+    messages: List[List[str]] = Field(default_factory=list)
+
+class WorkerPresence(BaseEntity):
+    # Usuarios con alguna sesion abierta en un worker; el id es el del worker
+    user_ids: List[str] = Field(default_factory=list)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
 class Post(BaseEntity):
     user_id: str
     tag_id:str
@@ -1,4 +1,24 @@
 from flask_socketio import SocketIO
 from app.config.settings import Config
+
+
+def _queue_options() -> dict:
+    """
+    Pub/sub backend shared by the workers. redis://, kafka:// and zmq+tcp:// URLs are
+    handled by Flask-SocketIO; unix:// uses the local broker of app.infraestructure.pubsub_service.
+    """
+    url = Config.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return {}
+    if url.startswith("unix://"):
+        from app.infraestructure.pubsub_service import UnixSocketManager
+        return {"client_manager": UnixSocketManager(url, channel=Config.SOCKETIO_CHANNEL)}
+    return {"message_queue": url, "channel": Config.SOCKETIO_CHANNEL}
+
+
 # Create the SocketIO instance here to avoid circular imports
-socketio = SocketIO(cors_allowed_origins=Config.ALLOWED_ORIGINS)
+socketio = SocketIO(
+    cors_allowed_origins=Config.ALLOWED_ORIGINS,
+    async_mode=Config.SOCKETIO_ASYNC_MODE,
+    **_queue_options(),
+)
@@ -1,5 +1,8 @@
+import hashlib
+import hmac
 from cryptography.fernet import Fernet, InvalidToken
 from app.config.settings import Config
+from app.utils.offload import run_blocking
 import logging
 # Servicio encargado solamente de encriptar y desencriptar datos
 
@@ -17,19 +20,27 @@ class EncryptionManager:
     def encrypt_data(self, data: str) -> bytes:
         try:
             data_bytes = data.encode()
-            encripted = self.fernet.encrypt(data_bytes)
+            encripted = run_blocking(self.fernet.encrypt, data_bytes)
             return encripted
         except Exception as e:
             raise RuntimeError("Error al encriptar los datos: " + str(e))
 
     def decrypt_data(self, token: bytes) -> str:
         try:
-            data_bytes = self.fernet.decrypt(token)
+            data_bytes = run_blocking(self.fernet.decrypt, token)
             decripted = data_bytes.decode()
             return decripted
         except (InvalidToken, TypeError, ValueError) as e:
             raise ValueError("Error al desencriptar el token: " + str(e))
         
         
+    def fingerprint(self, data: str) -> str:
+        """
+        HMAC-SHA256 determinista del dato, con una llave derivada de FERNET_KEY.
+        Sirve para buscar por igualdad un valor sensible (p. ej. un email) sin guardarlo en claro.
+        """
+        key = hashlib.sha256(b"fingerprint:" + self.load_key(Config.FERNET_KEY)).digest()
+        return hmac.new(key, data.encode(), hashlib.sha256).hexdigest()
+
     def load_key(self, key: str) -> bytes:
         return key.encode()
\ No newline at end of file
@@ -1,25 +1,178 @@
-from app.domain.entities import DbFile
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from app.domain.entities import DataFile
+from app.utils.offload import run_blocking
+
+try:
+    import fcntl
+except ImportError:  # Windows: los locks entre procesos no estan disponibles
+    fcntl = None
+
 # Servicio responsable solo de leer y escribir datos en archivos
 class FileManager:
-    def read_file(self, file: DbFile) -> bytes:
+    @staticmethod
+    def _ensure_directory(file: DataFile) -> str:
+        """
+        Crea el directorio del archivo si no existe (p. ej. el de los shards) y lo devuelve.
+        """
+        directory = os.path.dirname(file.value) or "."
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def _read_bytes(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def read_file(self, file: DataFile) -> bytes:
         """
         Lee un archivo binario desde la ruta especificada en el enum.
         """
         try:
-            with open(file.value, "rb") as f:
-                return f.read()
+            return run_blocking(self._read_bytes, file.value)
         except FileNotFoundError:
             # Si el archivo no existe, devuelve bytes vacíos.
             return b''
 
-    def write_file(self, file: DbFile, data: bytes) -> bool:
+    def write_file(self, file: DataFile, data: bytes) -> bool:
         """
         Escribe datos binarios en la ruta especificada en el enum.
+        La escritura es atomica y durable: se escribe un archivo temporal, se sincroniza con
+        el disco y se reemplaza el original (sincronizando tambien el directorio), por lo que
+        cada escritura produce un inodo nuevo (ver stat_file).
+        Devuelve True si la escritura fue exitosa, False si ocurrió algún error.
+        """
+        return run_blocking(self._write_atomic, file, data)
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        """
+        Hace durable el rename dentro del directorio. No todos los sistemas lo permiten.
+        """
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _write_atomic(self, file: DataFile, data: bytes) -> bool:
+        try:
+            directory = self._ensure_directory(file)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    # El contenido llega al disco antes del rename: si no, un corte de luz
+                    # podria dejar el archivo vacio despues de haber truncado el log
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp crea el archivo con permisos 0600; se conservan los del original
+                try:
+                    mode = stat.S_IMODE(os.stat(file.value).st_mode)
+                except FileNotFoundError:
+                    mode = 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, file.value)
+                self._fsync_directory(directory)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return True
+        except Exception:
+            return False
+
+    def append_file(self, file: DataFile, data: bytes, new_line: bool = False) -> bool:
+        """
+        Agrega datos binarios al final del archivo, creandolo si no existe.
+        Con new_line, los datos empiezan en una linea nueva aunque el archivo no termine en
+        salto de linea (p. ej. tras una escritura cortada), para no pegarse a esa linea.
         Devuelve True si la escritura fue exitosa, False si ocurrió algún error.
         """
+        return run_blocking(self._append, file, data, new_line)
+
+    def _append(self, file: DataFile, data: bytes, new_line: bool = False) -> bool:
         try:
-            with open(file.value, "wb") as f:
+            self._ensure_directory(file)
+            with open(file.value, "ab+") as f:
+                if new_line and f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
                 f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+    @contextmanager
+    def lock_file(self, file: DataFile):
+        """
+        Bloqueo exclusivo entre procesos sobre el archivo, usando un archivo '.lock' al lado.
+        En sistemas sin fcntl solo se cuenta con los locks del propio proceso.
+        """
+        if fcntl is None:
+            yield
+            return
+        self._ensure_directory(file)
+        with open(f"{file.value}.lock", "a") as lock_handle:
+            # La espera por el lock de otro proceso no debe detener el event loop
+            run_blocking(fcntl.flock, lock_handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_handle, fcntl.LOCK_UN)
+
+    def backup_file(self, file: DataFile) -> bool:
+        """
+        Renombra el archivo agregandole '.bak', p. ej. despues de migrar su contenido.
+        Devuelve True si se pudo renombrar, False si no existe o ocurrió algún error.
+        """
+        try:
+            os.replace(file.value, f"{file.value}.bak")
+            return True
+        except OSError:
+            return False
+
+    def touch_file(self, file: DataFile) -> bool:
+        """
+        Actualiza la fecha de modificacion del archivo, creandolo vacio si no existe.
+        Devuelve True si se pudo, False si ocurrió algún error.
+        """
+        try:
+            self._ensure_directory(file)
+            with open(file.value, "ab"):
+                pass
+            os.utime(file.value)
+            return True
+        except OSError:
+            return False
+
+    def delete_file(self, file: DataFile) -> bool:
+        """
+        Borra el archivo. Devuelve True si se borro, False si no existe o ocurrió algún error.
+        """
+        try:
+            os.remove(file.value)
+            return True
+        except OSError:
+            return False
+
+    def stat_file(self, file: DataFile) -> tuple | None:
+        """
+        Devuelve la firma del archivo (mtime en ns, tamaño, inodo), o None si no existe.
+        Sirve para saber si el contenido cambio desde la ultima lectura sin tener que leerlo.
+        """
+        try:
+            file_stat = os.stat(file.value)
+        except FileNotFoundError:
+            return None
+        return (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
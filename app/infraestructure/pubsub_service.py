@@ -0,0 +1,228 @@
+"""
+Broker local de pub/sub para repartir los emits de Socket.IO entre varios workers de una
+misma maquina, sin Redis ni Kafka.
+
+    python -m app.infraestructure.pubsub_service /tmp/nexu-socketio.sock
+
+Cada worker se configura con SOCKETIO_MESSAGE_QUEUE=unix:///tmp/nexu-socketio.sock y usa
+UnixSocketManager como client_manager de Socket.IO. Al conectarse, cada cliente declara en
+su primera linea si se suscribe o solo publica; el broker reenvia cada linea que recibe a
+los suscriptores conectados. Los mensajes son JSON, uno por linea.
+"""
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import logging
+import socketio
+
+logger = logging.getLogger('app')
+
+URL_SCHEME = "unix://"
+
+# Primera linea de cada conexion: el rol del cliente
+SUBSCRIBE = b"subscribe\n"
+PUBLISH = b"publish\n"
+
+
+def socket_path(url: str) -> str:
+    """
+    Devuelve la ruta del socket de una URL unix:///ruta.
+    """
+    return url[len(URL_SCHEME):] if url.startswith(URL_SCHEME) else url
+
+
+class LocalBroker:
+    """
+    Servidor de fan-out sobre un Unix socket: cada linea recibida de un cliente se envia a
+    todos los suscriptores conectados (incluido el que la publico, si esta suscrito).
+
+    Cada suscriptor tiene su propia cola y un hilo que le escribe, asi un cliente lento no
+    detiene a los demas; si acumula mas de max_pending lineas se le desconecta y debe
+    volver a conectarse.
+    """
+    def __init__(self, path: str, max_pending: int = 10000) -> None:
+        self.path = path
+        self.max_pending = max_pending
+        self._clients: set[socket.socket] = set()
+        self._subscribers: dict[socket.socket, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self._server: socket.socket | None = None
+
+    def start(self) -> threading.Thread:
+        """
+        Abre el socket y atiende a los clientes en un hilo daemon.
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        thread = threading.Thread(target=self._accept, name="pubsub-broker", daemon=True)
+        thread.start()
+        logger.info(f"Pub/sub broker listening on {self.path}")
+        return thread
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        with self._lock:
+            clients = list(self._clients)
+            self._clients.clear()
+        for client in clients:
+            self._drop(client)
+            # shutdown corta la conexion aunque el hilo de _serve aun tenga el archivo abierto
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                # El socket del servidor se cerro
+                return
+            with self._lock:
+                self._clients.add(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        try:
+            with client.makefile("rb") as reader:
+                if reader.readline() == SUBSCRIBE:
+                    pending: queue.Queue = queue.Queue()
+                    with self._lock:
+                        self._subscribers[client] = pending
+                    threading.Thread(target=self._deliver, args=(client, pending), daemon=True).start()
+                # Los suscriptores no publican, pero leer detecta cuando se desconectan
+                for line in reader:
+                    self._broadcast(line)
+        except OSError:
+            pass
+        finally:
+            self._drop(client)
+            with self._lock:
+                self._clients.discard(client)
+            client.close()
+
+    def _deliver(self, client: socket.socket, pending: queue.Queue) -> None:
+        while True:
+            line = pending.get()
+            if line is None:
+                return
+            try:
+                client.sendall(line)
+            except OSError:
+                # El cliente se desconecto o fue descartado; _serve lo cierra
+                self._drop(client)
+                return
+
+    def _broadcast(self, line: bytes) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for client, pending in subscribers:
+            if pending.qsize() >= self.max_pending:
+                logger.warning(f"Dropping a pub/sub subscriber with {pending.qsize()} pending messages")
+                self._drop(client)
+                continue
+            pending.put_nowait(line)
+
+    def _drop(self, client: socket.socket) -> None:
+        """
+        Deja de enviarle lineas a un suscriptor y corta su conexion, lo que termina los
+        hilos que lo atienden.
+        """
+        with self._lock:
+            pending = self._subscribers.pop(client, None)
+        if pending is None:
+            return
+        pending.put_nowait(None)
+        try:
+            client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class UnixSocketManager(socketio.PubSubManager):
+    """
+    Client manager de Socket.IO que comparte los emits, rooms y desconexiones entre
+    procesos a traves de un LocalBroker.
+
+    Se usa igual que los managers de Redis o Kafka: cada worker publica sus emits al
+    broker y entrega a sus propios clientes los que publican los demas.
+    """
+    name = 'unix'
+
+    def __init__(self, url: str, channel: str = 'socketio', write_only: bool = False, logger=None,
+                 retry_seconds: float = 1.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = socket_path(url)
+        self.retry_seconds = retry_seconds
+        self._publisher: socket.socket | None = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self, role: bytes) -> socket.socket:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.path)
+            connection.sendall(role)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def _publish(self, data):
+        line = (json.dumps({'channel': self.channel, 'data': data}) + "\n").encode("utf-8")
+        with self._publish_lock:
+            # Un reintento con una conexion nueva si el broker se reinicio
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        # Solo publica: el broker no le reenvia nada
+                        self._publisher = self._connect(PUBLISH)
+                    self._publisher.sendall(line)
+                    return
+                except OSError:
+                    if self._publisher is not None:
+                        self._publisher.close()
+                    self._publisher = None
+                    if attempt:
+                        self._get_logger().error(f"Cannot publish to the pub/sub broker at {self.path}")
+
+    def _listen(self):
+        while True:
+            try:
+                connection = self._connect(SUBSCRIBE)
+            except OSError:
+                self._get_logger().error(f"Cannot reach the pub/sub broker at {self.path}, retrying")
+                time.sleep(self.retry_seconds)
+                continue
+            try:
+                with connection.makefile("rb") as reader:
+                    for line in reader:
+                        try:
+                            message = json.loads(line)
+                        except ValueError:
+                            continue
+                        if message.get('channel') == self.channel:
+                            yield message.get('data')
+            except OSError:
+                pass
+            finally:
+                connection.close()
+            # El broker cerro la conexion: se reconecta
+            time.sleep(self.retry_seconds)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    broker = LocalBroker(socket_path(sys.argv[1]) if len(sys.argv) > 1 else "/tmp/nexu-socketio.sock")
+    broker.start().join()
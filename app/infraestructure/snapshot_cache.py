@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Hashable
+import logging
+# Cache en memoria de los archivos ya desencriptados y parseados
+
+logger = logging.getLogger('app')
+
+class SnapshotCache:
+    """
+    In-process cache of decrypted and parsed data files, keyed by DbFile.
+
+    An entry is only served while the signature of the file on disk (mtime, size, inode,
+    as returned by FileManager.stat_file) matches the one it was stored with, so a write
+    made by another process or another repository instance is picked up on the next read.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[Any, Any]] = {}
+        self._write_locks: dict[Hashable, threading.RLock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, signature: Any) -> Any | None:
+        """
+        Returns the cached value for the key if it was stored with the given signature.
+
+        Args:
+            key (Hashable): The cache key, usually a DbFile.
+            signature: The current signature of the file, or None if it does not exist.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if signature is not None and entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, signature: Any, value: Any) -> None:
+        """
+        Stores a value for the key under the given signature. A None signature
+        (missing file) drops the entry instead.
+        """
+        with self._lock:
+            if signature is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (signature, value)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """
+        Drops the entry for the key, or every entry if no key is given.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def write_lock(self, key: Hashable) -> threading.RLock:
+        """
+        Returns the lock that serializes writes to the file behind the key, shared by
+        every repository instance of the process.
+        """
+        with self._lock:
+            lock = self._write_locks.get(key)
+            if lock is None:
+                lock = self._write_locks[key] = threading.RLock()
+            return lock
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the cache.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+# Instancia compartida por todos los repositorios del proceso
+snapshot_cache = SnapshotCache()
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.config.settings import Config
+from app.utils.offload import run_blocking
+import logging
+# Servicio responsable solo de abrir conexiones a la base SQLite y de las transacciones
+
+logger = logging.getLogger('app')
+
+
+class SqliteDatabase:
+    """
+    Conexiones a la base SQLite del backend 'sqlite'.
+
+    Las conexiones se prestan de un pool durante una consulta o una transaccion, asi una
+    conexion nunca la usan dos hilos (o greenlets) a la vez. No se asocian al hilo: con
+    gevent threading.local es por greenlet, y cada request abriria una conexion nueva.
+    La base se abre en modo WAL, asi que las lecturas no se bloquean mientras otro proceso
+    escribe. Las sentencias parametrizadas quedan en la cache de sentencias preparadas de
+    cada conexion, que se conserva al devolverla al pool.
+    Abrir la base, esperar el lock de escritura, el commit y las lecturas se envian al pool de
+    hilos nativos (ver app.utils.offload) para no detener el event loop.
+    """
+    def __init__(self, path: str, synchronous: str = "NORMAL", pool_size: int = 16) -> None:
+        """
+        Args:
+            path (str): Ruta del archivo de la base.
+            synchronous (str): Valor de PRAGMA synchronous (NORMAL o FULL).
+            pool_size (int): Maximo de conexiones libres que se mantienen abiertas.
+        """
+        self.path = path
+        self.synchronous = synchronous
+        self.pool_size = pool_size
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexion del pool durante el bloque, abriendo una si no hay libres.
+        """
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            # Abrir la base puede esperar hasta el timeout por el lock de otro proceso
+            connection = run_blocking(self._open)
+        try:
+            yield connection
+        finally:
+            self._release(connection)
+
+    def _release(self, connection: sqlite3.Connection) -> None:
+        # Una conexion que quedo dentro de una transaccion no se reutiliza
+        if not connection.in_transaction:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(connection)
+                    return
+        connection.close()
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: las transacciones se abren explicitamente en transaction().
+        # check_same_thread=False: la conexion pasa de un hilo a otro al volver al pool y con
+        # offload, pero siempre la usa un solo hilo (o greenlet) a la vez
+        connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, cached_statements=256, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connection
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """
+        Ejecuta una consulta de lectura y devuelve todas sus filas.
+        """
+        with self.connection() as connection:
+            return run_blocking(self._fetch_all, connection, sql, params)
+
+    @staticmethod
+    def _fetch_all(connection: sqlite3.Connection, sql: str, params: tuple) -> list:
+        return connection.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transaccion de escritura: BEGIN IMMEDIATE toma el lock de escritura al inicio, y se
+        hace commit al salir del bloque o rollback si hubo una excepcion.
+        """
+        with self.connection() as connection:
+            # La espera por el lock de otro proceso y el fsync del commit no deben detener el event loop
+            run_blocking(connection.execute, "BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            run_blocking(connection.execute, "COMMIT")
+
+    def checkpoint(self) -> None:
+        """
+        Pasa el contenido del WAL a la base y lo trunca.
+        """
+        with self.connection() as connection:
+            run_blocking(connection.execute, "PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        """
+        Cierra las conexiones libres del pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+# Instancia compartida por todos los repositorios del proceso
+sqlite_database = SqliteDatabase(Config.SQLITE_PATH, Config.SQLITE_SYNCHRONOUS, Config.SQLITE_POOL_SIZE)
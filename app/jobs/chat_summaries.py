@@ -0,0 +1,59 @@
+"""
+Recomputes the summary kept in each chat (last message preview and time, unread counters)
+from the message history.
+
+    python -m app.jobs.chat_summaries
+
+Needed once for chats created before the summary existed, and to repair a summary that
+drifted, e.g. after a crash between writing a message and updating its chat.
+"""
+import logging
+from app.config.logger import setup_logging
+from app.repository.chat_repository import ChatRepository
+from app.repository.message_repository import MessageRepository
+from app.utils.timed import timed_task
+
+logger = logging.getLogger('tasks')
+
+
+@timed_task("Reconstruccion de resumenes de chats")
+def rebuild_chat_summaries(chat_repository: ChatRepository, message_repository: MessageRepository) -> int:
+    """
+    Recomputes the summary of every chat and saves them with a single bulk update.
+
+    Args:
+        chat_repository: The repository of the chats to rebuild.
+        message_repository: The repository holding their messages.
+
+    Returns:
+        int: The number of chats updated.
+    """
+    # Importado aqui para no cargar los servicios (y sus sockets) al importar el job
+    from app.application.ChatService import LAST_MESSAGE_PREVIEW_LENGTH
+
+    chats = chat_repository.find_all()
+    for chat in chats:
+        unread_counts = {}
+        for participant_id in (chat.user_a, chat.user_b):
+            unread = message_repository.count_unread_by_chat(chat.id, participant_id)
+            if unread:
+                unread_counts[participant_id] = unread
+        last_message = message_repository.find_last_by_conversation_id(chat.id)
+        chat.unread_counts = unread_counts
+        if last_message is not None:
+            chat.last_message_at = last_message.timestamp
+            chat.last_message_preview = last_message.content[:LAST_MESSAGE_PREVIEW_LENGTH]
+        else:
+            chat.last_message_preview = None
+    updated = chat_repository.update_many(chats)
+    logger.info(f"Rebuilt the summary of {len(updated)} chats.")
+    return len(updated)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    from app.container import container
+    chat_repository, message_repository = container.chat_repository, container.message_repository
+    # Los mensajes de un archivo sin particionar se pasan a los shards antes de leerlos
+    message_repository.migrate_legacy()
+    rebuild_chat_summaries(chat_repository, message_repository)
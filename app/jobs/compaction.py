@@ -0,0 +1,66 @@
+import threading
+import time
+import logging
+from typing import Iterable
+from app.repository.base_repository import BaseRepository
+from app.utils.timed import timed_task
+
+logger = logging.getLogger('tasks')
+
+_compaction_thread: threading.Thread | None = None
+
+
+@timed_task("Compactacion de logs append-only")
+def compact_logs(repositories: Iterable[BaseRepository]) -> int:
+    """
+    Folds the append-only log of each repository into its snapshot file.
+
+    Args:
+        repositories: The repositories to compact. Those without a log are skipped.
+
+    Returns:
+        int: How many repositories had records to compact.
+    """
+    compacted = 0
+    for repository in repositories:
+        if repository.compact():
+            compacted += 1
+    return compacted
+
+
+def _run(repositories: list[BaseRepository], interval_seconds: int) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            compact_logs(repositories)
+        except Exception:
+            # El error ya quedo registrado por timed_task; se reintenta en el siguiente ciclo
+            continue
+
+
+def start_log_compaction(repositories: Iterable[BaseRepository], interval_seconds: int) -> threading.Thread | None:
+    """
+    Starts the background job that periodically compacts append-only logs.
+    Only one job is started per process; an interval of 0 disables it.
+
+    Args:
+        repositories: The append-only repositories to compact.
+        interval_seconds (int): Seconds between compactions.
+
+    Returns:
+        The background thread, or None if the job is disabled.
+    """
+    global _compaction_thread
+    if interval_seconds <= 0:
+        logger.info("Log compaction job disabled.")
+        return None
+    if _compaction_thread is None or not _compaction_thread.is_alive():
+        _compaction_thread = threading.Thread(
+            target=_run,
+            args=(list(repositories), interval_seconds),
+            name="log-compaction",
+            daemon=True,
+        )
+        _compaction_thread.start()
+        logger.info(f"Log compaction job started, running every {interval_seconds}s.")
+    return _compaction_thread
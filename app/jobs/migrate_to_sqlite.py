@@ -0,0 +1,86 @@
+"""
+Copies the encrypted JSON files into the SQLite database used by STORAGE_BACKEND=sqlite.
+
+    python -m app.jobs.migrate_to_sqlite
+
+Files are read one at a time (each message shard separately) and inserted in batches,
+so memory stays bounded by the largest file. Entities are upserted by id, so running the
+migration again refreshes the database with the current contents of the files.
+"""
+import logging
+from app.config.logger import setup_logging
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.repository.base_repository import BaseRepository, Partition
+from app.repository.chat_repository import ChatRepository
+from app.repository.message_repository import MessageRepository
+from app.repository.pending_delivery_repository import PendingDeliveryRepository
+from app.repository.post_repository import PostRepository
+from app.repository.sqlite_repository import SqliteRepository, json_variant, sqlite_variant
+from app.repository.tag_repository import TagRepository
+from app.repository.user_repository import UserRepository
+from app.utils.timed import timed_task
+
+logger = logging.getLogger('tasks')
+
+REPOSITORIES = (UserRepository, ChatRepository, MessageRepository, PostRepository, TagRepository, PendingDeliveryRepository)
+
+
+def _source_partitions(source: BaseRepository) -> list[Partition]:
+    """
+    Returns the files to read: the unpartitioned legacy file first (if the repository is
+    sharded), so the newer shard contents win.
+    """
+    partitions = list(source.partitions)
+    if source.partition_key is not None:
+        partitions.insert(0, Partition(source.db_file, source.log_file))
+    return partitions
+
+
+def migrate_repository(source: BaseRepository, target: SqliteRepository, batch_size: int = 500) -> int:
+    """
+    Streams the entities of a JSON-backed repository into its SQLite counterpart.
+
+    Args:
+        source (BaseRepository): The repository reading the JSON files.
+        target (SqliteRepository): The repository writing to SQLite.
+        batch_size (int): Entities inserted per transaction.
+
+    Returns:
+        int: The number of migrated entities.
+    """
+    migrated = 0
+    for partition in _source_partitions(source):
+        data = source._read_data(partition)
+        source._replay_log(data, source._read_log(partition))
+        items = data.get(source.entity_name, [])
+        for start in range(0, len(items), batch_size):
+            with target.database.transaction() as connection:
+                target._put_items(connection, items[start:start + batch_size])
+                target._bump_version(connection)
+        migrated += len(items)
+    return migrated
+
+
+@timed_task("Migracion de archivos JSON a SQLite")
+def migrate_to_sqlite(batch_size: int = 500) -> dict[str, int]:
+    """
+    Migrates every repository from the encrypted JSON files to SQLite.
+
+    Returns:
+        dict[str, int]: The number of migrated entities per entity name.
+    """
+    file_manager = FileManager()
+    encryption_manager = EncryptionManager()
+    counts = {}
+    for repository_class in REPOSITORIES:
+        source = json_variant(repository_class)(file_manager, encryption_manager)
+        target = sqlite_variant(repository_class)(file_manager, encryption_manager)
+        counts[source.entity_name] = migrate_repository(source, target, batch_size)
+        logger.info(f"Migrated {counts[source.entity_name]} {source.entity_name} to {target.database.path}.")
+    return counts
+
+
+if __name__ == "__main__":
+    setup_logging()
+    migrate_to_sqlite()
@@ -0,0 +1,34 @@
+"""
+Rebuilds the full-text search index of the messages from scratch.
+
+    python -m app.jobs.search_index
+
+The index fills itself as new messages arrive and as each conversation is searched, so
+this is only needed to index the whole history at once, or to repair a damaged index.
+"""
+import logging
+from app.config.logger import setup_logging
+from app.repository.search_index import MessageSearchIndex
+from app.utils.timed import timed_task
+
+logger = logging.getLogger('tasks')
+
+
+@timed_task("Reconstruccion del indice de busqueda")
+def rebuild_search_index(search_index: MessageSearchIndex) -> int:
+    """
+    Indexes every stored message and saves the index.
+
+    Returns:
+        int: The number of messages indexed.
+    """
+    indexed = search_index.rebuild()
+    logger.info(f"Indexed {indexed} messages for search.")
+    return indexed
+
+
+if __name__ == "__main__":
+    setup_logging()
+    from app.container import container
+    container.message_repository.migrate_legacy()
+    rebuild_search_index(container.message_search_index)
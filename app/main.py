@@ -18,15 +18,22 @@ def init_cloudinary():
     )
 
 
-def create_app():
+def create_app(logging_level: int = logging.DEBUG, testing: bool = False):
     """
     Creates and configures a Flask application instance, including blueprints
     and extensions.
+
+    Args:
+        logging_level: Level used when there is no logging.conf (DEBUG for development).
+        testing: Builds the app for tests: logs only to the console and starts no
+            background job, so nothing is written to logs/ or to the data directory.
     """
-    logger = setup_logging(logging_level=logging.DEBUG)
+    # En pruebas no se usa logging.conf, que escribe en logs/
+    logger = setup_logging(config_path=None if testing else 'app/config/logging.conf', logging_level=logging_level)
     
     flask_app = Flask(__name__)
     flask_app.config['SECRET_KEY']= Config.FLASK_SECRET_KEY
+    flask_app.config['TESTING'] = testing
 
     # Initialize CORS
     CORS(flask_app, resources={r"/*": {"origins": "*"}})
@@ -45,11 +52,30 @@ def create_app():
     
     # Initialize Socket.IO with the app
     socketio.init_app(flask_app)
+
+    # Background jobs
+    from app.jobs.compaction import start_log_compaction
+    from app.container import container
+    container.init_app(flask_app)
+    if not testing:
+        chat_repository, message_repository = container.chat_repository, container.message_repository
+        pending_delivery_repository = container.pending_delivery_repository
+        message_repository.migrate_legacy()
+        for repository in (chat_repository, message_repository):
+            repository.set_durability(
+                Config.REPOSITORY_DURABILITY,
+                flush_interval_ms=Config.REPOSITORY_FLUSH_INTERVAL_MS,
+                max_pending=Config.REPOSITORY_FLUSH_MAX_OPS,
+            )
+        start_log_compaction([message_repository, pending_delivery_repository], Config.LOG_COMPACTION_INTERVAL_SECONDS)
+        container.presence_service.start()
+        container.message_search_index.start()
     
     logger.info("Flask application created and configured successfully.")
     
     return flask_app
 
 if __name__ == "__main__":
+    # Development server only (Werkzeug, debug and reloader); production runs app.wsgi
     flask_app = create_app()
-    socketio.run(flask_app, host="0.0.0.0", port=5000, debug=True, allow_unsafe_werkzeug=True)
+    socketio.run(flask_app, host=Config.HOST, port=Config.PORT, debug=True, allow_unsafe_werkzeug=True)
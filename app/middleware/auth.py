@@ -3,18 +3,46 @@ from flask_socketio import disconnect
 import jwt
 from flask import request, jsonify, g
 from app.config.settings import Config
-from app.repository.user_repository import UserRepository
-from app.infraestructure.file_service import FileManager
-from app.infraestructure.encription_service import EncryptionManager
+from app.container import provide
+from app.domain.entities import User
 import logging
 
 logger = logging.getLogger('app')
 
+# Shared by both decorators; the cache drops a user's tokens whenever this process writes their
+# record, and checks the data_version of the users for the writes of other workers
+user_repository = provide('user_repository')
+auth_cache = provide('auth_cache')
+
+
+def _authenticate(token: str) -> User | None:
+    """
+    Resolves a JWT to its user, from the cache when the token was already verified.
+
+    Returns:
+        The user, or None if the token is valid but the user does not exist.
+
+    Raises:
+        jwt.ExpiredSignatureError, jwt.InvalidTokenError: If the token is not valid.
+    """
+    data_version = user_repository.data_version()
+    user = auth_cache.get(token, data_version)
+    if user is not None:
+        return user
+    generation = auth_cache.generation
+    logger.info("Decodificando el JWT")
+    payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM]) # type: ignore
+    user_id = payload['sub']
+    logger.info(f"JWT decodificado, id del user: {user_id}")
+    user = user_repository.find_by_id(user_id)
+    if user is not None:
+        auth_cache.put(token, user, payload.get('exp'), generation, data_version)
+    return user
+
 
 def token_required(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
-        logger.info("Iniciando tarea de validacion de token")
         token = None
         if 'Authorization' in request.headers:
             auth_header = request.headers['Authorization']
@@ -26,21 +54,7 @@ def token_required(f):
             return jsonify({'error': 'Token is missing!'}), 401
 
         try:
-            logger.info("Decodificando el JWT")
-            
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM]) # type: ignore
-            user_id = payload['sub']
-            logger.info(f"JWT decodificado, id del user: {user_id}")
-            # user_id = int(user_id) # Removed int cast
-
-            # This is not ideal as it creates a new instance every time.
-            # In a real app, you would use a dependency injection system (like Flask-Injector)
-            # or a singleton pattern to manage the repository instance.
-            file_manager = FileManager()
-            encryption_manager = EncryptionManager()
-            user_repository = UserRepository(file_manager, encryption_manager)
-            
-            current_user = user_repository.find_by_id(user_id)
+            current_user = _authenticate(token)
             if not current_user:
                 return jsonify({'error': 'User not found.'}), 401
             
@@ -93,17 +107,9 @@ def socket_token_required(f):
                 disconnect()
                 return False
 
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])  # type: ignore
-            user_id = payload["sub"]
-            logger.info(f"JWT decodificado para WebSocket, id del user: {user_id}")
-
-            file_manager = FileManager()
-            encryption_manager = EncryptionManager()
-            user_repository = UserRepository(file_manager, encryption_manager)
-
-            current_user = user_repository.find_by_id(user_id)
+            current_user = _authenticate(token)
             if not current_user:
-                logger.warning(f"Usuario no encontrado: {user_id}")
+                logger.warning("Usuario del token de WebSocket no encontrado")
                 disconnect()
                 return False
 
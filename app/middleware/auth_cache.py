@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Set
+from app.domain.entities import User
+import logging
+
+logger = logging.getLogger('app')
+
+
+class AuthCache:
+    """
+    LRU of already verified JWTs and the user each one resolves to, so an authenticated
+    request does not decode the token nor read the users file again.
+
+    Entries expire after `ttl_seconds` or when the token itself expires, whichever comes
+    first. They are dropped as soon as this process writes the user record (see
+    invalidate_users), and ignored on a hit once the users repository reports a different
+    data_version than when they were stored, i.e. another worker wrote the users. The
+    cached users are shared between requests and must be treated as read-only.
+    """
+    def __init__(self, maxsize: int = 10000, ttl_seconds: float = 60) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # token -> (user, instante monotonic en que vence, data_version de los usuarios)
+        self._entries: OrderedDict[str, tuple[User, float, Optional[tuple]]] = OrderedDict()
+        self._tokens_by_user: dict[str, set[str]] = {}
+        # Cambia con cada invalidacion; un usuario leido antes de ella no se guarda
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, token: str, data_version: Optional[tuple] = None) -> Optional[User]:
+        """
+        Returns the user of a cached token, or None on a miss, if the entry expired or if
+        it was stored under another data_version of the users repository.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at, stored_version = entry
+            if expires_at <= time.monotonic() or stored_version != data_version:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(
+        self,
+        token: str,
+        user: User,
+        token_exp: Optional[float] = None,
+        generation: Optional[int] = None,
+        data_version: Optional[tuple] = None,
+    ) -> None:
+        """
+        Caches a verified token.
+
+        Args:
+            token (str): The raw JWT.
+            user (User): The user it resolves to.
+            token_exp (float, optional): The `exp` claim of the token (Unix time).
+            generation (int, optional): The value of `generation` before the user was read;
+                if an invalidation happened since then, the user may be stale and is not cached.
+            data_version (tuple, optional): The data_version of the users repository before
+                the user was read; get only returns the entry under the same version.
+        """
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, now + token_exp - time.time())
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (user, expires_at, data_version)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_users(self, user_ids: Optional[Set[str]]) -> None:
+        """
+        Drops the tokens of the given users, or every token if user_ids is None.
+        Registered as a change listener of the users repository.
+        """
+        with self._lock:
+            self._generation += 1
+            if user_ids is None:
+                self._entries.clear()
+                self._tokens_by_user.clear()
+                return
+            for user_id in user_ids:
+                for token in self._tokens_by_user.pop(user_id, ()):
+                    self._entries.pop(token, None)
+
+    def _remove(self, token: str) -> None:
+        # El llamador tiene el lock
+        user, _, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user.id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -1,23 +1,99 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, TypeVar, Generic
-from jsonpath_ng.ext import parse
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, TypeVar, Generic
+import atexit
+import heapq
 import json
+import os
+import zlib
 from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
-from app.domain.entities import BaseEntity, DbFile
+from app.infraestructure.snapshot_cache import SnapshotCache, snapshot_cache
+from app.config.settings import Config
+from app.domain.entities import BaseEntity, DataFile, DbFile, ShardFile
+from app.repository.query import CompiledQuery, compile_query
+from app.repository.snapshot import Snapshot
+from app.repository.write_behind import Durability, FlushScheduler, pending_writes
 import logging
 
 logger = logging.getLogger('app')
 
 T = TypeVar('T', bound=BaseEntity)
 
+# Niveles de _mutation anidados por archivo; solo se modifica con el write lock tomado
+_file_lock_depth: Dict[DataFile, int] = {}
+
+# Firma de un archivo que todavia no existe: se cachea igual que la de uno existente
+_MISSING_FILE = ('missing',)
+
+
+def _normalize_timestamps(items: List[dict]) -> None:
+    """
+    Rewrites in place the datetimes stored by older versions with json's default=str
+    ('2024-01-01 10:00:00') in the ISO format written by model_dump(mode='json')
+    ('2024-01-01T10:00:00'), so ordered indexes and comparisons on them sort old and new
+    items alike.
+    """
+    for item in items:
+        for key, value in item.items():
+            # 'YYYY-MM-DD HH:MM:SS', con o sin microsegundos
+            if (
+                type(value) is str and len(value) in (19, 26) and value[10] == ' '
+                and value[4] == '-' and value[13] == ':'
+            ):
+                item[key] = f"{value[:10]}T{value[11:]}"
+
+
+class Partition(NamedTuple):
+    """
+    The files holding one partition of a repository: its snapshot file and,
+    for append-only repositories, its log.
+    """
+    db_file: DataFile
+    log_file: Optional[DataFile]
+
+
 class BaseRepository(ABC, Generic[T]):
     """
     Abstract Base Class for repositories, providing common CRUD (Create, Read, Update, Delete)
     operations for entities stored in encrypted JSON files.
     It handles reading from and writing to encrypted data files, and manages the structure
     of the data within these files.
+
+    Subclasses declare in `indexes` the attributes that get a secondary hash index, so
+    equality lookups on them do not scan the entity list, and may set `log_file` to
+    persist writes as appends to a log instead of rewriting the whole file.
+    Setting `partition_key` splits the storage into `partition_count` shard files, so
+    queries by that attribute only load the shard that holds it.
+
+    By default every mutation is written before it returns. set_durability(BATCHED) turns
+    on write-behind: mutations are applied to the cached snapshot right away and written
+    in groups, one encrypt+write per partition, with flush() as the barrier.
+
+    With STORAGE_BACKEND=sqlite, instantiating a concrete repository returns its SQLite
+    variant instead (see app.repository.sqlite_repository), which keeps this interface.
     """
+    indexes: tuple[str, ...] = ('id',)
+    # Append-only repositories persist each change as an encrypted record in this log
+    # and periodically fold it into db_file (see compact)
+    log_file: Optional[DbFile] = None
+    # Attribute used to route entities to a shard, and the number of shards
+    partition_key: Optional[str] = None
+    partition_count: int = 1
+    # Indexed attributes that the SQLite backend stores as a fingerprint instead of in clear
+    sensitive_indexes: tuple[str, ...] = ()
+    # Storage backend, "json" or "sqlite"; None follows Config.STORAGE_BACKEND
+    backend: Optional[str] = None
+    # Callbacks run after each write, per entity_name and shared by every instance of the process
+    _change_listeners: Dict[str, List[Callable[[Optional[Set[str]]], None]]] = {}
+
+    def __new__(cls, *args, **kwargs):
+        if cls.backend is None and Config.STORAGE_BACKEND == 'sqlite':
+            from app.repository.sqlite_repository import sqlite_variant
+            cls = sqlite_variant(cls)
+        return super().__new__(cls)
+
     def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager, db_file: DbFile, entity_name: str):
         """
         Initializes the BaseRepository with necessary dependencies for file management and encryption.
@@ -32,28 +108,479 @@ class BaseRepository(ABC, Generic[T]):
         self.encryption_manager = encryption_manager
         self.db_file = db_file
         self.entity_name = entity_name
+        self.snapshot_cache: SnapshotCache = snapshot_cache
+        self.partitions: List[Partition] = self._build_partitions()
+        self.durability = Durability.IMMEDIATE
+        self._max_pending = 1
+        self._flush_scheduler: Optional[FlushScheduler] = None
 
-    def _get_data(self) -> dict:
+    # ----------- Change notifications ------------------
+
+    def add_change_listener(self, listener: Callable[[Optional[Set[str]]], None]) -> None:
+        """
+        Registers a function called after every write to this entity type, from any
+        repository instance of the process, e.g. to invalidate a cache.
+
+        Args:
+            listener: Called with the IDs of the changed entities, or None when the whole
+                data was replaced.
+        """
+        self._change_listeners.setdefault(self.entity_name, []).append(listener)
+
+    def remove_change_listener(self, listener: Callable[[Optional[Set[str]]], None]) -> None:
+        """
+        Unregisters a function added with add_change_listener. Unknown listeners are ignored.
+        """
+        listeners = self._change_listeners.get(self.entity_name, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    def _notify_change(self, entity_ids: Optional[Set[str]]) -> None:
+        # Copia: un listener se puede quitar mientras se notifica
+        for listener in tuple(self._change_listeners.get(self.entity_name, ())):
+            try:
+                listener(entity_ids)
+            except Exception:
+                logger.exception(f"Change listener of {self.entity_name} failed.")
+
+    @staticmethod
+    def _record_ids(records: List[dict]) -> Set[str]:
+        return {
+            record['item'].get('id') if record['op'] == 'put' else record['id']
+            for record in BaseRepository._expand_records(records)
+        }
+
+    def data_version(self) -> Optional[tuple]:
+        """
+        Returns a token that changes when the data is reloaded from disk because another
+        process wrote it. Writes of this process keep the token and are reported to the
+        change listeners instead, so together they tell a derived view when to refresh.
+        """
+        return tuple(self._load_snapshot(partition).serial for partition in self.partitions)
+
+    # ----------- Storage layout ------------------
+
+    def _build_partitions(self) -> List[Partition]:
+        """
+        Returns the partitions of the repository. Unpartitioned repositories use db_file and
+        log_file directly; partitioned ones keep one snapshot file (and log) per shard in a
+        directory named after db_file, e.g. db/Mensajes/07.json.enc.
+        """
+        if self.partition_key is None:
+            return [Partition(self.db_file, self.log_file)]
+        directory = self.db_file.value.removesuffix('.json.enc')
+        partitions = []
+        for number in range(self.partition_count):
+            name = f"{self.db_file.name}_{number:02d}"
+            db_file = ShardFile(name, os.path.join(directory, f"{number:02d}.json.enc"))
+            log_file = None
+            if self.log_file is not None:
+                log_file = ShardFile(f"{name}_LOG", os.path.join(directory, f"{number:02d}.log.enc"))
+            partitions.append(Partition(db_file, log_file))
+        return partitions
+
+    def _partition_for_value(self, value) -> Partition:
+        """
+        Returns the partition holding the entities whose partition_key equals the value.
+        Uses crc32 rather than hash() so every process routes a value to the same shard.
+        """
+        if self.partition_key is None:
+            return self.partitions[0]
+        bucket = zlib.crc32(str(value).encode('utf-8')) % len(self.partitions)
+        return self.partitions[bucket]
+
+    def _partition_for_item(self, item: dict) -> Partition:
+        """
+        Returns the partition a stored item belongs to.
+        """
+        if self.partition_key is None:
+            return self.partitions[0]
+        return self._partition_for_value(item.get(self.partition_key))
+
+    # ----------- Reading ------------------
+
+    def _read_data(self, partition: Optional[Partition] = None) -> dict:
         """
         Reads encrypted data from the file, decrypts it, and parses it into a dictionary.
         Returns an empty dictionary with the entity_name key if the file is empty or missing.
         """
-        encrypted_data = self.file_manager.read_file(self.db_file)
+        db_file = (partition or self.partitions[0]).db_file
+        encrypted_data = self.file_manager.read_file(db_file)
         if not encrypted_data:
             return {self.entity_name: []}
         decrypted_data = self.encryption_manager.decrypt_data(encrypted_data)
-        return json.loads(decrypted_data)
+        data = json.loads(decrypted_data)
+        _normalize_timestamps(data.get(self.entity_name, []))
+        return data
+
+    def _read_log(self, partition: Partition) -> List[dict]:
+        """
+        Reads the append-only log, where each line is an individually encrypted JSON record
+        ({"op": "put", "item": {...}} or {"op": "delete", "id": ...}).
+        A line that cannot be decrypted, e.g. a record torn by a write interrupted mid-way,
+        is skipped and logged, wherever it is: later appends start on a new line, so the
+        records after it are still read.
+        """
+        if partition.log_file is None:
+            return []
+        lines = self.file_manager.read_file(partition.log_file).splitlines()
+        records = []
+        for number, line in enumerate(lines, start=1):
+            if not line:
+                continue
+            try:
+                records.append(json.loads(self.encryption_manager.decrypt_data(line)))
+            except ValueError:
+                logger.error(f"Skipping unreadable record at line {number} of {partition.log_file.name}.")
+        _normalize_timestamps([record['item'] for record in self._expand_records(records) if record.get('op') == 'put'])
+        return records
+
+    def _replay_log(self, data: dict, records: List[dict]) -> None:
+        """
+        Applies the log records, in order, on top of the data read from the snapshot file.
+        Records are idempotent, so replaying a log already folded into the snapshot is harmless.
+        """
+        items = data.setdefault(self.entity_name, [])
+        positions = {item.get('id'): position for position, item in enumerate(items)}
+        for record in self._expand_records(records):
+            if record.get('op') == 'put':
+                item = record['item']
+                position = positions.get(item.get('id'))
+                if position is None:
+                    positions[item.get('id')] = len(items)
+                    items.append(item)
+                else:
+                    items[position] = item
+            elif record.get('op') == 'delete':
+                position = positions.get(record.get('id'))
+                if position is not None:
+                    items[position] = None
+        data[self.entity_name] = [item for item in items if item is not None]
+
+    @staticmethod
+    def _expand_records(records: List[dict]):
+        """
+        Yields the records in order, unpacking the {"op": "batch", "records": [...]} records
+        written by bulk operations and write-behind flushes.
+        """
+        for record in records:
+            if record.get('op') == 'batch':
+                yield from BaseRepository._expand_records(record.get('records', []))
+            else:
+                yield record
+
+    def _signature(self, partition: Partition):
+        """
+        Returns the signature of the files backing a partition: the snapshot file and,
+        for append-only repositories, its log. A missing file has a signature too, so its
+        empty snapshot is cached (and data_version stays stable) until the file appears.
+        """
+        signature = self.file_manager.stat_file(partition.db_file)
+        if signature is None:
+            signature = _MISSING_FILE
+        if partition.log_file is None:
+            return signature
+        return (signature, self.file_manager.stat_file(partition.log_file))
+
+    def _load_snapshot(self, partition: Optional[Partition] = None) -> Snapshot:
+        """
+        Returns the snapshot of a partition with its indexes, reusing the cached one while
+        the files on disk keep the same signature (mtime, size, inode).
+        The snapshot is shared with the cache and must only be modified through its
+        append/replace/remove methods while holding the write lock.
+        Changes still waiting for a write-behind flush are replayed on top of what is read
+        from disk, so they stay visible if another process rewrites the files meanwhile.
+        """
+        partition = partition or self.partitions[0]
+        signature = self._signature(partition)
+        snapshot = self.snapshot_cache.get(partition.db_file, signature)
+        if snapshot is None:
+            data = self._read_data(partition)
+            records = self._read_log(partition)
+            pending = pending_writes.peek(partition.db_file)
+            if records or pending:
+                self._replay_log(data, records + pending)
+            snapshot = Snapshot(data, self.entity_name, self.indexes)
+            snapshot.log_length = len(records)
+            self.snapshot_cache.put(partition.db_file, signature, snapshot)
+        return snapshot
+
+    def _get_data(self) -> dict:
+        """
+        Returns a copy of all stored data that callers may modify before calling _save_data.
+
+        The dictionary and its entity list are fresh copies, so items may be appended,
+        replaced or removed. The item dictionaries themselves are shared with the cache
+        and must not be modified in place.
+        """
+        data = dict(self._load_snapshot(self.partitions[0]).data)
+        data[self.entity_name] = list(self._items())
+        return data
+
+    # ----------- Writing ------------------
+
+    def _write_lock(self, partition: Optional[Partition] = None):
+        """
+        Returns the lock that serializes writes to a partition's data file.
+        """
+        return self.snapshot_cache.write_lock((partition or self.partitions[0]).db_file)
+
+    @contextmanager
+    def _mutation(self, partition: Optional[Partition] = None):
+        """
+        Serializes a read-modify-write cycle on a partition: against other threads through
+        the write lock and against other processes through a lock on its file (the log for
+        append-only repositories), so the snapshot read inside the block is the latest one
+        on disk and concurrent modifications of another worker are not lost.
+        """
+        partition = partition or self.partitions[0]
+        lock_file = partition.log_file or partition.db_file
+        with self._write_lock(partition):
+            # flock no es reentrante entre descriptores: solo el primer nivel lo toma
+            depth = _file_lock_depth.get(lock_file, 0)
+            _file_lock_depth[lock_file] = depth + 1
+            try:
+                if depth:
+                    yield
+                else:
+                    with self.file_manager.lock_file(lock_file):
+                        yield
+            finally:
+                if depth:
+                    _file_lock_depth[lock_file] = depth
+                else:
+                    del _file_lock_depth[lock_file]
+
+    def _write_snapshot(self, snapshot: Snapshot, partition: Optional[Partition] = None) -> bool:
+        """
+        Serializes the snapshot data to JSON, encrypts it, and writes it to the file.
+        For append-only repositories the log is truncated afterwards, since the snapshot
+        already contains every record.
+        On success the snapshot becomes the cached one; on failure the cache entry is
+        dropped so the next read goes back to disk.
+
+        Args:
+            snapshot (Snapshot): The snapshot holding all entities to be saved.
+            partition (Partition): The partition the snapshot belongs to.
+
+        Returns:
+            bool: True if the files were written, False otherwise.
+        """
+        partition = partition or self.partitions[0]
+        json_data = json.dumps(snapshot.data, indent=4, default=str)
+        encrypted_data = self.encryption_manager.encrypt_data(json_data)
+        written = self.file_manager.write_file(partition.db_file, encrypted_data)
+        if written and partition.log_file is not None:
+            written = self.file_manager.write_file(partition.log_file, b'')
+            snapshot.log_length = 0
+        if written:
+            # The process that writes the file already holds its parsed contents
+            self.snapshot_cache.put(partition.db_file, self._signature(partition), snapshot)
+            # The snapshot already holds every change waiting for a write-behind flush
+            pending_writes.discard(partition.db_file)
+        else:
+            logger.error(f"Could not write {partition.db_file.name}, dropping its cached snapshot.")
+            self.snapshot_cache.invalidate(partition.db_file)
+        return written
+
+    def _append_log(self, snapshot: Snapshot, record: dict, partition: Partition) -> bool:
+        """
+        Encrypts a single record and appends it to the log, so the cost of a write does not
+        depend on how many entities are stored.
+
+        Args:
+            snapshot (Snapshot): The snapshot the record has already been applied to.
+            record (dict): The log record to persist.
+            partition (Partition): The partition the snapshot belongs to.
+
+        Returns:
+            bool: True if the record was appended, False otherwise.
+        """
+        encrypted_record = self.encryption_manager.encrypt_data(json.dumps(record, default=str))
+        if self.file_manager.append_file(partition.log_file, encrypted_record + b'\n', new_line=True):
+            snapshot.log_length += 1
+            self.snapshot_cache.put(partition.db_file, self._signature(partition), snapshot)
+            return True
+        logger.error(f"Could not append to {partition.log_file.name}, dropping its cached snapshot.")
+        self.snapshot_cache.invalidate(partition.db_file)
+        return False
+
+    def _commit(self, snapshot: Snapshot, record: dict, partition: Optional[Partition] = None) -> bool:
+        """
+        Persists a change already applied to the snapshot: as a log record for append-only
+        repositories, or by rewriting the whole file otherwise.
+        In write-behind mode the record is queued instead, and the partition is only written
+        once max_pending records are waiting or the flush interval elapses.
+        The change listeners are notified only once the record was written or queued.
+
+        Returns:
+            bool: True if the record was written or queued, False otherwise.
+        """
+        partition = partition or self.partitions[0]
+        if self.durability is Durability.BATCHED:
+            # Si el flush falla los registros vuelven a la cola, asi que siguen pendientes
+            if pending_writes.add(partition.db_file, record) >= self._max_pending:
+                self._flush_partition(partition)
+            elif self._flush_scheduler is not None:
+                self._flush_scheduler.notify()
+            written = True
+        elif partition.log_file is None:
+            written = self._write_snapshot(snapshot, partition)
+        else:
+            written = self._append_log(snapshot, record, partition)
+        if written:
+            self._notify_change(self._record_ids([record]))
+        return written
+
+    def _flush_partition(self, partition: Partition) -> bool:
+        """
+        Writes the changes waiting for a partition with a single encrypt+write: one batch
+        record appended to the log, or the whole snapshot file. Must be called holding the
+        partition's mutation lock. If the write fails the records are queued again.
+
+        Returns:
+            bool: True if there was nothing to write or it was written, False otherwise.
+        """
+        # Se carga antes de sacar los registros, para que una recarga desde disco los incluya
+        snapshot = self._load_snapshot(partition)
+        records = pending_writes.take(partition.db_file)
+        if not records:
+            return True
+        if partition.log_file is None:
+            written = self._write_snapshot(snapshot, partition)
+        else:
+            written = self._append_log(snapshot, {'op': 'batch', 'records': records}, partition)
+        if not written:
+            pending_writes.restore(partition.db_file, records)
+        return written
+
+    def flush(self) -> bool:
+        """
+        Writes every change still waiting in write-behind mode. When it returns, all the
+        mutations made before the call are on disk (or the write failed and they remain
+        queued), so callers can use it as a durability barrier.
+
+        Returns:
+            bool: True if every partition was written, False otherwise.
+        """
+        flushed = True
+        for partition in self.partitions:
+            if not pending_writes.count(partition.db_file):
+                continue
+            with self._mutation(partition):
+                flushed = self._flush_partition(partition) and flushed
+        return flushed
+
+    def set_durability(self, durability: Durability, flush_interval_ms: int = 50, max_pending: int = 100) -> None:
+        """
+        Chooses when mutations reach the disk.
+
+        Args:
+            durability (Durability): IMMEDIATE writes each mutation before it returns;
+                BATCHED applies it to the cached snapshot and writes in groups.
+            flush_interval_ms (int): In BATCHED mode, how long mutations are coalesced
+                before a background flush.
+            max_pending (int): In BATCHED mode, how many queued mutations of a partition
+                trigger a flush right away.
+        """
+        durability = Durability(durability)
+        if self._flush_scheduler is not None:
+            self._flush_scheduler.stop()
+            self._flush_scheduler = None
+        if durability is Durability.IMMEDIATE:
+            self.durability = durability
+            self._max_pending = 1
+            atexit.unregister(self.flush)
+            self.flush()
+            return
+        if self.durability is Durability.IMMEDIATE:
+            # Al terminar el proceso se escribe lo que quede pendiente
+            atexit.register(self.flush)
+        self._max_pending = max(1, max_pending)
+        self.durability = durability
+        if flush_interval_ms > 0:
+            self._flush_scheduler = FlushScheduler(self.flush, flush_interval_ms, f"flush-{self.db_file.name}")
 
     def _save_data(self, data: dict):
         """
-        Serializes the given data dictionary to JSON, encrypts it, and writes it to the file.
+        Serializes the given data dictionary to JSON, encrypts it, and writes it to the file,
+        one file per partition. Indexes are rebuilt from scratch; prefer add/update/delete,
+        which maintain them incrementally.
 
         Args:
             data (dict): The dictionary containing all entities to be saved.
         """
-        json_data = json.dumps(data, indent=4, default=str)
-        encrypted_data = self.encryption_manager.encrypt_data(json_data)
-        self.file_manager.write_file(self.db_file, encrypted_data)
+        grouped = {partition: [] for partition in self.partitions}
+        for item in data.get(self.entity_name, []):
+            grouped[self._partition_for_item(item)].append(item)
+        written = False
+        for partition, items in grouped.items():
+            with self._mutation(partition):
+                partition_data = {**data, self.entity_name: items}
+                written = self._write_snapshot(Snapshot(partition_data, self.entity_name, self.indexes), partition) or written
+        if written:
+            self._notify_change(None)
+
+    def compact(self) -> bool:
+        """
+        Folds the append-only log of every partition into its snapshot file and truncates it.
+
+        Returns:
+            bool: True if there were log records to fold, False otherwise.
+        """
+        compacted = False
+        for partition in self.partitions:
+            if partition.log_file is None:
+                continue
+            with self._mutation(partition):
+                snapshot = self._load_snapshot(partition)
+                if not snapshot.log_length:
+                    continue
+                pending = snapshot.log_length
+                self._write_snapshot(snapshot, partition)
+            logger.info(f"Compacted {pending} log records into {partition.db_file.name}.")
+            compacted = True
+        return compacted
+
+    def migrate_legacy(self) -> int:
+        """
+        Moves the entities of the unpartitioned db_file (and its log) into the shard files,
+        and keeps the old files as '.bak'. Does nothing for unpartitioned repositories or
+        when there is nothing left to migrate.
+
+        Returns:
+            int: The number of migrated entities.
+        """
+        if self.partition_key is None:
+            return 0
+        legacy = Partition(self.db_file, self.log_file)
+        if self.file_manager.stat_file(legacy.db_file) is None and (
+            legacy.log_file is None or self.file_manager.stat_file(legacy.log_file) is None
+        ):
+            return 0
+        data = self._read_data(legacy)
+        self._replay_log(data, self._read_log(legacy))
+        items = data.get(self.entity_name, [])
+        grouped = {partition: [] for partition in self.partitions}
+        for item in items:
+            grouped[self._partition_for_item(item)].append(item)
+        for partition, partition_items in grouped.items():
+            if not partition_items:
+                continue
+            with self._mutation(partition):
+                snapshot = self._load_snapshot(partition)
+                for item in partition_items:
+                    current = snapshot.get(item.get('id'))
+                    if current is None:
+                        snapshot.append(item)
+                    else:
+                        snapshot.replace(current, item)
+                self._write_snapshot(snapshot, partition)
+        for legacy_file in (legacy.db_file, legacy.log_file):
+            if legacy_file is not None and self.file_manager.stat_file(legacy_file) is not None:
+                self.file_manager.backup_file(legacy_file)
+        logger.info(f"Migrated {len(items)} {self.entity_name} from {self.db_file.name} into {len(self.partitions)} shards.")
+        return len(items)
 
     @abstractmethod
     def _to_entity(self, item: dict) -> T:
@@ -69,6 +596,167 @@ class BaseRepository(ABC, Generic[T]):
         """
         pass
 
+    # ----------- Queries ------------------
+
+    def _items(self) -> List[dict]:
+        """
+        Returns the stored items of every partition. For unpartitioned repositories the list
+        is shared with the cache, so it must be treated as read-only.
+        """
+        if len(self.partitions) == 1:
+            return self._load_snapshot(self.partitions[0]).items
+        items = []
+        for partition in self.partitions:
+            items.extend(self._load_snapshot(partition).items)
+        return items
+
+    def _partitions_for(self, plan: CompiledQuery, params: tuple) -> List[Partition]:
+        """
+        Returns the partitions a compiled query has to look at: only one when the query
+        has an equality condition on the partition key, every partition otherwise.
+        """
+        if self.partition_key is not None:
+            for position, (attribute, symbol) in enumerate(plan.conditions):
+                if attribute == self.partition_key and symbol == '==':
+                    return [self._partition_for_value(params[position])]
+        return self.partitions
+
+    def _select(self, plan: CompiledQuery, params: tuple) -> List[dict]:
+        """
+        Returns the stored items a compiled query has to check. When the query has
+        equality (or `has`) conditions on indexed attributes, only the smallest of their
+        index buckets is returned instead of the whole entity list.
+        """
+        partitions = self._partitions_for(plan, params)
+        candidates = []
+        for partition in partitions:
+            snapshot = self._load_snapshot(partition)
+            best = None
+            for position, (attribute, symbol) in enumerate(plan.conditions):
+                if symbol in ('==', 'has') and snapshot.has_index(attribute):
+                    try:
+                        size = snapshot.bucket_size(attribute, params[position])
+                    except TypeError:
+                        continue
+                    if best is None or size < best[0]:
+                        best = (size, attribute, params[position])
+            selected = snapshot.lookup(best[1], best[2]) if best is not None else snapshot.items
+            if len(partitions) == 1:
+                return selected
+            candidates.extend(selected)
+        return candidates
+
+    def _select_ordered(self, attribute: str, value, sort_attribute: str) -> List[tuple]:
+        """
+        Returns the items whose attribute equals the value as (sort value, id, item) tuples,
+        sorted by sort_attribute and then by id, from the ordered index of the snapshot, so
+        callers can bisect them instead of sorting the whole group on every read.
+        """
+        if attribute == self.partition_key:
+            return self._load_snapshot(self._partition_for_value(value)).ordered(attribute, value, sort_attribute)
+        entries = []
+        for partition in self.partitions:
+            entries.extend(self._load_snapshot(partition).ordered(attribute, value, sort_attribute))
+        if len(self.partitions) > 1:
+            entries.sort(key=lambda entry: entry[:2])
+        return entries
+
+    def _locate(self, entity_id, item: Optional[dict] = None) -> tuple[Partition, Snapshot, Optional[dict]]:
+        """
+        Finds the partition and snapshot holding an entity by its id. When the new version of
+        the item is given, its partition is checked first.
+
+        Returns:
+            The partition, its snapshot and the stored item (None if it was not found, in
+            which case the partition is where the entity would go).
+        """
+        expected = self._partition_for_item(item) if item is not None else self.partitions[0]
+        snapshot = self._load_snapshot(expected)
+        current = snapshot.get(entity_id)
+        if current is not None or len(self.partitions) == 1:
+            return expected, snapshot, current
+        for partition in self.partitions:
+            if partition is expected:
+                continue
+            other = self._load_snapshot(partition)
+            current = other.get(entity_id)
+            if current is not None:
+                return partition, other, current
+        return expected, snapshot, None
+
+    def query(self, shape: str, *params) -> List[T]:
+        """
+        Finds all entities matching a compiled query shape with bound parameters.
+
+        Args:
+            shape (str): The predicate shape, e.g. 'conversation_id == ? & delivered == ?'.
+            *params: The values bound to each '?' placeholder, in order.
+
+        Returns:
+            List[T]: A list of found entities.
+        """
+        plan = compile_query(shape)
+        matches = plan.filter(self._select(plan, params), *params)
+        return [self._to_entity(item) for item in matches]
+
+    def query_first(self, shape: str, *params) -> Optional[T]:
+        """
+        Finds the first entity matching a compiled query shape with bound parameters.
+
+        Returns:
+            Optional[T]: The found entity, or None if no entity matches.
+        """
+        plan = compile_query(shape)
+        item = plan.first(self._select(plan, params), *params)
+        return self._to_entity(item) if item is not None else None
+
+    def count(self, shape: str, *params) -> int:
+        """
+        Counts the entities matching a compiled query shape without building them.
+
+        Returns:
+            int: The number of matching entities.
+        """
+        plan = compile_query(shape)
+        return plan.count(self._select(plan, params), *params)
+
+    def query_page(self, shape: Optional[str], *params, after: Optional[str] = None, limit: int = 20,
+                   fields: Optional[Sequence[str]] = None) -> tuple[list, bool]:
+        """
+        Returns a page of the entities matching a query shape, ordered by id: the `limit`
+        first ones whose id is greater than `after`. Only the page is sorted (partially,
+        with a heap) and built, so a page costs the candidates of the query, not the
+        whole entity list.
+
+        Args:
+            shape (str, optional): The predicate shape, or None for every entity.
+            *params: The values bound to each '?' placeholder, in order.
+            after (str, optional): The id of the last entity of the previous page.
+            limit (int): The size of the page.
+            fields (Sequence[str], optional): When given, the page holds dicts with only
+                these attributes, read from the stored items without building the
+                entities (missing attributes are None).
+
+        Returns:
+            tuple[list, bool]: The entities (or projected dicts) of the page, and whether
+            there are more after it.
+        """
+        # El keyset es una condicion mas: 'id > ?' con '' incluye todos los ids
+        shape = f'{shape} & id > ?' if shape else 'id > ?'
+        params = (*params, after or '')
+        plan = compile_query(shape)
+        matches = plan.filter(self._select(plan, params), *params)
+        page = heapq.nsmallest(limit + 1, matches, key=itemgetter('id'))
+        has_more = len(page) > limit
+        page = page[:limit]
+        if fields is not None:
+            # Las listas se copian: los items son los del snapshot compartido
+            return [
+                {field: list(value) if isinstance(value := item.get(field), list) else value for field in fields}
+                for item in page
+            ], has_more
+        return [self._to_entity(item) for item in page], has_more
+
     def find_all(self) -> List[T]:
         """
         Retrieves all entities of the specified type from the repository.
@@ -76,10 +764,7 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             List[T]: A list of domain entity objects.
         """
-        data = self._get_data()
-        jsonpath_expression = parse(f'$.{self.entity_name}[*]')
-        matches = jsonpath_expression.find(data)
-        return [self._to_entity(match.value) for match in matches]
+        return [self._to_entity(item) for item in self._items()]
 
     def find_by_attribute(self, attribute: str, value) -> Optional[T]:
         """
@@ -92,13 +777,7 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             Optional[T]: The found entity, or None if no entity matches.
         """
-        data = self._get_data()
-        query_value = f'"{value}"' if isinstance(value, str) else value
-        jsonpath_expression = parse(f'$.{self.entity_name}[?(@.{attribute} == {query_value})]')
-        matches = jsonpath_expression.find(data)
-        if matches:
-            return self._to_entity(matches[0].value)
-        return None
+        return self.query_first(f'{attribute} == ?', value)
 
     def find_many_by_attribute(self, attribute: str, value) -> List[T]:
         """
@@ -111,11 +790,25 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             List[T]: A list of found entities.
         """
-        data = self._get_data()
-        query_value = f'"{value}"' if isinstance(value, str) else value
-        jsonpath_expression = parse(f'$.{self.entity_name}[?(@.{attribute} == {query_value})]')
-        matches = jsonpath_expression.find(data)
-        return [self._to_entity(match.value) for match in matches]
+        return self.query(f'{attribute} == ?', value)
+
+    def find_by_ids(self, entity_ids: List[str]) -> Dict[str, T]:
+        """
+        Finds several entities by their IDs with one index lookup each.
+
+        Args:
+            entity_ids (List[str]): The IDs of the entities to find.
+
+        Returns:
+            Dict[str, T]: The found entities keyed by ID; missing IDs are left out.
+        """
+        plan = compile_query('id == ?')
+        found = {}
+        for entity_id in dict.fromkeys(entity_ids):
+            item = plan.first(self._select(plan, (entity_id,)), entity_id)
+            if item is not None:
+                found[entity_id] = self._to_entity(item)
+        return found
 
     def find_by_id(self, entity_id: str) -> Optional[T]:
         """
@@ -129,6 +822,8 @@ class BaseRepository(ABC, Generic[T]):
         """
         return self.find_by_attribute('id', entity_id)
 
+    # ----------- Mutations ------------------
+
     def add(self, entity: T) -> T:
         """
         Adds a new entity to the repository.
@@ -139,9 +834,12 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             T: The added entity object.
         """
-        data = self._get_data()
-        data[self.entity_name].append(entity.model_dump())
-        self._save_data(data)
+        item = entity.model_dump(mode='json')
+        partition = self._partition_for_item(item)
+        with self._mutation(partition):
+            snapshot = self._load_snapshot(partition)
+            snapshot.append(item)
+            self._commit(snapshot, {'op': 'put', 'item': item}, partition)
         return entity
 
     def update(self, entity: T) -> Optional[T]:
@@ -154,13 +852,23 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             Optional[T]: The updated entity object if found and updated, otherwise None.
         """
-        data = self._get_data()
-        query_id = f'"{entity.id}"' if isinstance(entity.id, str) else entity.id
-        jsonpath_expression = parse(f'$.{self.entity_name}[?(@.id == {query_id})]')
-        if jsonpath_expression.update(data, entity.model_dump()):
-            self._save_data(data)
-            return entity
-        return None
+        item = entity.model_dump(mode='json')
+        partition, _, current = self._locate(entity.id, item)
+        if current is None:
+            return None
+        target = self._partition_for_item(item)
+        if partition != target:
+            # Cambio la llave de particion: se mueve el item de shard
+            self.delete(entity.id)
+            return self.add(entity)
+        with self._mutation(partition):
+            snapshot = self._load_snapshot(partition)
+            current = snapshot.get(entity.id)
+            if current is None:
+                return None
+            snapshot.replace(current, item)
+            self._commit(snapshot, {'op': 'put', 'item': item}, partition)
+        return entity
 
     def delete(self, entity_id: str) -> bool:
         """
@@ -172,12 +880,265 @@ class BaseRepository(ABC, Generic[T]):
         Returns:
             bool: True if the entity was found and deleted, False otherwise.
         """
-        data = self._get_data()
-        query_id = f'"{entity_id}"' if isinstance(entity_id, str) else entity_id
-        jsonpath_expression = parse(f'$.{self.entity_name}[?(@.id == {query_id})]')
-        if jsonpath_expression.find(data):
-            updated_items = [item for item in data[self.entity_name] if item['id'] != entity_id]
-            data[self.entity_name] = updated_items
-            self._save_data(data)
+        partition, _, current = self._locate(entity_id)
+        if current is None:
+            return False
+        with self._mutation(partition):
+            snapshot = self._load_snapshot(partition)
+            current = snapshot.get(entity_id)
+            if current is None:
+                return False
+            snapshot.remove(current)
+            self._commit(snapshot, {'op': 'delete', 'id': entity_id}, partition)
+        return True
+
+    def modify(self, entity_id: str, change: Callable[[T], object], default: Optional[Callable[[], T]] = None) -> Optional[T]:
+        """
+        Reads, changes and writes an entity while holding its write lock and the file lock
+        of its partition, so concurrent modifications (e.g. two counters of the same record)
+        are not lost, even when they come from different worker processes.
+
+        Args:
+            entity_id (str): The ID of the entity to modify.
+            change (Callable[[T], object]): Function that modifies the entity in place.
+            default (Callable[[], T], optional): Builds the entity (with this ID) when it is
+                not stored, so it is created and changed under the same lock.
+
+        Returns:
+            Optional[T]: The modified entity, or None if it was not found and no default
+            was given.
+
+        Raises:
+            ValueError: If the change moves the entity to another partition.
+        """
+        partition, _, current = self._locate(entity_id)
+        if current is None:
+            if default is None:
+                return None
+            partition = self._partition_for_item(default().model_dump(mode='json'))
+        with self._mutation(partition):
+            snapshot = self._load_snapshot(partition)
+            current = snapshot.get(entity_id)
+            if current is None and default is None:
+                return None
+            entity = self._to_entity(current) if current is not None else default()
+            change(entity)
+            item = entity.model_dump(mode='json')
+            if self._partition_for_item(item) != partition:
+                raise ValueError(f"modify cannot change the {self.partition_key} of {entity_id}.")
+            if current is None:
+                snapshot.append(item)
+            else:
+                snapshot.replace(current, item)
+            self._commit(snapshot, {'op': 'put', 'item': item}, partition)
+        return entity
+
+    def modify_many(self, entity_ids: List[str], change: Callable[[T], object]) -> List[T]:
+        """
+        Applies the same read-modify-write to several entities with a single write per
+        partition, holding each partition's write lock while it is changed.
+
+        Args:
+            entity_ids (List[str]): The IDs of the entities to modify.
+            change (Callable[[T], object]): Function that modifies an entity in place.
+
+        Returns:
+            List[T]: The modified entities. IDs that were not found are skipped.
+
+        Raises:
+            ValueError: If the change moves an entity to another partition.
+        """
+        grouped = {}
+        for entity_id in dict.fromkeys(entity_ids):
+            partition, _, current = self._locate(entity_id)
+            if current is not None:
+                grouped.setdefault(partition, []).append(entity_id)
+        modified = []
+        for partition, ids in grouped.items():
+            with self._mutation(partition):
+                snapshot = self._load_snapshot(partition)
+                # Todos los cambios se calculan antes de tocar el snapshot compartido: si change
+                # falla o mueve una entidad de particion, el cache queda igual que el disco
+                changed = []
+                for entity_id in ids:
+                    current = snapshot.get(entity_id)
+                    if current is None:
+                        continue
+                    entity = self._to_entity(current)
+                    change(entity)
+                    item = entity.model_dump(mode='json')
+                    if self._partition_for_item(item) != partition:
+                        raise ValueError(f"modify cannot change the {self.partition_key} of {entity_id}.")
+                    changed.append((current, item, entity))
+                records = []
+                for current, item, entity in changed:
+                    snapshot.replace(current, item)
+                    records.append({'op': 'put', 'item': item})
+                    modified.append(entity)
+                if len(records) == 1:
+                    self._commit(snapshot, records[0], partition)
+                elif records:
+                    self._commit(snapshot, {'op': 'batch', 'records': records}, partition)
+        return modified
+
+    # ----------- Bulk mutations ------------------
+
+    @staticmethod
+    def _apply_record(snapshot: Snapshot, record: dict, must_exist: bool = False) -> bool:
+        """
+        Applies a put or delete record to the snapshot, matching the stored item by id
+        through the index.
+
+        Args:
+            snapshot (Snapshot): The snapshot to modify, under its mutation lock.
+            record (dict): The record to apply.
+            must_exist (bool): If True, a put whose entity is not stored is ignored.
+
+        Returns:
+            bool: True if the snapshot changed, False otherwise.
+        """
+        if record['op'] == 'put':
+            item = record['item']
+            current = snapshot.get(item.get('id'))
+            if current is None:
+                if must_exist:
+                    return False
+                snapshot.append(item)
+            else:
+                snapshot.replace(current, item)
             return True
-        return False
+        current = snapshot.get(record['id'])
+        if current is None:
+            return False
+        snapshot.remove(current)
+        return True
+
+    def _write_many(self, changes: dict, must_exist: frozenset = frozenset()) -> List[dict]:
+        """
+        Applies groups of records with one load and one commit per partition. Several
+        records are persisted as a single batch record (or a single file rewrite).
+
+        Args:
+            changes (dict): The records to apply, keyed by partition.
+            must_exist (frozenset): IDs whose puts are ignored if the entity is not stored.
+
+        Returns:
+            List[dict]: The records that changed the data.
+        """
+        applied = []
+        for partition, records in changes.items():
+            if not records:
+                continue
+            with self._mutation(partition):
+                snapshot = self._load_snapshot(partition)
+                partition_applied = [
+                    record for record in records
+                    if self._apply_record(snapshot, record, record.get('item', {}).get('id') in must_exist)
+                ]
+                if not partition_applied:
+                    continue
+                if len(partition_applied) == 1:
+                    self._commit(snapshot, partition_applied[0], partition)
+                else:
+                    self._commit(snapshot, {'op': 'batch', 'records': partition_applied}, partition)
+            applied.extend(partition_applied)
+        return applied
+
+    def save_changes(self, added: List[T] = (), updated: List[T] = (), deleted: List[str] = ()) -> List[dict]:
+        """
+        Adds, updates and deletes entities with a single write per partition. Updated
+        entities that are not stored and deleted IDs that do not exist are skipped; an
+        updated entity whose partition key changed is moved to its new shard.
+
+        Args:
+            added (List[T]): The domain entity objects to add.
+            updated (List[T]): The domain entity objects with updated data.
+            deleted (List[str]): The IDs of the entities to delete.
+
+        Returns:
+            List[dict]: The put and delete records that changed the data.
+        """
+        changes = {}
+        must_exist = set()
+        for entity in added:
+            item = entity.model_dump(mode='json')
+            changes.setdefault(self._partition_for_item(item), []).append({'op': 'put', 'item': item})
+        for entity in updated:
+            item = entity.model_dump(mode='json')
+            partition, _, current = self._locate(entity.id, item)
+            if current is None:
+                continue
+            target = self._partition_for_item(item)
+            if partition != target:
+                # Cambio la llave de particion: se mueve el item de shard
+                changes.setdefault(partition, []).append({'op': 'delete', 'id': entity.id})
+            else:
+                must_exist.add(entity.id)
+            changes.setdefault(target, []).append({'op': 'put', 'item': item})
+        for entity_id in dict.fromkeys(deleted):
+            partition, _, current = self._locate(entity_id)
+            if current is not None:
+                changes.setdefault(partition, []).append({'op': 'delete', 'id': entity_id})
+        return self._write_many(changes, frozenset(must_exist))
+
+    def add_many(self, entities: List[T]) -> List[T]:
+        """
+        Adds several entities with a single write per partition.
+
+        Args:
+            entities (List[T]): The domain entity objects to add.
+
+        Returns:
+            List[T]: The added entity objects.
+        """
+        self.save_changes(added=entities)
+        return list(entities)
+
+    def update_many(self, entities: List[T]) -> List[T]:
+        """
+        Updates several existing entities with a single write per partition.
+        Entities that are not stored are skipped.
+
+        Args:
+            entities (List[T]): The domain entity objects with updated data.
+
+        Returns:
+            List[T]: The entities that were found and updated.
+        """
+        applied = self.save_changes(updated=entities)
+        updated_ids = {record['item']['id'] for record in applied if record['op'] == 'put'}
+        return [entity for entity in entities if entity.id in updated_ids]
+
+    def upsert_many(self, entities: List[T]) -> List[T]:
+        """
+        Adds or updates several entities with a single write per partition.
+
+        Args:
+            entities (List[T]): The domain entity objects to store.
+
+        Returns:
+            List[T]: The stored entity objects.
+        """
+        changes = {}
+        for entity in entities:
+            item = entity.model_dump(mode='json')
+            target = self._partition_for_item(item)
+            if len(self.partitions) > 1:
+                partition, _, current = self._locate(entity.id, item)
+                if current is not None and partition != target:
+                    changes.setdefault(partition, []).append({'op': 'delete', 'id': entity.id})
+            changes.setdefault(target, []).append({'op': 'put', 'item': item})
+        self._write_many(changes)
+        return list(entities)
+
+    def delete_many(self, entity_ids: List[str]) -> int:
+        """
+        Deletes several entities by their IDs with a single write per partition.
+
+        Args:
+            entity_ids (List[str]): The IDs of the entities to delete.
+
+        Returns:
+            int: The number of entities that were found and deleted.
+        """
+        return len(self.save_changes(deleted=entity_ids))
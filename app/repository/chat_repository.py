@@ -1,5 +1,4 @@
 from typing import List, Optional
-from jsonpath_ng.ext import parse
 from app.domain.entities import Chat, DbFile
 from app.repository.base_repository import BaseRepository
 from app.infraestructure.file_service import FileManager
@@ -11,6 +10,8 @@ class ChatRepository(BaseRepository[Chat]):
     It handles CRUD operations for Chat objects, leveraging the generic functionality
     provided by BaseRepository.
     """
+    indexes = ('id', 'user_a', 'user_b')
+
     def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
         """
         Initializes the ChatRepository.
@@ -31,7 +32,7 @@ class ChatRepository(BaseRepository[Chat]):
         Returns:
             Chat: A Chat domain entity.
         """
-        return Chat(**item)
+        return Chat.from_storage(item)
 
     def find_chat_by_users(self, user_id_1: str, user_id_2: str) -> Optional[Chat]:
         """
@@ -58,21 +59,9 @@ class ChatRepository(BaseRepository[Chat]):
         Returns:
             List[Chat]: A list of chats involving the user.
         """
-        data = self._get_data()
-
-        # Hacemos dos queries independientes porque jsonpath_ng NO soporta OR ni '|'
-        q_a = parse(f'$.{self.entity_name}[?(@.user_a == "{user_id}")]')
-        q_b = parse(f'$.{self.entity_name}[?(@.user_b == "{user_id}")]')
-
-        matches = q_a.find(data) + q_b.find(data)
+        # Dos queries independientes porque las condiciones solo se combinan con AND
+        matches = self.query('user_a == ?', user_id) + self.query('user_b == ?', user_id)
 
         # Eliminar duplicados usando el id del chat
-        unique_by_id = {}
-        for m in matches:
-            value = m.value
-            chat_id = value.get("id")
-            if chat_id:
-                unique_by_id[chat_id] = value
-
-        # Convertir a entidades internas
-        return [self._to_entity(chat_dict) for chat_dict in unique_by_id.values()]
+        unique_by_id = {chat.id: chat for chat in matches}
+        return list(unique_by_id.values())
@@ -1,15 +1,65 @@
-from typing import List
+import base64
+import bisect
+import json
+from typing import List, NamedTuple, Optional
+from app.config.settings import Config
 from app.domain.entities import Message, DbFile
 from app.repository.base_repository import BaseRepository
 from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
-from jsonpath_ng.ext import parse
+
+class MessagePage(NamedTuple):
+    """
+    A window of the history of a conversation, oldest message first.
+
+    prev_cursor is passed as `before` to get the older messages and next_cursor as `since`
+    to get the newer ones. has_more tells whether there are more messages past the page in
+    the direction it was read (newer for `since`, older otherwise).
+    """
+    messages: List[Message]
+    has_more: bool
+    prev_cursor: Optional[str]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(timestamp: str, message_id: str) -> str:
+    """
+    Builds the opaque cursor of a position in a conversation from the stored timestamp
+    and id of a message. The message does not need to exist when the cursor is used.
+    """
+    raw = json.dumps([timestamp, message_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Returns the (timestamp, message id) of a cursor built by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, message_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid message cursor: {cursor!r}") from e
+    if not isinstance(timestamp, str) or not isinstance(message_id, str):
+        raise ValueError(f"Invalid message cursor: {cursor!r}")
+    return timestamp, message_id
+
 
 class MessageRepository(BaseRepository[Message]):
     """
     MessageRepository is a concrete implementation of BaseRepository specifically for Message entities.
     It handles CRUD operations for Message objects and provides custom methods for message retrieval.
     """
+    indexes = ('id', 'conversation_id')
+    # Cada mensaje enviado es un append al log, no una reescritura de todo el archivo
+    log_file = DbFile.MESSAGES_LOG
+    # Un shard por grupo de conversaciones: abrir un chat solo desencripta su shard
+    partition_key = 'conversation_id'
+    partition_count = Config.MESSAGE_SHARDS
+
     def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
         """
         Initializes the MessageRepository.
@@ -30,39 +80,64 @@ class MessageRepository(BaseRepository[Message]):
         Returns:
             Message: A Message domain entity.
         """
-        return Message(**item)
+        return Message.from_storage(item)
 
-    def find_many_by_attribute(self, attribute: str, value: str) -> List[Message]:
+    def find_by_conversation_id(self, conversation_id: str) -> List[Message]:
         """
-        Finds all entities with a specific attribute and its value.
+        Finds all messages in a conversation, sorted by timestamp.
 
         Args:
-            attribute (str): The name of the attribute to search by.
-            value (str): The value of the attribute to match.
+            conversation_id (str): The ID of the conversation.
 
         Returns:
-            List[Message]: A list of found entities.
+            List[Message]: A list of messages in the conversation.
         """
-        data = self._get_data()
-        query_value = f'"{value}"' if isinstance(value, str) else value
-        jsonpath_expression = parse(f'$.{self.entity_name}[?(@.{attribute} == {query_value})]')
-        matches = jsonpath_expression.find(data)
-        return [self._to_entity(match.value) for match in matches]
+        entries = self._select_ordered('conversation_id', conversation_id, 'timestamp')
+        return [self._to_entity(item) for _, _, item in entries]
 
-    def find_by_conversation_id(self, conversation_id: str) -> List[Message]:
+    def find_page(self, conversation_id: str, since: Optional[str] = None, before: Optional[str] = None,
+                  limit: Optional[int] = None) -> MessagePage:
         """
-        Finds all messages in a conversation, sorted by timestamp.
+        Finds a window of a conversation by cursor, using the per-conversation index sorted
+        by timestamp, so only the messages of the page are built.
+
+        With `since`, returns the (at most `limit`) oldest messages after it, to sync a
+        client that already has the history up to the cursor. Otherwise returns the newest
+        `limit` messages, before `before` if given, to scroll back. Both can be combined
+        to read a bounded range.
 
         Args:
             conversation_id (str): The ID of the conversation.
+            since (str, optional): Only messages after this cursor (exclusive).
+            before (str, optional): Only messages before this cursor (exclusive).
+            limit (int, optional): The maximum number of messages. None returns them all.
 
         Returns:
-            List[Message]: A list of messages in the conversation.
+            MessagePage: The messages of the page, sorted by timestamp, and its cursors.
+
+        Raises:
+            ValueError: If a cursor is malformed.
         """
-        messages = self.find_many_by_attribute('conversation_id', conversation_id)
-        # Sort messages by timestamp
-        messages.sort(key=lambda x: x.timestamp)
-        return messages
+        since_key = decode_cursor(since) if since else None
+        before_key = decode_cursor(before) if before else None
+        entries = self._select_ordered('conversation_id', conversation_id, 'timestamp')
+
+        def position(entry: tuple) -> tuple:
+            # (timestamp, id) de cada entrada, lo mismo que guarda un cursor
+            return entry[:2]
+
+        start = bisect.bisect_right(entries, since_key, key=position) if since_key else 0
+        end = bisect.bisect_left(entries, before_key, key=position) if before_key else len(entries)
+        window = entries[start:end] if start < end else []
+        has_more = limit is not None and len(window) > limit
+        if has_more:
+            window = window[:limit] if since_key else window[len(window) - limit:]
+        return MessagePage(
+            messages=[self._to_entity(item) for _, _, item in window],
+            has_more=has_more,
+            prev_cursor=encode_cursor(*window[0][:2]) if window else before,
+            next_cursor=encode_cursor(*window[-1][:2]) if window else since,
+        )
 
     def count_unread_by_chat(self, chat_id: str, user_id: str) -> int:
         """
@@ -76,13 +151,9 @@ class MessageRepository(BaseRepository[Message]):
         Returns:
             int: The number of unread messages.
         """
-        data = self._get_data()
-        # Correct JSONPath using `&` for AND logic within a filter expression.
-        query = (f'$.{self.entity_name}[?(@.conversation_id == "{chat_id}" & '
-                 f'@.sender_id != "{user_id}" & @.delivered == false)]')
-        jsonpath_expression = parse(query)
-        matches = jsonpath_expression.find(data)
-        return len(matches)
+        return self.count(
+            'conversation_id == ? & sender_id != ? & delivered == ?', chat_id, user_id, False
+        )
 
     def find_last_by_conversation_id(self, conversation_id: str) -> Message | None:
         """
@@ -94,9 +165,5 @@ class MessageRepository(BaseRepository[Message]):
         Returns:
             Message | None: The last message in the conversation, or None if no messages are found.
         """
-        messages = self.find_many_by_attribute('conversation_id', conversation_id)
-        if not messages:
-            return None
-        # Sort messages by timestamp
-        messages.sort(key=lambda x: x.timestamp, reverse=True)
-        return messages[0]
+        entries = self._select_ordered('conversation_id', conversation_id, 'timestamp')
+        return self._to_entity(entries[-1][2]) if entries else None
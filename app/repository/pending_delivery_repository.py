@@ -0,0 +1,103 @@
+import bisect
+from datetime import datetime
+from typing import List
+from app.domain.entities import DbFile, PendingDelivery
+from app.repository.base_repository import BaseRepository
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+
+
+class PendingDeliveryRepository(BaseRepository[PendingDelivery]):
+    """
+    Per-user queue of the messages sent while the user was offline, stored as one
+    PendingDelivery per user (its id is the user's id), so they can be notified in a
+    single batch when the user connects again.
+    """
+    # Encolar un mensaje agrega un registro al log, no reescribe las colas de todos
+    log_file = DbFile.PENDING_DELIVERIES_LOG
+    def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
+        """
+        Initializes the PendingDeliveryRepository.
+
+        Args:
+            file_manager (FileManager): Service to handle file read/write operations.
+            encryption_manager (EncryptionManager): Service to handle data encryption/decryption.
+        """
+        super().__init__(file_manager, encryption_manager, DbFile.PENDING_DELIVERIES, 'pending_deliveries')
+
+    def _to_entity(self, item: dict) -> PendingDelivery:
+        """
+        Converts a dictionary representation of a queue into a PendingDelivery domain entity object.
+        """
+        return PendingDelivery.from_storage(item)
+
+    def enqueue(self, user_id: str, chat_id: str, message_id: str, timestamp: datetime,
+                max_messages: int = 500) -> PendingDelivery:
+        """
+        Adds a message to the queue of a user, creating the queue if needed. Once the queue
+        holds max_messages, the oldest messages are dropped, whatever their chat.
+
+        Args:
+            user_id (str): The ID of the offline recipient.
+            chat_id (str): The ID of the chat of the message.
+            message_id (str): The ID of the message.
+            timestamp (datetime): When the message was sent.
+            max_messages (int): Maximum number of queued messages per user.
+
+        Returns:
+            PendingDelivery: The updated queue.
+        """
+        entry = [timestamp.isoformat(), chat_id, message_id]
+
+        def add(queue: PendingDelivery) -> None:
+            # En orden de antiguedad aunque los mensajes lleguen desordenados desde varios workers
+            bisect.insort(queue.messages, entry)
+            overflow = len(queue.messages) - max_messages
+            if overflow > 0:
+                del queue.messages[:overflow]
+
+        return self.modify(user_id, add, default=lambda: PendingDelivery(id=user_id))
+
+    def peek(self, user_id: str) -> List[str]:
+        """
+        Returns the queued messages of a user without emptying the queue, so they are only
+        removed (see acknowledge) once they were sent.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            List[str]: The queued message IDs, oldest first (empty if there were none).
+        """
+        queue = self.find_by_id(user_id)
+        if queue is None:
+            return []
+        return [message_id for _, _, message_id in queue.messages]
+
+    def acknowledge(self, user_id: str, message_ids: List[str]) -> int:
+        """
+        Removes sent messages from the queue of a user. Messages queued after they were
+        read with peek stay in the queue.
+
+        Args:
+            user_id (str): The ID of the user.
+            message_ids (List[str]): The IDs of the sent messages.
+
+        Returns:
+            int: The number of messages removed.
+        """
+        sent = set(message_ids)
+        queue = self.find_by_id(user_id)
+        if queue is None or not any(message_id in sent for _, _, message_id in queue.messages):
+            # Sin nada que quitar no se escribe el archivo
+            return 0
+        removed = 0
+
+        def remove(stored: PendingDelivery) -> None:
+            nonlocal removed
+            remaining = [entry for entry in stored.messages if entry[2] not in sent]
+            removed = len(stored.messages) - len(remaining)
+            stored.messages = remaining
+
+        self.modify(user_id, remove)
+        return removed
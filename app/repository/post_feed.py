@@ -0,0 +1,310 @@
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+from app.domain.entities import Post, Tag, User
+from app.repository.post_repository import PostRepository
+from app.repository.user_repository import UserRepository
+from app.repository.tag_repository import TagRepository
+import logging
+
+logger = logging.getLogger('app')
+
+
+class FeedPage(NamedTuple):
+    """
+    A page of the feed, newest first. next_cursor is passed as `before` to get the next
+    (older) page, and is None when there are no more posts.
+    """
+    entries: List[dict]
+    has_more: bool
+    next_cursor: Optional[str]
+
+
+def encode_cursor(timestamp: datetime, post_id: str) -> str:
+    """
+    Builds the `<timestamp>,<id>` cursor of a position in the feed.
+    """
+    return f"{timestamp.isoformat()},{post_id}"
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Returns the (timestamp, id) of a cursor built by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    timestamp, separator, post_id = cursor.rpartition(",")
+    if not separator or not post_id:
+        raise ValueError(f"Invalid feed cursor: {cursor!r}")
+    return datetime.fromisoformat(timestamp), post_id
+
+
+class PostFeed:
+    """
+    Materialized feed of posts: each post already joined with the public block of its
+    author and its tag, kept sorted by timestamp, so a feed request is a slice instead of
+    loading and joining every post, user and tag. Each tag has its own sorted posting
+    list, so a page of a tag costs the size of the page too.
+
+    Writes of this process reach the feed through the change listeners of the posts and
+    users repositories (post created or deleted, profile updated). They are only recorded
+    when notified, since listeners run while the repository holds its write lock, and
+    applied entry by entry on the next read. The feed is rebuilt from scratch when another
+    process changed the data (see BaseRepository.data_version) and, as a safety net, when
+    it is older than max_age_seconds.
+
+    Entries are shared with every caller and must be treated as read-only.
+    """
+    def __init__(self, post_repository: PostRepository, user_repository: UserRepository,
+                 tag_repository: TagRepository, max_age_seconds: int = 300):
+        """
+        Args:
+            post_repository: The posts of the feed.
+            user_repository: The authors embedded in each entry.
+            tag_repository: The tags embedded in each entry.
+            max_age_seconds (int): Age after which the feed is rebuilt. 0 disables it.
+        """
+        self.post_repository = post_repository
+        self.user_repository = user_repository
+        self.tag_repository = tag_repository
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        # (timestamp, id) de cada entrada, de la mas antigua a la mas reciente
+        self._order: List[tuple] = []
+        self._by_user: Dict[str, Set[str]] = {}
+        # tag_id -> (timestamp, id) de sus publicaciones, ordenadas igual que _order
+        self._by_tag: Dict[str, List[tuple]] = {}
+        self._built_at: Optional[float] = None
+        self._versions: Optional[tuple] = None
+        # Cambia con cada modificacion del feed, para las vistas derivadas (ranking)
+        self.version = 0
+        # Cambios notificados pendientes de aplicar (lock aparte, ver on_*_changed)
+        self._changes_lock = threading.Lock()
+        self._changed_posts: Set[str] = set()
+        self._changed_users: Set[str] = set()
+        self._stale = False
+
+    # ----------- Change notifications ------------------
+
+    def on_posts_changed(self, post_ids: Optional[Set[str]]) -> None:
+        with self._changes_lock:
+            if post_ids is None:
+                self._stale = True
+            else:
+                self._changed_posts.update(post_ids)
+
+    def on_users_changed(self, user_ids: Optional[Set[str]]) -> None:
+        with self._changes_lock:
+            if user_ids is None:
+                self._stale = True
+            else:
+                self._changed_users.update(user_ids)
+
+    # ----------- Entries ------------------
+
+    @staticmethod
+    def build_entry(post: Post, user: User, tag: Tag) -> Dict[str, Any]:
+        """
+        Returns the feed entry of a post, with the public fields of its author and tag.
+        """
+        return {
+            "id": post.id,
+            "description": post.description,
+            "timestamp": post.timestamp,
+            "user": PostFeed._user_block(user),
+            "tag": {
+                "id": tag.id,
+                "name": tag.name,
+            },
+        }
+
+    @staticmethod
+    def _user_block(user: User) -> Dict[str, Any]:
+        return {
+            "id": user.id,
+            "name": user.name,
+            "career": user.career,
+            "avatar_url": user.avatar_url,
+        }
+
+    def _insert(self, entry: dict) -> None:
+        # El llamador tiene el lock
+        key = (entry["timestamp"], entry["id"])
+        self.version += 1
+        self._entries[entry["id"]] = entry
+        bisect.insort(self._order, key)
+        self._by_user.setdefault(entry["user"]["id"], set()).add(entry["id"])
+        bisect.insort(self._by_tag.setdefault(entry["tag"]["id"], []), key)
+
+    @staticmethod
+    def _discard(order: List[tuple], key: tuple) -> None:
+        position = bisect.bisect_left(order, key)
+        if position < len(order) and order[position] == key:
+            del order[position]
+
+    def _remove(self, post_id: str) -> None:
+        entry = self._entries.pop(post_id, None)
+        if entry is None:
+            return
+        self.version += 1
+        key = (entry["timestamp"], post_id)
+        self._discard(self._order, key)
+        self._by_user.get(entry["user"]["id"], set()).discard(post_id)
+        self._discard(self._by_tag.get(entry["tag"]["id"], []), key)
+
+    def _join(self, posts: Iterable[Post], users: Dict[str, User], tags: Dict[str, Tag]) -> List[dict]:
+        entries = []
+        for post in posts:
+            user = users.get(post.user_id)
+            tag = tags.get(post.tag_id)
+            # Como antes: las publicaciones sin autor o sin tag no aparecen
+            if user and tag:
+                entries.append(self.build_entry(post, user, tag))
+        return entries
+
+    # ----------- Refreshing ------------------
+
+    def _current_versions(self) -> tuple:
+        return (
+            self.post_repository.data_version(),
+            self.user_repository.data_version(),
+            self.tag_repository.data_version(),
+        )
+
+    def rebuild(self) -> int:
+        """
+        Builds the feed from scratch.
+
+        Returns:
+            int: The number of entries.
+        """
+        with self._changes_lock:
+            # Todo lo notificado hasta aqui queda cubierto por la reconstruccion
+            self._changed_posts, self._changed_users, self._stale = set(), set(), False
+        versions = self._current_versions()
+        posts = self.post_repository.find_all()
+        users = {user.id: user for user in self.user_repository.find_all()}
+        tags = {tag.id: tag for tag in self.tag_repository.find_all()}
+        with self._lock:
+            self._entries, self._order, self._by_user, self._by_tag = {}, [], {}, {}
+            for entry in self._join(posts, users, tags):
+                key = (entry["timestamp"], entry["id"])
+                self._entries[entry["id"]] = entry
+                self._order.append(key)
+                self._by_user.setdefault(entry["user"]["id"], set()).add(entry["id"])
+                self._by_tag.setdefault(entry["tag"]["id"], []).append(key)
+            # Un solo sort por lista en lugar de un insort por entrada
+            self._order.sort()
+            for keys in self._by_tag.values():
+                keys.sort()
+            self.version += 1
+            self._versions = versions
+            self._built_at = time.monotonic()
+            logger.info(f"Post feed built with {len(self._entries)} entries.")
+            return len(self._entries)
+
+    def refresh(self) -> None:
+        """
+        Brings the feed up to date: applies the notified changes, or rebuilds it if it was
+        never built, another process changed the data or it is too old.
+        """
+        with self._changes_lock:
+            stale = self._stale
+        too_old = (
+            self._built_at is not None and self.max_age_seconds > 0
+            and time.monotonic() - self._built_at > self.max_age_seconds
+        )
+        if self._built_at is None or stale or too_old or self._current_versions() != self._versions:
+            self.rebuild()
+            return
+        with self._changes_lock:
+            posts, self._changed_posts = self._changed_posts, set()
+            users, self._changed_users = self._changed_users, set()
+        if posts:
+            self._apply_posts(posts)
+        if users:
+            self._apply_users(users)
+
+    def _apply_posts(self, post_ids: Set[str]) -> None:
+        found = self.post_repository.find_by_ids(list(post_ids))
+        users = self.user_repository.find_by_ids(list({post.user_id for post in found.values()}))
+        tags = {tag.id: tag for tag in self.tag_repository.find_all()} if found else {}
+        with self._lock:
+            # Borradas o actualizadas: se quitan y las que siguen se vuelven a insertar
+            for post_id in post_ids:
+                self._remove(post_id)
+            for entry in self._join(found.values(), users, tags):
+                self._insert(entry)
+
+    def _apply_users(self, user_ids: Set[str]) -> None:
+        with self._lock:
+            relevant = [user_id for user_id in user_ids if self._by_user.get(user_id)]
+        if not relevant:
+            return
+        users = self.user_repository.find_by_ids(relevant)
+        with self._lock:
+            for user_id in relevant:
+                user = users.get(user_id)
+                for post_id in list(self._by_user.get(user_id, ())):
+                    if user is None:
+                        self._remove(post_id)
+                        continue
+                    entry = self._entries[post_id]
+                    block = self._user_block(user)
+                    if entry["user"] != block:
+                        # Copia: las listas ya entregadas conservan la entrada anterior
+                        self._entries[post_id] = {**entry, "user": block}
+                        self.version += 1
+
+    # ----------- Reading ------------------
+
+    def entries(self, tag_id: Optional[str] = None) -> List[dict]:
+        """
+        Returns the feed, newest first, optionally only the posts of a tag.
+        """
+        self.refresh()
+        with self._lock:
+            order = self._order if tag_id is None else self._by_tag.get(tag_id, [])
+            return [self._entries[post_id] for _, post_id in reversed(order)]
+
+    def snapshot(self) -> tuple[int, List[dict]]:
+        """
+        Returns the version of the feed together with its entries, oldest first, read at
+        once so both match.
+        """
+        self.refresh()
+        with self._lock:
+            return self.version, [self._entries[post_id] for _, post_id in self._order]
+
+    def get(self, post_id: str) -> Optional[dict]:
+        """
+        Returns the entry of a post, without refreshing the feed.
+        """
+        return self._entries.get(post_id)
+
+    def page(self, tag_id: Optional[str] = None, before: Optional[str] = None, limit: int = 20) -> FeedPage:
+        """
+        Returns a page of the feed, newest first, by keyset: the `limit` posts older than
+        the `before` cursor (or the newest ones without it), optionally only of a tag.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        before_key = decode_cursor(before) if before else None
+        self.refresh()
+        with self._lock:
+            order = self._order if tag_id is None else self._by_tag.get(tag_id, [])
+            end = bisect.bisect_left(order, before_key) if before_key else len(order)
+            start = max(end - limit, 0)
+            keys = order[start:end]
+            entries = [self._entries[post_id] for _, post_id in reversed(keys)]
+        has_more = start > 0
+        next_cursor = encode_cursor(*keys[0]) if has_more else None
+        return FeedPage(entries, has_more, next_cursor)
+
+    def __len__(self) -> int:
+        return len(self._entries)
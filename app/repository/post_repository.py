@@ -4,6 +4,8 @@ from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
 
 class PostRepository(BaseRepository[Post]):
+    indexes = ('id', 'tag_id', 'user_id')
+
     def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
         super().__init__(
             file_manager,
@@ -16,5 +18,5 @@ class PostRepository(BaseRepository[Post]):
         """
         Converts a dictionary representation of a post into a Post domain entity object.
         """
-        return Post(**item)
+        return Post.from_storage(item)
 
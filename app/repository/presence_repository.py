@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import Iterable, List
+from app.domain.entities import DbFile, ShardFile, WorkerPresence
+from app.repository.base_repository import BaseRepository
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+
+
+class PresenceRepository(BaseRepository[WorkerPresence]):
+    """
+    The users online in each worker process, stored as one WorkerPresence per worker (its
+    id is the worker's id), so every worker can tell whether a user has a session open in
+    any of them.
+
+    A worker is alive while it keeps publishing its users or touching its heartbeat file
+    (next to the presence file), so an unchanged set of users is not rewritten just to
+    show that the worker is still running.
+    """
+    indexes = ('id', 'user_ids')
+
+    def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
+        """
+        Initializes the PresenceRepository.
+
+        Args:
+            file_manager (FileManager): Service to handle file read/write operations.
+            encryption_manager (EncryptionManager): Service to handle data encryption/decryption.
+        """
+        super().__init__(file_manager, encryption_manager, DbFile.PRESENCE, 'workers')
+
+    def _to_entity(self, item: dict) -> WorkerPresence:
+        """
+        Converts a dictionary representation of a worker into a WorkerPresence domain entity object.
+        """
+        return WorkerPresence.from_storage(item)
+
+    def publish(self, worker_id: str, user_ids: Iterable[str]) -> WorkerPresence:
+        """
+        Replaces the online users of a worker, stamping them with the current time.
+
+        Args:
+            worker_id (str): The ID of the worker.
+            user_ids (Iterable[str]): The users with an open session in the worker.
+
+        Returns:
+            WorkerPresence: The stored record.
+        """
+        return self.upsert_many([WorkerPresence(id=worker_id, user_ids=sorted(user_ids), updated_at=datetime.now())])[0]
+
+    def _heartbeat_file(self, worker_id: str) -> ShardFile:
+        return ShardFile(f"{self.db_file.name}_{worker_id}", f"{self.db_file.value}.{worker_id}.alive")
+
+    def heartbeat(self, worker_id: str) -> bool:
+        """
+        Marks a worker as alive without rewriting its users.
+
+        Returns:
+            bool: True if the heartbeat file was touched.
+        """
+        return self.file_manager.touch_file(self._heartbeat_file(worker_id))
+
+    def last_seen(self, worker: WorkerPresence) -> datetime:
+        """
+        Returns the last time a worker published its users or touched its heartbeat.
+        """
+        signature = self.file_manager.stat_file(self._heartbeat_file(worker.id))
+        if signature is None:
+            return worker.updated_at
+        return max(worker.updated_at, datetime.fromtimestamp(signature[0] / 1e9))
+
+    def remove(self, worker_ids: List[str]) -> int:
+        """
+        Deletes the records of some workers and their heartbeat files.
+
+        Returns:
+            int: The number of records deleted.
+        """
+        for worker_id in worker_ids:
+            self.file_manager.delete_file(self._heartbeat_file(worker_id))
+        return self.delete_many(worker_ids)
+
+    def find_workers_of(self, user_id: str, since: datetime) -> List[WorkerPresence]:
+        """
+        Finds the workers where a user has an open session, among those seen alive after
+        a given time.
+
+        Args:
+            user_id (str): The ID of the user.
+            since (datetime): Workers last seen before this time are ignored.
+
+        Returns:
+            List[WorkerPresence]: The workers of the user.
+        """
+        return [worker for worker in self.query('user_ids has ?', user_id) if self.last_seen(worker) >= since]
+
+    def find_stale(self, since: datetime) -> List[WorkerPresence]:
+        """
+        Finds the workers not seen alive after a given time, e.g. because the process died.
+
+        Args:
+            since (datetime): The oldest time a live worker was seen.
+
+        Returns:
+            List[WorkerPresence]: The stale workers.
+        """
+        return [worker for worker in self.find_all() if self.last_seen(worker) < since]
@@ -0,0 +1,128 @@
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+# Operadores soportados en las condiciones de una query
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    # Pertenencia a un atributo lista, p. ej. 'tag_ids has ?'
+    'has': lambda value, element: isinstance(value, list) and element in value,
+}
+
+_CONDITION = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(==|!=|<=|>=|<|>|\bhas\b)\s*\?\s*$')
+
+
+class CompiledQuery:
+    """
+    A predicate shape compiled once and executed many times with bound parameters.
+
+    A shape is a list of conditions joined by '&', where each condition compares an
+    attribute of the stored item against a '?' placeholder, e.g.
+    'conversation_id == ? & sender_id != ? & delivered == ?'. The `has` operator matches
+    list attributes containing the value, e.g. 'tag_ids has ?'.
+    Values are never interpolated into the shape, they are passed on execution.
+    """
+    def __init__(self, shape: str, conditions: Sequence[tuple[str, str]]):
+        """
+        Args:
+            shape (str): The original query shape, kept for logging and debugging.
+            conditions (Sequence[tuple[str, str]]): (attribute, operator) pairs, in
+                the same order as the placeholders.
+        """
+        self.shape = shape
+        self.conditions = tuple(conditions)
+        self.param_count = len(self.conditions)
+        self._predicate = self._build_predicate()
+
+    def _build_predicate(self) -> Callable[[dict, Sequence[Any]], bool]:
+        compiled = tuple(
+            (attribute, OPERATORS[symbol], index, symbol in ('==', '!='))
+            for index, (attribute, symbol) in enumerate(self.conditions)
+        )
+
+        def predicate(item: dict, params: Sequence[Any]) -> bool:
+            for attribute, op, index, is_equality in compiled:
+                value = item.get(attribute)
+                if is_equality:
+                    if not op(value, params[index]):
+                        return False
+                    continue
+                # Las comparaciones de orden contra valores faltantes no hacen match
+                try:
+                    if not op(value, params[index]):
+                        return False
+                except TypeError:
+                    return False
+            return True
+
+        return predicate
+
+    def _check_params(self, params: Sequence[Any]) -> None:
+        if len(params) != self.param_count:
+            raise ValueError(
+                f"Query '{self.shape}' expects {self.param_count} parameters, got {len(params)}."
+            )
+
+    def matches(self, item: dict, *params: Any) -> bool:
+        """
+        Returns True if the item satisfies every condition with the given parameters.
+        """
+        self._check_params(params)
+        return self._predicate(item, params)
+
+    def filter(self, items: Iterable[dict], *params: Any) -> List[dict]:
+        """
+        Returns every item that satisfies the query, preserving their order.
+        """
+        self._check_params(params)
+        predicate = self._predicate
+        return [item for item in items if predicate(item, params)]
+
+    def first(self, items: Iterable[dict], *params: Any) -> Optional[dict]:
+        """
+        Returns the first item that satisfies the query, or None.
+        """
+        self._check_params(params)
+        predicate = self._predicate
+        return next((item for item in items if predicate(item, params)), None)
+
+    def count(self, items: Iterable[dict], *params: Any) -> int:
+        """
+        Returns how many items satisfy the query.
+        """
+        self._check_params(params)
+        predicate = self._predicate
+        return sum(1 for item in items if predicate(item, params))
+
+    def __repr__(self) -> str:
+        return f"CompiledQuery({self.shape!r})"
+
+
+@lru_cache(maxsize=256)
+def compile_query(shape: str) -> CompiledQuery:
+    """
+    Parses a query shape into a CompiledQuery. Results are kept in an LRU cache,
+    so each distinct shape is only parsed once per process.
+
+    Args:
+        shape (str): The query shape, e.g. 'conversation_id == ?'.
+
+    Returns:
+        CompiledQuery: The compiled, reusable query plan.
+
+    Raises:
+        ValueError: If the shape is empty or a condition is malformed.
+    """
+    conditions = []
+    for raw_condition in shape.split('&'):
+        match = _CONDITION.match(raw_condition)
+        if not match:
+            raise ValueError(f"Invalid query condition '{raw_condition.strip()}' in '{shape}'.")
+        conditions.append((match.group(1), match.group(2)))
+    return CompiledQuery(shape, conditions)
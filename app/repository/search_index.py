@@ -0,0 +1,419 @@
+import atexit
+import json
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+from app.domain.entities import DbFile, Message
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.repository.message_repository import MessageRepository
+from app.repository.write_behind import FlushScheduler
+from app.utils.text import tokenize
+import logging
+
+logger = logging.getLogger('app')
+
+# Parametros de BM25
+_K1 = 1.2
+_B = 0.75
+
+
+class SearchHit(NamedTuple):
+    """
+    A message matching a search, with its relevance score.
+    """
+    message_id: str
+    conversation_id: str
+    score: float
+
+
+class _Document(NamedTuple):
+    conversation_id: str
+    timestamp: str
+    terms: Dict[str, int]
+    length: int
+
+
+class MessageSearchIndex:
+    """
+    Inverted index over the content of the messages, to search them without decrypting
+    and scanning the messages store on every query.
+
+    Each token (lowercased and without accents, see app.utils.text) maps to the messages
+    of each conversation that contain it, so a search only looks at the postings of its
+    tokens within the conversations it is scoped to. Results are ranked with BM25, newest
+    first on ties.
+
+    The index is kept in memory and saved encrypted: each save appends the documents added
+    and removed since the previous one as a record of a log, so the cost of a save does not
+    depend on the size of the index and the workers sharing the files add to it instead of
+    overwriting each other. Every compact_every records a worker folds the log into the
+    index file. New messages are picked up from the change notifications of the message
+    repository and indexed in the background, and every search first reconciles the
+    conversations it looks at, so messages written by other processes (or before the index
+    existed) are indexed too.
+    """
+    def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager,
+                 message_repository: MessageRepository, flush_interval_ms: int = 5000, compact_every: int = 100):
+        """
+        Args:
+            file_manager (FileManager): Service to handle file read/write operations.
+            encryption_manager (EncryptionManager): Service to encrypt the index at rest.
+            message_repository (MessageRepository): The messages being indexed.
+            flush_interval_ms (int): How long new messages are coalesced before indexing
+                and saving them.
+            compact_every (int): Log records appended by this process before the log is
+                folded into the index file.
+        """
+        self.file_manager = file_manager
+        self.encryption_manager = encryption_manager
+        self.message_repository = message_repository
+        self.db_file = DbFile.MESSAGE_SEARCH_INDEX
+        self.log_file = DbFile.MESSAGE_SEARCH_INDEX_LOG
+        self.flush_interval_ms = flush_interval_ms
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._loaded = False
+        # Cambios aun no guardados en el log
+        self._added: Dict[str, _Document] = {}
+        self._removed: Set[str] = set()
+        self._appended = 0
+        self._documents: Dict[str, _Document] = {}
+        # token -> conversation_id -> {message_id: frecuencia}
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._document_frequency: Counter = Counter()
+        self._conversations: Dict[str, Set[str]] = {}
+        self._total_length = 0
+        # Lock aparte: el listener corre con el lock de escritura del repositorio tomado
+        self._pending_lock = threading.Lock()
+        self._pending_ids: Set[str] = set()
+        self._scheduler: Optional[FlushScheduler] = None
+
+    # ----------- Documents ------------------
+
+    def _add(self, message: Message) -> None:
+        # El llamador tiene el lock
+        if message.id in self._documents:
+            return
+        tokens = tokenize(message.content)
+        terms = dict(Counter(tokens))
+        timestamp = message.timestamp.isoformat() if isinstance(message.timestamp, datetime) else str(message.timestamp)
+        self._insert(message.id, _Document(message.conversation_id, timestamp, terms, len(tokens)))
+
+    def _insert(self, message_id: str, document: _Document) -> None:
+        self._documents[message_id] = document
+        self._conversations.setdefault(document.conversation_id, set()).add(message_id)
+        for term, frequency in document.terms.items():
+            self._postings.setdefault(term, {}).setdefault(document.conversation_id, {})[message_id] = frequency
+            self._document_frequency[term] += 1
+        self._total_length += document.length
+        self._added[message_id] = document
+        self._removed.discard(message_id)
+
+    def _remove(self, message_id: str) -> None:
+        document = self._documents.pop(message_id, None)
+        if document is None:
+            return
+        self._conversations.get(document.conversation_id, set()).discard(message_id)
+        for term in document.terms:
+            by_conversation = self._postings.get(term, {})
+            postings = by_conversation.get(document.conversation_id, {})
+            postings.pop(message_id, None)
+            if not postings:
+                by_conversation.pop(document.conversation_id, None)
+            if not by_conversation:
+                self._postings.pop(term, None)
+            self._document_frequency[term] -= 1
+            if self._document_frequency[term] <= 0:
+                del self._document_frequency[term]
+        self._total_length -= document.length
+        self._added.pop(message_id, None)
+        self._removed.add(message_id)
+
+    def index_messages(self, messages: Iterable[Message]) -> int:
+        """
+        Adds messages to the index. Messages already indexed are skipped, since their
+        content never changes.
+
+        Returns:
+            int: The number of messages added.
+        """
+        self.load()
+        with self._lock:
+            before = len(self._documents)
+            for message in messages:
+                self._add(message)
+            return len(self._documents) - before
+
+    def remove_messages(self, message_ids: Iterable[str]) -> None:
+        """
+        Drops messages from the index, e.g. when they no longer exist.
+        """
+        self.load()
+        with self._lock:
+            for message_id in message_ids:
+                self._remove(message_id)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    # ----------- Keeping up with the messages ------------------
+
+    def on_messages_changed(self, message_ids: Optional[Set[str]]) -> None:
+        """
+        Change listener of the message repository. Only records the IDs: they are indexed
+        by the next flush, outside of the repository's write lock.
+        """
+        if message_ids is None:
+            # Datos reemplazados (p. ej. compactacion): la reconciliacion de cada busqueda los cubre
+            return
+        with self._pending_lock:
+            self._pending_ids.update(message_ids)
+        if self._scheduler is not None:
+            self._scheduler.notify()
+
+    def catch_up(self) -> int:
+        """
+        Indexes the new messages notified by the repository. Updates of already indexed
+        messages (e.g. delivered flags) cost nothing.
+
+        Returns:
+            int: The number of messages added.
+        """
+        with self._pending_lock:
+            pending, self._pending_ids = self._pending_ids, set()
+        if not pending:
+            return 0
+        self.load()
+        with self._lock:
+            unknown = [message_id for message_id in pending if message_id not in self._documents]
+        if not unknown:
+            return 0
+        found = self.message_repository.find_by_ids(unknown)
+        with self._lock:
+            for message in found.values():
+                self._add(message)
+        return len(found)
+
+    def reconcile(self, conversation_ids: Iterable[str]) -> int:
+        """
+        Indexes the messages of the conversations that the index does not have yet, and
+        drops the ones that no longer exist. Conversations whose message count matches the
+        index are not read.
+
+        Returns:
+            int: The number of messages added.
+        """
+        self.load()
+        self.catch_up()
+        added = 0
+        for conversation_id in conversation_ids:
+            with self._lock:
+                indexed = set(self._conversations.get(conversation_id, ()))
+            if self.message_repository.count('conversation_id == ?', conversation_id) == len(indexed):
+                continue
+            messages = self.message_repository.find_by_conversation_id(conversation_id)
+            with self._lock:
+                for message in messages:
+                    if message.id not in self._documents:
+                        self._add(message)
+                        added += 1
+                for message_id in indexed - {message.id for message in messages}:
+                    self._remove(message_id)
+        if added:
+            logger.info(f"Search index reconciled: {added} messages added.")
+        return added
+
+    # ----------- Search ------------------
+
+    def search(self, text: str, conversation_ids: Iterable[str], limit: int = 20, offset: int = 0) -> tuple[List[SearchHit], int]:
+        """
+        Finds the messages of the given conversations that contain every word of the text,
+        ignoring case and accents, ranked by relevance.
+
+        Args:
+            text (str): The words to search.
+            conversation_ids: The conversations the search is scoped to.
+            limit (int): The maximum number of hits returned.
+            offset (int): How many of the best hits to skip, for pagination.
+
+        Returns:
+            tuple[List[SearchHit], int]: The hits of the page and the total number of hits.
+        """
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms:
+            return [], 0
+        conversation_ids = list(dict.fromkeys(conversation_ids))
+        self.reconcile(conversation_ids)
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return [], 0
+            average_length = self._total_length / count or 1
+            # El termino menos frecuente primero: acota los candidatos desde el principio
+            terms.sort(key=lambda term: self._document_frequency.get(term, 0))
+            scored = []
+            for conversation_id in conversation_ids:
+                postings = [self._postings.get(term, {}).get(conversation_id) for term in terms]
+                if not all(postings):
+                    continue
+                for message_id in postings[0]:
+                    if not all(message_id in other for other in postings[1:]):
+                        continue
+                    document = self._documents[message_id]
+                    norm = _K1 * (1 - _B + _B * document.length / average_length)
+                    score = 0.0
+                    for term, term_postings in zip(terms, postings):
+                        frequency = term_postings[message_id]
+                        df = self._document_frequency[term]
+                        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                        score += idf * frequency * (_K1 + 1) / (frequency + norm)
+                    scored.append((score, document.timestamp, message_id, conversation_id))
+        scored.sort(reverse=True)
+        page = scored[offset:offset + limit]
+        return [SearchHit(message_id, conversation_id, round(score, 4)) for score, _, message_id, conversation_id in page], len(scored)
+
+    # ----------- Persistence ------------------
+
+    def load(self) -> None:
+        """
+        Reads the saved index and its log, once. A missing or unreadable file starts an
+        empty index, which is filled as conversations are reconciled.
+        """
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                documents = self._read_documents()
+            except Exception:
+                logger.exception("Cannot read the search index, it will be rebuilt.")
+                documents = {}
+            for message_id, (conversation_id, timestamp, terms) in documents.items():
+                self._insert(message_id, _Document(conversation_id, timestamp, terms, sum(terms.values())))
+            self._added.clear()
+            self._removed.clear()
+            self._loaded = True
+            logger.info(f"Search index loaded with {len(self._documents)} messages.")
+
+    def _read_documents(self) -> Dict[str, list]:
+        """
+        Reads the documents of the index file and replays the records of the log on top.
+        A log line that cannot be decrypted (e.g. torn by an interrupted write) is skipped.
+        """
+        encrypted = self.file_manager.read_file(self.db_file)
+        documents = json.loads(self.encryption_manager.decrypt_data(encrypted))['documents'] if encrypted else {}
+        lines = self.file_manager.read_file(self.log_file).splitlines()
+        for number, line in enumerate(lines, start=1):
+            if not line:
+                continue
+            try:
+                record = json.loads(self.encryption_manager.decrypt_data(line))
+            except ValueError:
+                logger.error(f"Skipping unreadable record at line {number} of {self.log_file.name}.")
+                continue
+            documents.update(record.get('documents', {}))
+            for message_id in record.get('removed', ()):
+                documents.pop(message_id, None)
+        return documents
+
+    def save(self) -> bool:
+        """
+        Appends the documents added and removed since the last save to the log, encrypted,
+        and folds the log into the index file every compact_every records.
+        """
+        with self._lock:
+            if not self._added and not self._removed:
+                return True
+            added, self._added = self._added, {}
+            removed, self._removed = self._removed, set()
+        record = {
+            'documents': {
+                message_id: [document.conversation_id, document.timestamp, document.terms]
+                for message_id, document in added.items()
+            },
+            'removed': sorted(removed),
+        }
+        try:
+            encrypted = self.encryption_manager.encrypt_data(json.dumps(record, ensure_ascii=False))
+            # Lock entre procesos: la compactacion de otro worker no debe perder este registro
+            with self.file_manager.lock_file(self.log_file):
+                if self.file_manager.append_file(self.log_file, encrypted + b'\n', new_line=True):
+                    self._appended += 1
+                    if self._appended >= self.compact_every:
+                        self._compact()
+                    return True
+        except Exception:
+            logger.exception("Cannot save the search index.")
+        with self._lock:
+            # Los cambios mas recientes tienen prioridad sobre los que no se pudieron guardar
+            for message_id, document in added.items():
+                if message_id in self._documents and message_id not in self._removed:
+                    self._added.setdefault(message_id, document)
+            self._removed.update(message_id for message_id in removed if message_id not in self._documents)
+        return False
+
+    def _compact(self) -> bool:
+        """
+        Folds the log, with the records of every process, into the index file and
+        truncates it. The caller holds the file lock of the log.
+        """
+        documents = self._read_documents()
+        if not self._write_documents(documents):
+            return False
+        self._appended = 0
+        logger.info(f"Search index compacted with {len(documents)} messages.")
+        return True
+
+    def _write_documents(self, documents: Dict[str, list]) -> bool:
+        # El llamador tiene el lock del log
+        encrypted = self.encryption_manager.encrypt_data(json.dumps({'documents': documents}, ensure_ascii=False))
+        return self.file_manager.write_file(self.db_file, encrypted) and self.file_manager.write_file(self.log_file, b'')
+
+    def flush(self) -> None:
+        """
+        Indexes the pending messages and saves the index.
+        """
+        self.catch_up()
+        self.save()
+
+    def rebuild(self) -> int:
+        """
+        Indexes every stored message from scratch.
+
+        Returns:
+            int: The number of messages indexed.
+        """
+        messages = self.message_repository.find_all()
+        with self._lock:
+            self._documents.clear()
+            self._postings.clear()
+            self._document_frequency.clear()
+            self._conversations.clear()
+            self._total_length = 0
+            self._loaded = True
+            for message in messages:
+                self._add(message)
+            self._added.clear()
+            self._removed.clear()
+            documents = {
+                message_id: [document.conversation_id, document.timestamp, document.terms]
+                for message_id, document in self._documents.items()
+            }
+        with self.file_manager.lock_file(self.log_file):
+            self._write_documents(documents)
+            self._appended = 0
+        return len(self._documents)
+
+    def start(self) -> None:
+        """
+        Starts indexing new messages in the background. The index is also saved when the
+        process exits.
+        """
+        if self._scheduler is None:
+            self._scheduler = FlushScheduler(self.flush, self.flush_interval_ms, "search-index-flush")
+            atexit.register(self.flush)
+        self.load()
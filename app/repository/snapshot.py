@@ -0,0 +1,262 @@
+import bisect
+import itertools
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+
+_serials = itertools.count(1)
+
+
+class Snapshot:
+    """
+    The parsed contents of a data file together with its secondary hash indexes.
+
+    Indexes map an attribute value to the stored items holding it, so point lookups do not
+    scan the entity list. They are built when the snapshot is loaded and kept up to date
+    by append/replace/remove, which is how repositories mutate the snapshot after a write.
+    List attributes (e.g. tag_ids) are indexed by each of their elements. Ordered indexes
+    additionally keep, for each value of an attribute, its items sorted by another one
+    (e.g. the messages of each conversation by timestamp).
+
+    Items are stored in slots keyed by their identity, and index buckets are keyed the
+    same way, so append, replace and remove cost O(1) per index instead of scanning the
+    entity list or a bucket. The entity list is rebuilt on the first read after a replace
+    or remove; a list already handed out is never modified by them.
+
+    Readers must treat the data, the items and the returned lists as read-only.
+    """
+    def __init__(self, data: dict, entity_name: str, indexed_attributes: Iterable[str] = ()):
+        """
+        Args:
+            data (dict): The parsed file contents, with the entities under entity_name.
+            entity_name (str): The key under which entities are stored (e.g. 'users').
+            indexed_attributes (Iterable[str]): Attributes to index right away.
+        """
+        self._data = data
+        self.entity_name = entity_name
+        # Distingue este snapshot de los que se carguen despues desde disco
+        self.serial = next(_serials)
+        self._list: Optional[List[dict]] = data.setdefault(entity_name, [])
+        self._lock = threading.RLock()
+        # Cada item vive en un slot; el dict conserva el orden de insercion
+        self._next_slot = itertools.count()
+        self._store: Dict[int, dict] = {}
+        self._slots: Dict[int, int] = {}
+        for item in self._list:
+            self._put(item)
+        # atributo -> valor -> {id(item): item}
+        self._indexes: Dict[str, Dict[Any, Dict[int, dict]]] = {}
+        # (atributo, atributo de orden) -> valor -> [(valor de orden, id, item)] ordenada
+        self._orders: Dict[tuple, Dict[Any, List[tuple]]] = {}
+        # Registros del log todavia no compactados dentro del archivo principal
+        self.log_length = 0
+        for attribute in indexed_attributes:
+            self.ensure_index(attribute)
+
+    @property
+    def items(self) -> List[dict]:
+        items = self._list
+        if items is None:
+            with self._lock:
+                if self._list is None:
+                    self._list = self._data[self.entity_name] = list(self._store.values())
+                items = self._list
+        return items
+
+    @property
+    def data(self) -> dict:
+        # Con la lista de entidades al dia, p. ej. para escribir el archivo
+        self.items
+        return self._data
+
+    def _put(self, item: dict) -> None:
+        slot = next(self._next_slot)
+        self._store[slot] = item
+        self._slots[id(item)] = slot
+
+    @property
+    def indexed_attributes(self) -> tuple[str, ...]:
+        return tuple(self._indexes)
+
+    @staticmethod
+    def _keys(value: Any) -> Iterable[Any]:
+        if isinstance(value, list):
+            try:
+                # Sin duplicados, para no indexar dos veces el mismo item
+                return dict.fromkeys(value)
+            except TypeError:
+                return value
+        return (value,)
+
+    def _index_item(self, index: Dict[Any, Dict[int, dict]], attribute: str, item: dict) -> None:
+        for key in self._keys(item.get(attribute)):
+            try:
+                index.setdefault(key, {})[id(item)] = item
+            except TypeError:
+                # Los valores no hasheables (dicts) no se indexan
+                continue
+
+    def _unindex_item(self, index: Dict[Any, Dict[int, dict]], attribute: str, item: dict) -> None:
+        for key in self._keys(item.get(attribute)):
+            try:
+                bucket = index.get(key)
+            except TypeError:
+                continue
+            if bucket and bucket.pop(id(item), None) is not None and not bucket:
+                del index[key]
+
+    def ensure_index(self, attribute: str) -> None:
+        """
+        Builds the index for the attribute if it does not exist yet.
+        """
+        if attribute in self._indexes:
+            return
+        with self._lock:
+            if attribute in self._indexes:
+                return
+            index: Dict[Any, Dict[int, dict]] = {}
+            for item in self.items:
+                self._index_item(index, attribute, item)
+            self._indexes[attribute] = index
+
+    @staticmethod
+    def _order_entry(item: dict, sort_attribute: str) -> tuple:
+        value = item.get(sort_attribute)
+        return ('' if value is None else value, item.get('id', ''), item)
+
+    def _order_item(self, order: Dict[Any, List[tuple]], attribute: str, sort_attribute: str, item: dict) -> None:
+        try:
+            entries = order.setdefault(item.get(attribute), [])
+        except TypeError:
+            return
+        entry = self._order_entry(item, sort_attribute)
+        # Se busca por (valor, id): dos entradas nunca llegan a comparar sus items
+        entries.insert(bisect.bisect_left(entries, entry[:2]), entry)
+
+    def _unorder_item(self, order: Dict[Any, List[tuple]], attribute: str, order_attribute: str, item: dict) -> None:
+        try:
+            entries = order.get(item.get(attribute))
+        except TypeError:
+            return
+        if not entries:
+            return
+        # Solo se recorren las entradas con el mismo (valor de orden, id)
+        entry = self._order_entry(item, order_attribute)
+        position = bisect.bisect_left(entries, entry[:2])
+        while position < len(entries) and entries[position][:2] == entry[:2]:
+            if entries[position][2] is item:
+                del entries[position]
+                return
+            position += 1
+
+    def ordered(self, attribute: str, value: Any, sort_attribute: str) -> List[tuple]:
+        """
+        Returns the items whose attribute equals the value, sorted by sort_attribute (and
+        by id on ties), as (sort value, id, item) tuples. The ordered index is built on
+        first use and maintained by append/replace/remove afterwards.
+        """
+        key = (attribute, sort_attribute)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None:
+                order = {}
+                for item in self.items:
+                    try:
+                        order.setdefault(item.get(attribute), []).append(self._order_entry(item, sort_attribute))
+                    except TypeError:
+                        continue
+                for entries in order.values():
+                    entries.sort(key=lambda entry: entry[:2])
+                self._orders[key] = order
+            try:
+                # Copia: las escrituras modifican la lista en su lugar
+                return list(order.get(value, ()))
+            except TypeError:
+                return []
+
+    def has_index(self, attribute: str) -> bool:
+        return attribute in self._indexes
+
+    def lookup(self, attribute: str, value: Any) -> List[dict]:
+        """
+        Returns the items whose attribute equals (or, for lists, contains) the value.
+
+        Raises:
+            KeyError: If the attribute is not indexed.
+            TypeError: If the value is not hashable.
+        """
+        bucket = self._indexes[attribute].get(value)
+        return list(bucket.values()) if bucket else []
+
+    def bucket_size(self, attribute: str, value: Any) -> int:
+        """
+        Returns how many items lookup(attribute, value) would return, without copying them.
+
+        Raises:
+            KeyError: If the attribute is not indexed.
+            TypeError: If the value is not hashable.
+        """
+        return len(self._indexes[attribute].get(value, ()))
+
+    def get(self, entity_id: Any) -> Optional[dict]:
+        """
+        Returns the item with the given id, or None.
+        """
+        self.ensure_index('id')
+        bucket = self._indexes['id'].get(entity_id)
+        return next(iter(bucket.values())) if bucket else None
+
+    def append(self, item: dict) -> None:
+        """
+        Adds an item to the entity list and to every index.
+        """
+        with self._lock:
+            self._put(item)
+            if self._list is not None:
+                self._list.append(item)
+            for attribute, index in self._indexes.items():
+                self._index_item(index, attribute, item)
+            for (attribute, sort_attribute), order in self._orders.items():
+                self._order_item(order, attribute, sort_attribute, item)
+
+    def replace(self, old_item: dict, new_item: dict) -> bool:
+        """
+        Swaps a stored item for a new version, keeping its position.
+
+        Returns:
+            bool: True if the old item was found and replaced, False otherwise.
+        """
+        with self._lock:
+            slot = self._slots.pop(id(old_item), None)
+            if slot is None:
+                return False
+            self._store[slot] = new_item
+            self._slots[id(new_item)] = slot
+            self._list = None
+            for attribute, index in self._indexes.items():
+                self._unindex_item(index, attribute, old_item)
+                self._index_item(index, attribute, new_item)
+            for (attribute, sort_attribute), order in self._orders.items():
+                self._unorder_item(order, attribute, sort_attribute, old_item)
+                self._order_item(order, attribute, sort_attribute, new_item)
+            return True
+
+    def remove(self, old_item: dict) -> bool:
+        """
+        Removes a stored item from the entity list and from every index.
+        Readers iterating the previous entity list are not affected.
+
+        Returns:
+            bool: True if the item was found and removed, False otherwise.
+        """
+        with self._lock:
+            slot = self._slots.pop(id(old_item), None)
+            if slot is None:
+                return False
+            del self._store[slot]
+            self._list = None
+            for attribute, index in self._indexes.items():
+                self._unindex_item(index, attribute, old_item)
+            for (attribute, sort_attribute), order in self._orders.items():
+                self._unorder_item(order, attribute, sort_attribute, old_item)
+            return True
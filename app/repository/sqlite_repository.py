@@ -0,0 +1,389 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+import json
+import sqlite3
+import threading
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.infraestructure.sqlite_service import SqliteDatabase, sqlite_database
+from app.domain.entities import BaseEntity, DbFile
+from app.repository.base_repository import BaseRepository, _normalize_timestamps
+from app.repository.query import CompiledQuery, compile_query
+from app.repository.write_behind import Durability
+import logging
+
+logger = logging.getLogger('app')
+
+T = TypeVar('T', bound=BaseEntity)
+
+# Maximo de parametros por sentencia al buscar por listas de ids
+_CHUNK_SIZE = 500
+
+
+class SqliteRepository(BaseRepository[T]):
+    """
+    BaseRepository implementation backed by SQLite, selected with STORAGE_BACKEND=sqlite.
+
+    Each entity type gets a table with its id and the whole item as an encrypted JSON
+    blob, plus an index table holding one (attribute, value, entity_id) row per value of
+    each attribute in `indexes` (one per element for list attributes). Queries push their
+    equality conditions on indexed attributes down to SQL, and the full compiled query is
+    then applied to the decrypted candidates, so results are the same as with the JSON
+    file backend. Values of the attributes in `sensitive_indexes` are stored as an HMAC
+    fingerprint instead of in clear. Every write also bumps a per-table counter in
+    `_data_versions`, which backs data_version across threads and processes.
+
+    Concrete repositories do not subclass this directly: BaseRepository swaps them for a
+    variant that inherits from both (see sqlite_variant), so their own methods keep
+    working on top of these primitives.
+    """
+    backend = 'sqlite'
+    _schemas_ready: set = set()
+
+    def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager, db_file: DbFile, entity_name: str):
+        super().__init__(file_manager, encryption_manager, db_file, entity_name)
+        self.database: SqliteDatabase = sqlite_database
+        self.table = entity_name
+        self.index_table = f"{entity_name}_index"
+        # Escrituras de esta instancia ya contadas en _data_versions (ver data_version)
+        self._own_writes = 0
+        self._own_writes_lock = threading.Lock()
+        self._ensure_schema()
+
+    def _ensure_schema(self) -> None:
+        """
+        Creates the tables and indexes of the entity if they do not exist yet.
+        """
+        key = (self.database.path, self.table)
+        if key in SqliteRepository._schemas_ready:
+            return
+        with self.database.connection() as connection:
+            connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS "{self.table}" (
+                    id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS "{self.index_table}" (
+                    attribute TEXT NOT NULL,
+                    value,
+                    entity_id TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS "{self.index_table}_lookup" ON "{self.index_table}" (attribute, value);
+                CREATE INDEX IF NOT EXISTS "{self.index_table}_entity" ON "{self.index_table}" (entity_id);
+                CREATE TABLE IF NOT EXISTS "_indexed_attributes" (
+                    entity TEXT NOT NULL,
+                    attribute TEXT NOT NULL,
+                    PRIMARY KEY (entity, attribute)
+                );
+                CREATE TABLE IF NOT EXISTS "_data_versions" (
+                    entity TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+            """)
+        self._backfill_indexes()
+        SqliteRepository._schemas_ready.add(key)
+
+    def _backfill_indexes(self) -> None:
+        """
+        Fills the index table for the attributes added to `indexes` after the table was
+        created, so queries on them do not miss the rows written before.
+        """
+        with self.database.transaction() as connection:
+            done = {row[0] for row in connection.execute(
+                'SELECT attribute FROM "_indexed_attributes" WHERE entity = ?', (self.table,)
+            )}
+            # Tablas anteriores a este registro: sus atributos con filas ya estan indexados
+            done.update(row[0] for row in connection.execute(f'SELECT DISTINCT attribute FROM "{self.index_table}"'))
+            missing = [attribute for attribute in self.indexes if attribute != 'id' and attribute not in done]
+            if not missing:
+                return
+            rows = connection.execute(f'SELECT data FROM "{self.table}"').fetchall()
+            connection.executemany(
+                f'INSERT INTO "{self.index_table}" (attribute, value, entity_id) VALUES (?, ?, ?)',
+                [index_row for row in rows for index_row in self._index_rows(self._decrypt(row[0]), missing)],
+            )
+            connection.executemany(
+                'INSERT INTO "_indexed_attributes" (entity, attribute) VALUES (?, ?)',
+                [(self.table, attribute) for attribute in missing],
+            )
+        if rows:
+            logger.info(f"Indexed {', '.join(missing)} of {len(rows)} {self.entity_name}.")
+
+    # ----------- Encoding ------------------
+
+    @staticmethod
+    def _indexable(value: Any) -> bool:
+        return isinstance(value, (str, int, float))
+
+    def _index_value(self, attribute: str, value: Any) -> Any:
+        if attribute in self.sensitive_indexes and isinstance(value, str):
+            return self.encryption_manager.fingerprint(value)
+        return value
+
+    def _index_rows(self, item: dict, attributes: Optional[Iterable[str]] = None) -> List[tuple]:
+        rows = []
+        for attribute in self.indexes if attributes is None else attributes:
+            if attribute == 'id':
+                continue
+            value = item.get(attribute)
+            values = dict.fromkeys(v for v in value if self._indexable(v)) if isinstance(value, list) else (value,)
+            for element in values:
+                if self._indexable(element):
+                    rows.append((attribute, self._index_value(attribute, element), item['id']))
+        return rows
+
+    def _encrypt(self, item: dict) -> bytes:
+        return self.encryption_manager.encrypt_data(json.dumps(item, default=str))
+
+    def _decrypt(self, token: bytes) -> dict:
+        item = json.loads(self.encryption_manager.decrypt_data(token))
+        # Filas migradas desde archivos con fechas en el formato anterior
+        _normalize_timestamps([item])
+        return item
+
+    # ----------- Reading ------------------
+
+    def _fetch(self, sql: str, args: Iterable[Any] = ()) -> List[dict]:
+        rows = self.database.query(sql, tuple(args))
+        return [self._decrypt(row[0]) for row in rows]
+
+    def _items(self) -> List[dict]:
+        return self._fetch(f'SELECT data FROM "{self.table}" ORDER BY rowid')
+
+    def _get_data(self) -> dict:
+        return {self.entity_name: self._items()}
+
+    def _select(self, plan: CompiledQuery, params: tuple) -> List[dict]:
+        """
+        Returns the decrypted rows matching the equality and `has` conditions of the query
+        that can be answered by the primary key or the index table. The caller applies the whole
+        query on top.
+        """
+        clauses = []
+        args = []
+        for position, (attribute, symbol) in enumerate(plan.conditions):
+            value = params[position]
+            if symbol not in ('==', 'has') or not self._indexable(value):
+                continue
+            if attribute == 'id' and symbol == '==':
+                clauses.append('id = ?')
+                args.append(value)
+            elif attribute != 'id' and attribute in self.indexes:
+                clauses.append(f'id IN (SELECT entity_id FROM "{self.index_table}" WHERE attribute = ? AND value = ?)')
+                args.extend((attribute, self._index_value(attribute, value)))
+        sql = f'SELECT data FROM "{self.table}"'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return self._fetch(sql + ' ORDER BY rowid', args)
+
+    def _select_ordered(self, attribute: str, value: Any, sort_attribute: str) -> List[tuple]:
+        """
+        Same as the JSON backend, from the rows selected by the index table. The values are
+        encrypted, so the sort happens after decrypting them.
+        """
+        plan = compile_query(f'{attribute} == ?')
+        entries = []
+        for item in plan.filter(self._select(plan, (value,)), value):
+            sort_value = item.get(sort_attribute)
+            entries.append(('' if sort_value is None else sort_value, item.get('id', ''), item))
+        entries.sort(key=lambda entry: entry[:2])
+        return entries
+
+    def data_version(self) -> Optional[tuple]:
+        """
+        Same as the JSON backend: changes when another process (or another repository
+        instance) writes the table, but not on the writes of this instance, which are
+        reported to the change listeners. PRAGMA data_version is per connection, and each
+        thread has its own, so the version is a counter stored with the data instead.
+        """
+        rows = self.database.query('SELECT version FROM "_data_versions" WHERE entity = ?', (self.table,))
+        version = rows[0][0] if rows else 0
+        with self._own_writes_lock:
+            return (version - self._own_writes,)
+
+    def find_by_ids(self, entity_ids: List[str]) -> Dict[str, T]:
+        found = {}
+        entity_ids = list(dict.fromkeys(entity_ids))
+        for start in range(0, len(entity_ids), _CHUNK_SIZE):
+            chunk = entity_ids[start:start + _CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            for item in self._fetch(f'SELECT data FROM "{self.table}" WHERE id IN ({placeholders})', chunk):
+                found[item['id']] = self._to_entity(item)
+        return found
+
+    def _existing_ids(self, connection: sqlite3.Connection, entity_ids: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(entity_ids), _CHUNK_SIZE):
+            chunk = entity_ids[start:start + _CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = connection.execute(f'SELECT id FROM "{self.table}" WHERE id IN ({placeholders})', chunk)
+            existing.update(row[0] for row in rows)
+        return existing
+
+    # ----------- Writing ------------------
+
+    def _put_items(self, connection: sqlite3.Connection, items: List[dict]) -> None:
+        # ON CONFLICT conserva el rowid, asi que un update no cambia el orden de los items
+        connection.executemany(
+            f'INSERT INTO "{self.table}" (id, data) VALUES (?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+            [(item['id'], self._encrypt(item)) for item in items],
+        )
+        connection.executemany(
+            f'DELETE FROM "{self.index_table}" WHERE entity_id = ?', [(item['id'],) for item in items]
+        )
+        connection.executemany(
+            f'INSERT INTO "{self.index_table}" (attribute, value, entity_id) VALUES (?, ?, ?)',
+            [row for item in items for row in self._index_rows(item)],
+        )
+
+    def _bump_version(self, connection: sqlite3.Connection) -> None:
+        # Dentro de la transaccion de la escritura; se cuenta como propia al hacer commit
+        connection.execute(
+            'INSERT INTO "_data_versions" (entity, version) VALUES (?, 1) '
+            'ON CONFLICT(entity) DO UPDATE SET version = version + 1',
+            (self.table,),
+        )
+
+    def _count_own_write(self) -> None:
+        with self._own_writes_lock:
+            self._own_writes += 1
+
+    def _delete_items(self, connection: sqlite3.Connection, entity_ids: List[str]) -> None:
+        connection.executemany(f'DELETE FROM "{self.table}" WHERE id = ?', [(entity_id,) for entity_id in entity_ids])
+        connection.executemany(f'DELETE FROM "{self.index_table}" WHERE entity_id = ?', [(entity_id,) for entity_id in entity_ids])
+
+    def _replace_all(self, items: List[dict]) -> None:
+        """
+        Replaces the whole table with the given items in one transaction.
+        """
+        with self.database.transaction() as connection:
+            connection.execute(f'DELETE FROM "{self.table}"')
+            connection.execute(f'DELETE FROM "{self.index_table}"')
+            self._put_items(connection, items)
+            self._bump_version(connection)
+        self._count_own_write()
+        self._notify_change(None)
+
+    def _save_data(self, data: dict):
+        self._replace_all(data.get(self.entity_name, []))
+
+    def save_changes(self, added: List[T] = (), updated: List[T] = (), deleted: List[str] = ()) -> List[dict]:
+        """
+        Adds, updates and deletes entities in a single transaction. Updated entities that
+        are not stored and deleted IDs that do not exist are skipped.
+
+        Returns:
+            List[dict]: The put and delete records that changed the data.
+        """
+        applied = []
+        with self.database.transaction() as connection:
+            puts = [entity.model_dump(mode='json') for entity in added]
+            if updated:
+                existing = self._existing_ids(connection, [entity.id for entity in updated])
+                puts.extend(entity.model_dump(mode='json') for entity in updated if entity.id in existing)
+            if puts:
+                self._put_items(connection, puts)
+                applied.extend({'op': 'put', 'item': item} for item in puts)
+            if deleted:
+                existing = self._existing_ids(connection, list(dict.fromkeys(deleted)))
+                removed = [entity_id for entity_id in dict.fromkeys(deleted) if entity_id in existing]
+                self._delete_items(connection, removed)
+                applied.extend({'op': 'delete', 'id': entity_id} for entity_id in removed)
+            if applied:
+                self._bump_version(connection)
+        if applied:
+            self._count_own_write()
+            self._notify_change(self._record_ids(applied))
+        return applied
+
+    def add(self, entity: T) -> T:
+        self.save_changes(added=[entity])
+        return entity
+
+    def update(self, entity: T) -> Optional[T]:
+        return entity if self.save_changes(updated=[entity]) else None
+
+    def delete(self, entity_id: str) -> bool:
+        return bool(self.save_changes(deleted=[entity_id]))
+
+    def modify(self, entity_id: str, change: Callable[[T], object], default: Optional[Callable[[], T]] = None) -> Optional[T]:
+        # BEGIN IMMEDIATE toma el lock de escritura antes de leer
+        with self.database.transaction() as connection:
+            row = connection.execute(f'SELECT data FROM "{self.table}" WHERE id = ?', (entity_id,)).fetchone()
+            if row is None and default is None:
+                return None
+            entity = self._to_entity(self._decrypt(row[0])) if row is not None else default()
+            change(entity)
+            self._put_items(connection, [entity.model_dump(mode='json')])
+            self._bump_version(connection)
+        self._count_own_write()
+        self._notify_change({entity_id})
+        return entity
+
+    def modify_many(self, entity_ids: List[str], change: Callable[[T], object]) -> List[T]:
+        modified = []
+        entity_ids = list(dict.fromkeys(entity_ids))
+        with self.database.transaction() as connection:
+            for start in range(0, len(entity_ids), _CHUNK_SIZE):
+                chunk = entity_ids[start:start + _CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = connection.execute(f'SELECT data FROM "{self.table}" WHERE id IN ({placeholders})', chunk)
+                for row in rows.fetchall():
+                    entity = self._to_entity(self._decrypt(row[0]))
+                    change(entity)
+                    modified.append(entity)
+            if modified:
+                self._put_items(connection, [entity.model_dump(mode='json') for entity in modified])
+                self._bump_version(connection)
+        if modified:
+            self._count_own_write()
+            self._notify_change({entity.id for entity in modified})
+        return modified
+
+    def upsert_many(self, entities: List[T]) -> List[T]:
+        self.save_changes(added=entities)
+        return list(entities)
+
+    # ----------- Maintenance ------------------
+
+    def compact(self) -> bool:
+        """
+        Folds the WAL into the database file. There is no append-only log to compact.
+        """
+        self.database.checkpoint()
+        return False
+
+    def migrate_legacy(self) -> int:
+        # Los archivos JSON se migran con app.jobs.migrate_to_sqlite
+        return 0
+
+    def flush(self) -> bool:
+        # Cada operacion se confirma en su propia transaccion
+        return True
+
+    def set_durability(self, durability: Durability, flush_interval_ms: int = 50, max_pending: int = 100) -> None:
+        """
+        Only records the setting: every transaction is committed before returning, and
+        its fsync policy is set by SQLITE_SYNCHRONOUS.
+        """
+        self.durability = Durability(durability)
+
+
+@lru_cache(maxsize=None)
+def sqlite_variant(repository_class: type) -> type:
+    """
+    Returns the SQLite-backed variant of a concrete repository class. The concrete class
+    comes first in the MRO, so its own methods (e.g. TagRepository's read-only overrides)
+    win, and SqliteRepository replaces the BaseRepository storage primitives below it.
+    """
+    return type(f"Sqlite{repository_class.__name__}", (repository_class, SqliteRepository), {})
+
+
+@lru_cache(maxsize=None)
+def json_variant(repository_class: type) -> type:
+    """
+    Returns a variant of a concrete repository class pinned to the JSON file backend,
+    whatever STORAGE_BACKEND says. Used to read the files when migrating.
+    """
+    return type(f"Json{repository_class.__name__}", (repository_class,), {'backend': 'json'})
@@ -19,9 +19,7 @@ class TagRepository(BaseRepository[Tag]):
         data = self._get_data()
         # The seed file uses a "tags" key.
         tags_data = data.get("tags", [])
-        # The Tag entity expects aliases, but model_validate handles it automatically
-        # when converting dicts to model instances.
-        return [Tag.model_validate(tag) for tag in tags_data]
+        return [Tag.from_storage(tag) for tag in tags_data]
 
     def find_by_id(self, entity_id: str) -> Optional[Tag]:
         """
@@ -30,11 +28,11 @@ class TagRepository(BaseRepository[Tag]):
         data = self._get_data()
         item = next((item for item in data.get("tags", []) if item['id'] == entity_id), None)
         if item:
-            return Tag.model_validate(item)
+            return Tag.from_storage(item)
         return None
 
     def _to_entity(self, item: dict) -> Tag:
-        return Tag(**item)
+        return Tag.from_storage(item)
 
     # --- Read-only implementation: Override write methods ---
 
@@ -0,0 +1,127 @@
+from typing import Any, Dict, List, Optional, Tuple
+from app.domain.entities import BaseEntity
+from app.repository.base_repository import BaseRepository
+import logging
+
+logger = logging.getLogger('app')
+
+
+class UnitOfWork:
+    """
+    Groups reads and writes over several repositories into a single commit.
+
+    Entities read through get() are kept in an identity map, so asking twice for the same
+    id returns the same object without going back to the repository. The unit of work
+    remembers how each entity looked when it was loaded, and on commit writes only the
+    ones that changed, together with the added and deleted ones, with one save_changes
+    call per repository (one write per touched file).
+
+    Used as a context manager it commits when the block ends normally and discards every
+    change if the block raises.
+
+    Example:
+        with UnitOfWork() as uow:
+            chat = uow.get(chat_repository, chat_id)
+            chat.last_message_at = datetime.now()
+            uow.add(message_repository, message)
+    """
+    def __init__(self) -> None:
+        self._identity_map: Dict[Tuple[int, Any], Optional[BaseEntity]] = {}
+        self._originals: Dict[Tuple[int, Any], dict] = {}
+        self._repositories: Dict[int, BaseRepository] = {}
+        self._new: Dict[int, List[BaseEntity]] = {}
+        self._deleted: Dict[int, List[Any]] = {}
+
+    def _track(self, repository: BaseRepository) -> int:
+        key = id(repository)
+        self._repositories.setdefault(key, repository)
+        return key
+
+    def get(self, repository: BaseRepository, entity_id) -> Optional[BaseEntity]:
+        """
+        Returns the entity with the given id, loading it from the repository only the
+        first time it is requested.
+
+        Args:
+            repository (BaseRepository): The repository holding the entity.
+            entity_id: The ID of the entity.
+
+        Returns:
+            The tracked entity, or None if it does not exist.
+        """
+        key = (self._track(repository), entity_id)
+        if key not in self._identity_map:
+            entity = repository.find_by_id(entity_id)
+            self._identity_map[key] = entity
+            if entity is not None:
+                self._originals[key] = entity.model_dump(mode='json')
+        return self._identity_map[key]
+
+    def add(self, repository: BaseRepository, entity: BaseEntity) -> BaseEntity:
+        """
+        Registers a new entity to be added on commit.
+        """
+        repository_key = self._track(repository)
+        self._new.setdefault(repository_key, []).append(entity)
+        self._identity_map[(repository_key, entity.id)] = entity
+        return entity
+
+    def delete(self, repository: BaseRepository, entity_id) -> None:
+        """
+        Registers an entity to be deleted on commit.
+        """
+        repository_key = self._track(repository)
+        self._deleted.setdefault(repository_key, []).append(entity_id)
+        self._identity_map[(repository_key, entity_id)] = None
+
+    def _dirty(self, repository_key: int) -> List[BaseEntity]:
+        """
+        Returns the loaded entities of a repository that changed since they were read.
+        """
+        dirty = []
+        for (key, entity_id), original in self._originals.items():
+            if key != repository_key:
+                continue
+            entity = self._identity_map.get((key, entity_id))
+            if entity is not None and entity.model_dump(mode='json') != original:
+                dirty.append(entity)
+        return dirty
+
+    def commit(self) -> None:
+        """
+        Writes the added, changed and deleted entities of every repository touched.
+        """
+        for repository_key, repository in self._repositories.items():
+            deleted = set(self._deleted.get(repository_key, []))
+            new = [entity for entity in self._new.get(repository_key, []) if entity.id not in deleted]
+            new_ids = {entity.id for entity in new}
+            dirty = [
+                entity for entity in self._dirty(repository_key)
+                if entity.id not in deleted and entity.id not in new_ids
+            ]
+            if new or dirty or deleted:
+                repository.save_changes(added=new, updated=dirty, deleted=list(deleted))
+            for entity in new + dirty:
+                self._originals[(repository_key, entity.id)] = entity.model_dump(mode='json')
+        self._new.clear()
+        self._deleted.clear()
+
+    def rollback(self) -> None:
+        """
+        Discards every pending change and forgets the loaded entities.
+        """
+        self._identity_map.clear()
+        self._originals.clear()
+        self._new.clear()
+        self._deleted.clear()
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            logger.warning(f"Unit of work rolled back: {exc_value}")
+            self.rollback()
+        return False
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Sequence
 from app.domain.entities import User, DbFile
 from app.repository.base_repository import BaseRepository
 from app.infraestructure.file_service import FileManager
@@ -10,6 +10,9 @@ class UserRepository(BaseRepository[User]):
     It handles CRUD operations for User objects, leveraging the generic functionality
     provided by BaseRepository and implementing User-specific search methods.
     """
+    indexes = ('id', 'email', 'career', 'tag_ids', 'is_active')
+    sensitive_indexes = ('email',)
+
     def __init__(self, file_manager: FileManager, encryption_manager: EncryptionManager):
         """
         Initializes the UserRepository.
@@ -30,7 +33,7 @@ class UserRepository(BaseRepository[User]):
         Returns:
             User: A User domain entity.
         """
-        return User(**item)
+        return User.from_storage(item)
 
     def find_by_username(self, username: str) -> Optional[User]:
         """
@@ -55,3 +58,32 @@ class UserRepository(BaseRepository[User]):
             Optional[User]: The User entity if found, otherwise None.
         """
         return self.find_by_attribute('email', email)
+
+    def find_page(self, career: Optional[str] = None, tag_ids: Sequence[str] = (), is_active: Optional[bool] = None,
+                  after: Optional[str] = None, limit: int = 20, fields: Optional[Sequence[str]] = None) -> tuple[list, bool]:
+        """
+        Finds a page of users, ordered by id, filtered with the indexes of the repository.
+
+        Args:
+            career (str, optional): Only users of this career.
+            tag_ids (Sequence[str]): Only users having every one of these tags.
+            is_active (bool, optional): Only active (or inactive) users.
+            after (str, optional): The id of the last user of the previous page.
+            limit (int): The size of the page.
+            fields (Sequence[str], optional): Returns dicts with only these attributes
+                instead of User entities (see BaseRepository.query_page).
+
+        Returns:
+            tuple[list, bool]: The users of the page, and whether there are more.
+        """
+        conditions, params = [], []
+        for tag_id in dict.fromkeys(tag_ids):
+            conditions.append('tag_ids has ?')
+            params.append(tag_id)
+        if career is not None:
+            conditions.append('career == ?')
+            params.append(career)
+        if is_active is not None:
+            conditions.append('is_active == ?')
+            params.append(is_active)
+        return self.query_page(' & '.join(conditions) or None, *params, after=after, limit=limit, fields=fields)
@@ -0,0 +1,119 @@
+import threading
+import logging
+from enum import Enum
+from typing import Callable, Hashable, List
+
+logger = logging.getLogger('app')
+
+
+class Durability(str, Enum):
+    """
+    When a repository mutation reaches the disk.
+    """
+    # Cada cambio se escribe antes de que add/update/delete regresen
+    IMMEDIATE = 'immediate'
+    # Los cambios se aplican al snapshot en memoria y se escriben en grupo cada N ms o N operaciones
+    BATCHED = 'batched'
+
+
+class PendingWrites:
+    """
+    Process-wide registry of changes already applied to a cached snapshot but not yet
+    written to disk, keyed by data file.
+
+    Records use the same format as the append-only log, so any repository instance that
+    reloads a snapshot from disk can replay them on top and keep seeing its own writes.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._records: dict[Hashable, List[dict]] = {}
+
+    def add(self, key: Hashable, record: dict) -> int:
+        """
+        Queues a record and returns how many records are pending for the key.
+        """
+        with self._lock:
+            records = self._records.setdefault(key, [])
+            records.append(record)
+            return len(records)
+
+    def peek(self, key: Hashable) -> List[dict]:
+        """
+        Returns a copy of the records pending for the key.
+        """
+        with self._lock:
+            return list(self._records.get(key, ()))
+
+    def take(self, key: Hashable) -> List[dict]:
+        """
+        Removes and returns the records pending for the key.
+        """
+        with self._lock:
+            return self._records.pop(key, [])
+
+    def restore(self, key: Hashable, records: List[dict]) -> None:
+        """
+        Puts back records whose write failed, ahead of any queued since.
+        """
+        if not records:
+            return
+        with self._lock:
+            self._records[key] = records + self._records.get(key, [])
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Drops the records pending for the key, e.g. after writing a full snapshot with them.
+        """
+        with self._lock:
+            self._records.pop(key, None)
+
+    def count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._records.get(key, ()))
+
+
+class FlushScheduler:
+    """
+    Background thread that runs a flush callback once the coalescing window after the
+    first pending write has elapsed.
+    """
+    def __init__(self, flush: Callable[[], None], interval_ms: int, name: str):
+        """
+        Args:
+            flush: The callback that writes every pending change.
+            interval_ms (int): How long writes are coalesced before flushing.
+            name (str): Thread name, used in logs.
+        """
+        self._flush = flush
+        self._interval = interval_ms / 1000
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        """
+        Signals that there are pending writes.
+        """
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            if self._stopped.is_set():
+                break
+            # Ventana de agrupacion: los cambios que lleguen mientras tanto salen en el mismo flush
+            self._stopped.wait(self._interval)
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except Exception:
+                logger.exception(f"Background flush failed in {self._thread.name}.")
+
+
+# Registro compartido por todos los repositorios del proceso
+pending_writes = PendingWrites()
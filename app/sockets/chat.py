@@ -1,9 +1,10 @@
 from app.domain.entities import User
 from app.extensions import socketio
 from flask_socketio import disconnect, emit
-from flask import session
+from flask import request, session
 from app.middleware.auth import socket_token_required
 from app.application.ChatService import chat_service
+from app.application.PresenceService import presence_service
 
 
 @socketio.on("connect")
@@ -19,7 +20,7 @@ def on_connect(user: User, auth):
 
     # Store user_id in the session for this connection
     session["user_id"] = user.id
-    chat_service.manage_connection(user.id)
+    chat_service.manage_connection(user.id, request.sid)
 
 
 @socketio.on("disconnect")
@@ -29,7 +30,18 @@ def on_disconnect():
     Retrieves the user_id from the session to update their status.
     """
     user_id = session.get("user_id")
-    chat_service.manage_disconnection(user_id)
+    chat_service.manage_disconnection(user_id, request.sid)
+
+
+@socketio.event
+def heartbeat(data=None):
+    """
+    Keeps the session online when PRESENCE_SESSION_TTL_SECONDS is set.
+    Clients should emit it more often than the TTL.
+    """
+    user_id = session.get("user_id")
+    if user_id:
+        presence_service.heartbeat(user_id, request.sid)
 
 
 @socketio.event
@@ -0,0 +1,55 @@
+import logging
+from typing import Callable, TypeVar
+
+logger = logging.getLogger('app')
+
+R = TypeVar('R')
+
+# Funcion que ejecuta una llamada bloqueante fuera del event loop; None la ejecuta directo
+_executor: Callable | None = None
+
+
+def enable_offload(async_mode: str, pool_size: int) -> None:
+    """
+    Activa el envio de las llamadas bloqueantes (archivos, cifrado, locks) al pool de hilos
+    nativos del modo asincrono, para que no detengan el event loop mientras se ejecutan.
+    En modo 'threading' no hace nada: cada conexion ya tiene su propio hilo.
+
+    Args:
+        async_mode (str): 'gevent', 'eventlet' o 'threading'.
+        pool_size (int): Maximo de hilos nativos del pool.
+    """
+    global _executor
+    if async_mode == 'gevent':
+        import gevent
+        hub = gevent.get_hub()
+        hub.threadpool.maxsize = pool_size
+
+        def apply(func: Callable, *args):
+            return hub.threadpool.apply(func, args)
+
+        _executor = apply
+    elif async_mode == 'eventlet':
+        import os
+        os.environ.setdefault('EVENTLET_THREADPOOL_SIZE', str(pool_size))
+        from eventlet import tpool
+        _executor = tpool.execute
+    else:
+        _executor = None
+        return
+    logger.info(f"Blocking calls offloaded to a {async_mode} pool of {pool_size} threads.")
+
+
+def disable_offload() -> None:
+    global _executor
+    _executor = None
+
+
+def run_blocking(func: Callable[..., R], *args) -> R:
+    """
+    Ejecuta una llamada bloqueante: en el pool de hilos si enable_offload lo activo, o
+    directamente en el hilo actual si no.
+    """
+    if _executor is None:
+        return func(*args)
+    return _executor(func, *args)
@@ -0,0 +1,23 @@
+import re
+import unicodedata
+from typing import List
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """
+    Pasa un texto a minusculas y le quita los acentos y diacriticos (incluida la tilde de
+    la ñ, que muchos usuarios no escriben), para comparar sin importar como se escribio:
+    "Canción" y "cancion" quedan iguales.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str, min_length: int = 2) -> List[str]:
+    """
+    Divide un texto normalizado en palabras, en orden y con repeticiones. Las palabras
+    mas cortas que min_length (p. ej. "y", "a") se descartan.
+    """
+    return [word for word in _WORD.findall(normalize(text)) if len(word) >= min_length]
@@ -1 +1,36 @@
-# TODO: Settear la wsgi de flask con gunicorn para prod
\ No newline at end of file
+"""
+Punto de entrada de produccion: el servidor Socket.IO corre sobre un event loop cooperativo
+(gevent por defecto, o eventlet), asi que cada websocket inactivo cuesta un greenlet y no un
+hilo. Las lecturas/escrituras de archivos y el cifrado se envian al pool de hilos nativos
+(ver app.utils.offload) para no detener el event loop. No hay modo debug ni reloader; para
+desarrollo se usa `python -m app.main`.
+
+    python -m app.wsgi
+    gunicorn -k gevent -w 1 app.wsgi:app
+
+Con varios workers, configurar SOCKETIO_MESSAGE_QUEUE y un balanceador con sesiones sticky.
+"""
+import os
+
+os.environ.setdefault("SOCKETIO_ASYNC_MODE", "gevent")
+ASYNC_MODE = os.environ["SOCKETIO_ASYNC_MODE"]
+
+# El monkey patching debe hacerse antes de importar cualquier modulo que use sockets o hilos
+if ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+
+import logging  # noqa: E402
+from app.config.settings import Config  # noqa: E402
+from app.extensions import socketio  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.utils.offload import enable_offload  # noqa: E402
+
+enable_offload(ASYNC_MODE, Config.BLOCKING_POOL_SIZE)
+app = create_app(logging_level=logging.INFO)
+
+if __name__ == "__main__":
+    socketio.run(app, host=Config.HOST, port=Config.PORT, debug=False, use_reloader=False, log_output=False)
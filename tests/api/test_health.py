@@ -3,8 +3,7 @@ from app.main import create_app
 
 @pytest.fixture
 def client():
-    app = create_app()
-    app.config['TESTING'] = True
+    app = create_app(testing=True)
     with app.test_client() as client:
         yield client
 
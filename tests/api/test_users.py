@@ -3,18 +3,20 @@ from unittest.mock import patch
 from app.main import create_app
 from app.domain.entities import User
 from app.domain.exceptions import InvalidCredentialsException
+from app.middleware.auth import auth_cache
 
 # --- Test Fixtures ---
 
 @pytest.fixture
 def client():
     """Create and configure a new app instance for each test."""
-    app = create_app()
-    app.config['TESTING'] = True
+    app = create_app(testing=True)
     
     # Establish an application context before running the tests.
     with app.app_context():
         yield app.test_client()
+    # The same fake token is used by every test
+    auth_cache.invalidate_users(None)
 
 @pytest.fixture
 def sample_users():
@@ -26,14 +28,14 @@ def sample_users():
 
 # --- Tests for GET /users ---
 
-@patch('app.middleware.auth.UserRepository')
+@patch('app.middleware.auth.user_repository')
 @patch('app.middleware.auth.jwt.decode')
 @patch('app.api.users.user_service')
 def test_get_all_users_success(mock_user_service, mock_jwt_decode, mock_user_repo, client, sample_users):
     """Test GET /users returns a list of users successfully."""
     # Arrange
     mock_jwt_decode.return_value = {'sub': '1'}
-    mock_user_repo.return_value.find_by_id.return_value = sample_users[0]
+    mock_user_repo.find_by_id.return_value = sample_users[0]
     mock_user_service.get_all_users.return_value = sample_users
     
     # Act
@@ -48,14 +50,14 @@ def test_get_all_users_success(mock_user_service, mock_jwt_decode, mock_user_rep
     assert json_data['data'][1]['name'] == "Normal User"
     mock_user_service.get_all_users.assert_called_once()
 
-@patch('app.middleware.auth.UserRepository')
+@patch('app.middleware.auth.user_repository')
 @patch('app.middleware.auth.jwt.decode')
 @patch('app.api.users.user_service')
 def test_get_all_users_empty(mock_user_service, mock_jwt_decode, mock_user_repo, client, sample_users):
     """Test GET /users returns an empty list when no users exist."""
     # Arrange
     mock_jwt_decode.return_value = {'sub': '1'}
-    mock_user_repo.return_value.find_by_id.return_value = sample_users[0]
+    mock_user_repo.find_by_id.return_value = sample_users[0]
     mock_user_service.get_all_users.return_value = []
     
     # Act
@@ -66,14 +68,14 @@ def test_get_all_users_empty(mock_user_service, mock_jwt_decode, mock_user_repo,
     assert response.get_json() == {"data": []}
     mock_user_service.get_all_users.assert_called_once()
 
-@patch('app.middleware.auth.UserRepository')
+@patch('app.middleware.auth.user_repository')
 @patch('app.middleware.auth.jwt.decode')
 @patch('app.api.users.user_service')
 def test_get_all_users_repository_error(mock_user_service, mock_jwt_decode, mock_user_repo, client, sample_users):
     """Test GET /users handles unexpected errors gracefully."""
     # Arrange
     mock_jwt_decode.return_value = {'sub': '1'}
-    mock_user_repo.return_value.find_by_id.return_value = sample_users[0]
+    mock_user_repo.find_by_id.return_value = sample_users[0]
     mock_user_service.get_all_users.side_effect = Exception("Database error")
     
     # Act
@@ -84,6 +86,35 @@ def test_get_all_users_repository_error(mock_user_service, mock_jwt_decode, mock
     assert response.get_json() == {"error": "Ocurrió un error inesperado al obtener usuarios."}
     mock_user_service.get_all_users.assert_called_once()
 
+@patch('app.middleware.auth.user_repository')
+@patch('app.middleware.auth.jwt.decode')
+@patch('app.api.users.user_service')
+def test_get_users_page(mock_user_service, mock_jwt_decode, mock_user_repo, client, sample_users):
+    """Test GET /users with filters returns one projected page and its cursor."""
+    # Arrange
+    mock_jwt_decode.return_value = {'sub': '1'}
+    mock_user_repo.find_by_id.return_value = sample_users[0]
+    mock_user_service.list_users.return_value = ([{"id": "1", "name": "Admin User"}], "1")
+
+    # Act
+    response = client.get('/users/?fields=id,name&tag_ids=a,b&is_active=true&limit=1',
+                          headers={'Authorization': 'Bearer fake_token'})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "data": [{"id": "1", "name": "Admin User"}],
+        "paging": {"has_more": True, "next_cursor": "1"},
+    }
+    mock_user_service.list_users.assert_called_once_with(
+        fields=["id", "name"], career=None, tag_ids=["a", "b"], is_active=True, after=None, limit=1
+    )
+    mock_user_service.get_all_users.assert_not_called()
+
+    # Invalid parameters
+    response = client.get('/users/?is_active=maybe', headers={'Authorization': 'Bearer fake_token'})
+    assert response.status_code == 400
+
 
 # --- Tests for POST /users/login ---
 
@@ -0,0 +1,232 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.application.ChatService import ChatService
+from app.domain.entities import Chat, Message, User
+from app.repository.message_repository import MessagePage
+from datetime import datetime
+
+@pytest.fixture
+def mock_user_repository():
+    return MagicMock()
+
+@pytest.fixture
+def mock_chat_repository():
+    return MagicMock()
+
+@pytest.fixture
+def mock_message_repository():
+    return MagicMock()
+
+@pytest.fixture
+def mock_presence_service():
+    return MagicMock()
+
+@pytest.fixture
+def mock_pending_delivery_repository():
+    return MagicMock()
+
+@pytest.fixture
+def chat_service(mock_user_repository, mock_chat_repository, mock_message_repository, mock_presence_service, mock_pending_delivery_repository):
+    return ChatService(
+        mock_user_repository, mock_chat_repository, mock_message_repository, MagicMock(),
+        mock_presence_service, mock_pending_delivery_repository,
+    )
+
+def test_get_chats_for_user_reads_only_chat_summaries(chat_service, mock_user_repository, mock_chat_repository, mock_message_repository, mock_presence_service):
+    """
+    GIVEN a user with two chats
+    WHEN get_chats_for_user is called
+    THEN users are fetched with one call and the messages store is not read at all.
+    """
+    # Arrange
+    older = Chat(user_a="alice", user_b="bob", last_message_at=datetime(2024, 1, 1),
+                 last_message_preview="Hola", unread_counts={"alice": 2, "bob": 0})
+    newer = Chat(user_a="alice", user_b="carol", last_message_at=datetime(2024, 2, 1))
+    mock_chat_repository.find_all_by_user.return_value = [older, newer]
+    mock_user_repository.find_by_ids.return_value = {
+        # bob quedo guardado como activo pero no tiene sesiones abiertas
+        "bob": User(id="bob", name="Bob", email="bob@example.com", password="pw", is_active=True),
+        "carol": User(id="carol", name="Carol", email="c@example.com", password="pw", is_active=False),
+    }
+    mock_presence_service.is_online.side_effect = lambda user_id: user_id == "carol"
+
+    # Act
+    chats = chat_service.get_chats_for_user("alice")
+
+    # Assert
+    mock_user_repository.find_by_ids.assert_called_once_with(["bob", "carol"])
+    assert mock_message_repository.method_calls == []
+    assert [chat["id"] for chat in chats] == [newer.id, older.id]
+    assert chats[1]["unread_messages"] == 2
+    assert chats[1]["last_message"] == {"content": "Hola", "timestamp": "2024-01-01T00:00:00"}
+    assert chats[0]["unread_messages"] == 0
+    assert chats[0]["last_message"] is None
+    assert chats[0]["other_user"]["is_active"] is True
+    assert chats[1]["other_user"]["is_active"] is False
+
+def test_record_message_updates_summary():
+    """
+    GIVEN a chat
+    WHEN a message is recorded in its summary
+    THEN the preview and time change and only the recipient's unread counter grows.
+    """
+    chat = Chat(user_a="alice", user_b="bob", unread_counts={"bob": 1})
+    message = Message(conversation_id=chat.id, sender_id="alice", content="x" * 500, delivered=False)
+
+    ChatService._record_message(chat, message)
+
+    assert chat.unread_counts == {"bob": 2}
+    assert chat.last_message_at == message.timestamp
+    assert len(chat.last_message_preview) == 200
+
+def test_load_chat_msgs_resets_unread_counter(chat_service, mock_chat_repository, mock_message_repository):
+    """
+    GIVEN a chat with unread messages for a user
+    WHEN the user loads the chat
+    THEN the messages are marked delivered in one call and the user's counter is cleared.
+    """
+    # Arrange
+    chat = Chat(user_a="alice", user_b="bob", unread_counts={"alice": 1})
+    unread = Message(conversation_id=chat.id, sender_id="bob", content="Hola", delivered=False)
+    mock_message_repository.find_by_conversation_id.return_value = [unread]
+    mock_chat_repository.modify.side_effect = lambda chat_id, change: change(chat) or chat
+
+    # Act
+    chat_service.load_chat_msgs(chat, "alice")
+
+    # Assert
+    mock_message_repository.update_many.assert_called_once_with([unread])
+    assert unread.delivered is True
+    assert chat.unread_counts == {}
+
+def test_load_chat_page_marks_only_undelivered_messages(chat_service, mock_chat_repository, mock_message_repository):
+    """
+    GIVEN a client syncing an open chat from a cursor
+    WHEN the user loads the page of new messages
+    THEN only that page is read, plus the undelivered messages that get marked delivered.
+    """
+    # Arrange
+    chat = Chat(user_a="alice", user_b="bob", unread_counts={"alice": 1})
+    unread = Message(conversation_id=chat.id, sender_id="bob", content="Hola", delivered=False)
+    mock_message_repository.find_page.return_value = MessagePage([unread.model_copy()], False, "p", "n")
+    mock_message_repository.query.return_value = [unread]
+    mock_chat_repository.modify.side_effect = lambda chat_id, change: change(chat) or chat
+
+    # Act
+    page = chat_service.load_chat_page(chat, "alice", since="cursor", limit=50)
+
+    # Assert
+    mock_message_repository.find_page.assert_called_once_with(chat.id, since="cursor", before=None, limit=50)
+    mock_message_repository.find_by_conversation_id.assert_not_called()
+    mock_message_repository.update_many.assert_called_once_with([unread])
+    assert page.messages[0].delivered is True
+    assert isinstance(page.messages[0].timestamp, str)
+    assert chat.unread_counts == {}
+
+def test_message_to_offline_user_is_queued(chat_service, mock_presence_service, mock_pending_delivery_repository):
+    """
+    GIVEN a recipient that is not connected, although still stored as active
+    WHEN a message is sent to them
+    THEN it is queued for their next connection instead of emitted.
+    """
+    sender = User(id="alice", name="Alice", email="a@example.com", password="pw")
+    reciever = User(id="bob", name="Bob", email="b@example.com", password="pw", is_active=True)
+    chat = Chat(user_a="alice", user_b="bob")
+    message = Message(conversation_id=chat.id, sender_id="alice", content="Hola", delivered=False)
+    mock_presence_service.is_online.return_value = False
+
+    with patch("app.application.ChatService.socketio") as mock_socketio:
+        chat_service._send_notification(sender, chat, reciever, message)
+
+    mock_socketio.emit.assert_not_called()
+    mock_pending_delivery_repository.enqueue.assert_called_once_with("bob", chat.id, message.id, message.timestamp, 500)
+
+def test_dm_updates_the_chat_summary_after_storing_the_message(chat_service, mock_user_repository, mock_chat_repository, mock_message_repository):
+    """
+    GIVEN an existing chat between two stored users
+    WHEN one of them sends a message
+    THEN the message is stored and the summary updated under the chat's write lock.
+    """
+    chat = Chat(user_a="alice", user_b="bob")
+    users = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw"),
+        "bob": User(id="bob", name="Bob", email="b@example.com", password="pw"),
+    }
+    mock_chat_repository.find_by_id.return_value = chat
+    mock_user_repository.find_by_id.side_effect = users.get
+    mock_chat_repository.modify.side_effect = lambda chat_id, change: change(chat) or chat
+
+    with patch.object(chat_service, "_send_notification") as mock_send:
+        chat_service.manage_dm("alice", chat.id, "Hola")
+
+    message = mock_message_repository.add.call_args.args[0]
+    assert message.conversation_id == chat.id and message.sender_id == "alice"
+    assert chat.unread_counts == {"bob": 1}
+    mock_send.assert_called_once_with(users["alice"], chat, users["bob"], message)
+
+def test_dm_with_a_missing_user_stores_nothing(chat_service, mock_user_repository, mock_chat_repository, mock_message_repository):
+    """
+    GIVEN a chat whose other participant no longer exists
+    WHEN a message is sent to it
+    THEN neither the message nor the chat summary are written.
+    """
+    chat = Chat(user_a="alice", user_b="bob")
+    mock_chat_repository.find_by_id.return_value = chat
+    mock_user_repository.find_by_id.side_effect = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw"),
+    }.get
+
+    chat_service.manage_dm("alice", chat.id, "Hola")
+
+    mock_message_repository.add.assert_not_called()
+    mock_chat_repository.modify.assert_not_called()
+
+def test_connection_sends_queued_messages_in_one_batch(chat_service, mock_user_repository, mock_message_repository, mock_pending_delivery_repository):
+    """
+    GIVEN messages queued while a user was offline, one of them already read by REST
+    WHEN the user connects
+    THEN the undelivered ones are sent in a single notifications_batch event, oldest first.
+    """
+    # Arrange
+    chat = Chat(user_a="alice", user_b="bob")
+    older = Message(conversation_id=chat.id, sender_id="alice", content="1", delivered=False, timestamp=datetime(2024, 1, 1))
+    newer = Message(conversation_id=chat.id, sender_id="alice", content="2", delivered=False, timestamp=datetime(2024, 1, 2))
+    read = Message(conversation_id=chat.id, sender_id="alice", content="3", delivered=True)
+    mock_pending_delivery_repository.peek.return_value = [newer.id, older.id, read.id]
+    mock_message_repository.find_by_ids.return_value = {message.id: message for message in (newer, older, read)}
+    mock_user_repository.find_by_ids.return_value = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw"),
+    }
+
+    # Act
+    with patch("app.application.ChatService.join_room"), patch("app.application.ChatService.send"), \
+            patch("app.application.ChatService.emit") as mock_emit:
+        chat_service.manage_connection("bob", "sid-1")
+
+    # Assert
+    mock_emit.assert_called_once()
+    event, payload = mock_emit.call_args.args
+    assert event == "notifications_batch"
+    assert [n["message_id"] for n in payload["notifications"]] == [older.id, newer.id]
+    assert payload["notifications"][0]["sender_name"] == "Alice"
+    mock_pending_delivery_repository.acknowledge.assert_called_once_with("bob", [newer.id, older.id, read.id])
+
+def test_queued_messages_stay_queued_when_the_batch_is_not_sent(chat_service, mock_user_repository, mock_message_repository, mock_pending_delivery_repository):
+    """
+    GIVEN messages queued while a user was offline
+    WHEN emitting the batch fails
+    THEN the queue is not emptied, so they are sent on the next connection.
+    """
+    message = Message(conversation_id="chat-1", sender_id="alice", content="1", delivered=False)
+    mock_pending_delivery_repository.peek.return_value = [message.id]
+    mock_message_repository.find_by_ids.return_value = {message.id: message}
+    mock_user_repository.find_by_ids.return_value = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw"),
+    }
+
+    with patch("app.application.ChatService.join_room"), patch("app.application.ChatService.send"), \
+            patch("app.application.ChatService.emit", side_effect=RuntimeError("disconnected")):
+        with pytest.raises(RuntimeError):
+            chat_service.manage_connection("bob", "sid-1")
+
+    mock_pending_delivery_repository.acknowledge.assert_not_called()
@@ -0,0 +1,146 @@
+import pytest
+from unittest.mock import MagicMock
+from app.application.PresenceService import PresenceService
+from app.domain.entities import User, WorkerPresence
+
+@pytest.fixture
+def mock_user_repository():
+    return MagicMock()
+
+@pytest.fixture
+def mock_presence_repository():
+    repository = MagicMock()
+    repository.find_workers_of.return_value = []
+    repository.find_stale.return_value = []
+    return repository
+
+@pytest.fixture
+def presence_service(mock_user_repository, mock_presence_repository):
+    return PresenceService(mock_user_repository, mock_presence_repository, flush_interval_ms=10, session_ttl_seconds=30)
+
+def test_user_stays_online_until_last_session_closes(presence_service):
+    """
+    GIVEN a user connected from two tabs
+    WHEN the tabs are closed one by one
+    THEN the user is online until the last one closes.
+    """
+    assert presence_service.connect("alice", "tab-1") is True
+    assert presence_service.connect("alice", "tab-2") is False
+
+    assert presence_service.disconnect("alice", "tab-1") is False
+    assert presence_service.is_online("alice") is True
+    assert presence_service.disconnect("alice", "tab-2") is True
+    assert presence_service.is_online("alice") is False
+    assert presence_service.disconnect("alice", "tab-2") is False
+
+def test_flush_writes_only_changed_status_once(presence_service, mock_user_repository):
+    """
+    GIVEN several connects and disconnects within one flush interval
+    WHEN the presence is flushed
+    THEN only users whose stored status differs are written, with one bulk call.
+    """
+    # Arrange
+    mock_user_repository.find_by_ids.return_value = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw", is_active=False),
+        "bob": User(id="bob", name="Bob", email="b@example.com", password="pw", is_active=False),
+    }
+    presence_service.connect("alice", "s1")
+    presence_service.connect("bob", "s2")
+    presence_service.disconnect("bob", "s2")
+
+    # Act
+    written = presence_service.flush()
+
+    # Assert
+    assert written == 1
+    mock_user_repository.modify_many.assert_called_once()
+    ids, change = mock_user_repository.modify_many.call_args.args
+    assert ids == ["alice"]
+    user = User(id="alice", name="Alice", email="a@example.com", password="pw", is_active=False)
+    change(user)
+    assert user.is_active is True
+    assert presence_service.flush() == 0
+
+def test_failed_flush_keeps_pending_changes(presence_service, mock_user_repository):
+    """
+    GIVEN a pending status change
+    WHEN the flush fails
+    THEN the change is kept for the next flush.
+    """
+    mock_user_repository.find_by_ids.side_effect = [OSError("disk full"), {}]
+    presence_service.connect("alice", "s1")
+
+    with pytest.raises(OSError):
+        presence_service.flush()
+
+    presence_service.flush()
+    assert mock_user_repository.find_by_ids.call_args.args[0] == ["alice"]
+
+def test_sessions_without_heartbeat_expire(presence_service):
+    """
+    GIVEN two sessions, only one of which sends heartbeats
+    WHEN the TTL elapses
+    THEN the silent session is closed and its user goes offline.
+    """
+    presence_service.connect("alice", "s1")
+    presence_service.connect("bob", "s2")
+    presence_service._sessions["alice"]["s1"] -= 60
+
+    assert presence_service.expire() == ["alice"]
+    assert presence_service.is_online("alice") is False
+    assert presence_service.heartbeat("bob", "s2") is True
+    assert presence_service.heartbeat("alice", "s1") is False
+
+def test_user_with_a_session_in_another_worker_stays_active(presence_service, mock_user_repository, mock_presence_repository):
+    """
+    GIVEN a user connected to this worker and to another one
+    WHEN the session on this worker is closed and the presence is flushed
+    THEN this worker publishes it is gone, but the stored user stays active.
+    """
+    mock_user_repository.find_by_ids.return_value = {
+        "alice": User(id="alice", name="Alice", email="a@example.com", password="pw", is_active=True),
+    }
+    mock_presence_repository.find_workers_of.side_effect = lambda user_id, since: [
+        WorkerPresence(id="other-worker", user_ids=["alice"]),
+    ]
+    presence_service.connect("alice", "s1")
+    presence_service.disconnect("alice", "s1")
+
+    assert presence_service.flush() == 0
+    mock_presence_repository.publish.assert_called_once_with(presence_service.worker_id, frozenset())
+    mock_user_repository.modify_many.assert_not_called()
+    assert presence_service.is_online("alice") is True
+
+def test_users_of_stale_workers_go_offline(presence_service, mock_user_repository, mock_presence_repository):
+    """
+    GIVEN a worker that stopped publishing while it had a user online
+    WHEN the stale workers are reaped and the presence is flushed
+    THEN its record is dropped and the user is stored as offline.
+    """
+    mock_presence_repository.find_stale.return_value = [WorkerPresence(id="dead-worker", user_ids=["bob"])]
+    mock_user_repository.find_by_ids.return_value = {
+        "bob": User(id="bob", name="Bob", email="b@example.com", password="pw", is_active=True),
+    }
+
+    assert presence_service.reap() == ["dead-worker"]
+    mock_presence_repository.remove.assert_called_once_with(["dead-worker"])
+    assert presence_service.flush() == 1
+    ids, change = mock_user_repository.modify_many.call_args.args
+    user = User(id="bob", name="Bob", email="b@example.com", password="pw", is_active=True)
+    change(user)
+    assert ids == ["bob"] and user.is_active is False
+
+def test_unchanged_users_are_not_republished(presence_service, mock_presence_repository):
+    """
+    GIVEN the users of this worker already published
+    WHEN they are published again without any change
+    THEN the presence file is not rewritten.
+    """
+    presence_service.connect("alice", "s1")
+    assert presence_service.publish() is True
+
+    presence_service.connect("alice", "s2")
+    assert presence_service.publish() is False
+    presence_service.connect("bob", "s3")
+    assert presence_service.publish() is True
+    assert mock_presence_repository.publish.call_count == 2
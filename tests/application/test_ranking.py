@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.application.ranking import FeedRanker, RankingWeights
+from app.domain.entities import Post, Tag, User
+from app.repository.post_feed import PostFeed
+from app.repository.post_repository import PostRepository
+from app.repository.tag_repository import TagRepository
+from app.repository.user_repository import UserRepository
+
+
+def repository(spec, entities):
+    repo = MagicMock(spec=spec)
+    repo.find_all.side_effect = lambda: list(entities.values())
+    repo.find_by_ids.side_effect = lambda ids: {i: entities[i] for i in ids if i in entities}
+    repo.data_version.return_value = (1,)
+    return repo
+
+
+@pytest.fixture
+def users():
+    return {
+        "viewer": User(id="viewer", name="V", email="v@example.com", password="pw", tag_ids=["music"]),
+        "fan": User(id="fan", name="F", email="f@example.com", password="pw", tag_ids=["music", "sports"]),
+        "other": User(id="other", name="O", email="o@example.com", password="pw", tag_ids=["sports"]),
+    }
+
+
+@pytest.fixture
+def posts():
+    now = datetime.now()
+    return {
+        # Lo mas reciente, pero ni el tag ni el autor tienen que ver con el viewer
+        "recent": Post(id="recent", user_id="other", tag_id="sports", description="", timestamp=now),
+        # Tag del viewer
+        "music": Post(id="music", user_id="other", tag_id="music", description="", timestamp=now - timedelta(hours=1)),
+        # Autor que comparte tags con el viewer
+        "by_fan": Post(id="by_fan", user_id="fan", tag_id="sports", description="", timestamp=now - timedelta(hours=1)),
+    }
+
+
+@pytest.fixture
+def ranker(users, posts):
+    tags = {tag_id: Tag(id=tag_id, name=tag_id, description="") for tag_id in ("music", "sports")}
+    user_repository = repository(UserRepository, users)
+    feed = PostFeed(repository(PostRepository, posts), user_repository, repository(TagRepository, tags))
+    return FeedRanker(feed, user_repository, RankingWeights(tag=1.0, author=0.5, recency=1.0, half_life_hours=48))
+
+
+def test_posts_are_ranked_by_tag_author_and_recency(ranker, users):
+    entries, has_more = ranker.rank(users["viewer"], limit=10)
+
+    assert [entry["id"] for entry in entries] == ["music", "by_fan", "recent"]
+    assert not has_more
+
+
+def test_ranking_is_cached_and_paged(ranker, users):
+    first, has_more = ranker.rank(users["viewer"], limit=2)
+    ranker.score = MagicMock(side_effect=AssertionError("should come from the cache"))
+    second, _ = ranker.rank(users["viewer"], limit=2, offset=2)
+
+    assert has_more
+    assert [entry["id"] for entry in first + second] == ["music", "by_fan", "recent"]
+
+
+def test_author_tag_changes_reorder_without_rebuilding(ranker, users):
+    ranker.rank(users["viewer"])
+    ranker.post_feed.post_repository.find_all.reset_mock()
+
+    users["fan"] = users["fan"].model_copy(update={"tag_ids": ["sports"]})
+    users["other"] = users["other"].model_copy(update={"tag_ids": ["sports", "music"]})
+    ranker.on_users_changed({"fan", "other"})
+    entries, _ = ranker.rank(users["viewer"], limit=10)
+
+    assert [entry["id"] for entry in entries] == ["music", "recent", "by_fan"]
+    ranker.post_feed.post_repository.find_all.assert_not_called()
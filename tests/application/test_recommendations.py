@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import MagicMock
+from app.application.recommendations import UserRecommender
+from app.domain.entities import User
+from app.repository.user_repository import UserRepository
+
+
+def user(user_id, tag_ids, career=None):
+    return User(id=user_id, name=user_id, email=f"{user_id}@example.com", password="pw", tag_ids=tag_ids, career=career)
+
+
+@pytest.fixture
+def users():
+    return {
+        "me": user("me", ["music", "sports", "games"], "Sistemas"),
+        "twin": user("twin", ["music", "sports", "games"]),
+        "close": user("close", ["music", "sports"]),
+        "classmate": user("classmate", ["art"], "sistemas"),
+        "stranger": user("stranger", ["art"]),
+    }
+
+
+@pytest.fixture
+def user_repository(users):
+    repository = MagicMock(spec=UserRepository)
+    repository.find_all.side_effect = lambda: list(users.values())
+    repository.find_by_ids.side_effect = lambda ids: {i: users[i] for i in ids if i in users}
+    repository.data_version.return_value = (1,)
+    return repository
+
+
+def test_recommends_similar_users_best_first(user_repository, users):
+    recommender = UserRecommender(user_repository, career_weight=0.25)
+
+    recommendations = recommender.recommend(users["me"])
+
+    assert [r.user_id for r in recommendations] == ["twin", "close", "classmate"]
+    assert recommendations[0].score == 1.0
+    assert recommendations[1].shared_tag_ids == ["music", "sports"]
+    # Misma carrera aunque no compartan tags
+    assert recommendations[2].score == 0.25
+
+
+def test_cosine_similarity(user_repository, users):
+    recommender = UserRecommender(user_repository, similarity="cosine", career_weight=0)
+
+    scores = {r.user_id: r.score for r in recommender.recommend(users["me"])}
+
+    assert scores == {"twin": 1.0, "close": pytest.approx(2 / (6 ** 0.5), abs=1e-4)}
+
+
+def test_profile_changes_update_the_matrix_incrementally(user_repository, users):
+    recommender = UserRecommender(user_repository)
+    recommender.recommend(users["me"])
+
+    users["stranger"] = users["stranger"].model_copy(update={"tag_ids": ["music", "sports", "games"]})
+    users["new"] = user("new", ["games"])
+    recommender.on_users_changed({"stranger", "new", "close"})
+    recommendations = recommender.recommend(users["me"])
+
+    assert {r.user_id for r in recommendations} >= {"stranger", "new"}
+    assert recommendations[0].score == recommendations[1].score == 1.0
+    user_repository.find_all.assert_called_once()
+
+
+def test_recommendations_are_cached_until_something_changes(user_repository, users):
+    recommender = UserRecommender(user_repository)
+    first = recommender.recommend(users["me"])
+    recommender.scores = MagicMock(side_effect=AssertionError("should come from the cache"))
+
+    assert recommender.recommend(users["me"], limit=1) == first[:1]
+
+    with pytest.raises(ValueError):
+        UserRecommender(user_repository, similarity="euclidean")
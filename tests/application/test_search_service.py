@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import MagicMock
+from app.application.SearchService import SearchService
+from app.domain.entities import Chat, Message
+from app.repository.search_index import SearchHit
+
+
+@pytest.fixture
+def mock_search_index():
+    return MagicMock()
+
+@pytest.fixture
+def mock_chat_repository():
+    return MagicMock()
+
+@pytest.fixture
+def mock_message_repository():
+    return MagicMock()
+
+@pytest.fixture
+def search_service(mock_search_index, mock_chat_repository, mock_message_repository):
+    return SearchService(mock_search_index, mock_chat_repository, mock_message_repository)
+
+
+def test_search_is_scoped_to_the_users_chats(search_service, mock_search_index, mock_chat_repository, mock_message_repository):
+    """
+    GIVEN a user with two chats
+    WHEN they search without a chat
+    THEN both of their chats are searched and the hits come with their message.
+    """
+    chats = [Chat(user_a="alice", user_b="bob"), Chat(user_a="carol", user_b="alice")]
+    message = Message(conversation_id=chats[0].id, sender_id="bob", content="Hola", delivered=True)
+    mock_chat_repository.find_all_by_user.return_value = chats
+    mock_search_index.search.return_value = ([SearchHit(message.id, chats[0].id, 1.5)], 1)
+    mock_message_repository.find_by_ids.return_value = {message.id: message}
+
+    page = search_service.search_messages("alice", "hola")
+
+    mock_search_index.search.assert_called_once_with("hola", [chats[0].id, chats[1].id], 20, 0)
+    assert page["total"] == 1
+    assert page["results"][0]["id"] == message.id
+    assert page["results"][0]["score"] == 1.5
+
+
+def test_search_in_a_foreign_chat_is_rejected(search_service, mock_search_index, mock_chat_repository):
+    """
+    GIVEN a chat the user is not part of
+    WHEN they search in it
+    THEN nothing is searched.
+    """
+    mock_chat_repository.find_by_id.return_value = Chat(user_a="bob", user_b="carol")
+
+    assert search_service.search_messages("alice", "hola", chat_id="other") is None
+    mock_search_index.search.assert_not_called()
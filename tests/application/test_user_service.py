@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import MagicMock
 from app.application.UserService import UserService
-from app.domain.entities import User
+from app.application.recommendations import Recommendation
+from app.domain.entities import Tag, User
 
 @pytest.fixture
 def mock_user_repository():
@@ -14,9 +15,14 @@ def mock_tag_repository():
     return MagicMock()
 
 @pytest.fixture
-def user_service(mock_user_repository, mock_tag_repository):
+def mock_user_recommender():
+    """Fixture to create a mock user recommender."""
+    return MagicMock()
+
+@pytest.fixture
+def user_service(mock_user_repository, mock_tag_repository, mock_user_recommender):
     """Fixture to create a UserService with a mock repository."""
-    return UserService(mock_user_repository, mock_tag_repository)
+    return UserService(mock_user_repository, mock_tag_repository, mock_user_recommender)
 
 def test_get_all_users(user_service, mock_user_repository):
     """
@@ -95,3 +101,41 @@ def test_set_user_status_user_not_found(user_service, mock_user_repository):
     # Assert
     mock_user_repository.find_by_id.assert_called_once_with(user_id)
     mock_user_repository.update.assert_not_called()
+
+
+def test_list_users_projects_the_list_fields(user_service, mock_user_repository):
+    """
+    GIVEN a UserService
+    WHEN list_users is called without fields
+    THEN it asks the repository for the list view fields and returns the next cursor,
+    and it rejects the password as a field.
+    """
+    mock_user_repository.find_page.return_value = ([{"id": "1", "name": "Ana"}, {"id": "2", "name": "Beto"}], True)
+
+    users, next_cursor = user_service.list_users(career="ISC", limit=2)
+
+    mock_user_repository.find_page.assert_called_once_with("ISC", (), None, None, 2, ["id", "name", "avatar_url", "career"])
+    assert next_cursor == "2"
+    with pytest.raises(ValueError):
+        user_service.list_users(fields=["name", "password"])
+
+def test_recommendations_skip_unknown_tags_and_see_new_ones(user_service, mock_user_repository, mock_tag_repository, mock_user_recommender):
+    """
+    GIVEN a recommendation sharing a tag that is not stored yet
+    WHEN recommendations are requested before and after the tags file changes
+    THEN the unknown tag is left out, and the new tag shows up once the file changed.
+    """
+    viewer = User(id="1", name="Ana", email="a@example.com", password="pw")
+    mock_user_repository.find_by_ids.return_value = {"2": User(id="2", name="Beto", email="b@example.com", password="pw")}
+    mock_user_recommender.recommend.return_value = [Recommendation("2", 0.5, ["t1", "t2"])]
+    mock_tag_repository.data_version.return_value = (1,)
+    mock_tag_repository.find_all.return_value = [Tag(id="t1", name="Musica", description="")]
+
+    assert user_service.get_recommendations(viewer)[0]["shared_tags"] == ["Musica"]
+
+    mock_tag_repository.data_version.return_value = (2,)
+    mock_tag_repository.find_all.return_value = [
+        Tag(id="t1", name="Musica", description=""), Tag(id="t2", name="Cine", description=""),
+    ]
+
+    assert user_service.get_recommendations(viewer)[0]["shared_tags"] == ["Musica", "Cine"]
@@ -26,4 +26,16 @@ def test_read_with_decryption():
     encripted = file_man.read_file(DbFile.TEST)
     message = enc_man.decrypt_data(encripted)
     assert message != ""
-    assert message == "Hola Mundo"
\ No newline at end of file
+    assert message == "Hola Mundo"
+
+def test_write_is_synced_before_replacing(monkeypatch):
+    import os
+    calls = []
+    real_fsync, real_replace = os.fsync, os.replace
+    monkeypatch.setattr(os, "fsync", lambda fd: (calls.append("fsync"), real_fsync(fd)))
+    monkeypatch.setattr(os, "replace", lambda src, dst: (calls.append("replace"), real_replace(src, dst)))
+
+    assert FileManager().write_file(DbFile.TEST, b"Hola soy un texto binario")
+
+    # El archivo temporal antes del rename, y el directorio despues
+    assert calls == ["fsync", "replace", "fsync"]
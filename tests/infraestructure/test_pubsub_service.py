@@ -0,0 +1,125 @@
+import socket
+import threading
+import pytest
+from app.infraestructure.pubsub_service import SUBSCRIBE, LocalBroker, UnixSocketManager
+
+
+@pytest.fixture
+def broker(tmp_path):
+    broker = LocalBroker(str(tmp_path / "broker.sock"))
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def _listen_in_background(manager: UnixSocketManager, received: list, expected: int) -> threading.Event:
+    done = threading.Event()
+
+    def run():
+        for message in manager._listen():
+            received.append(message)
+            if len(received) == expected:
+                done.set()
+                return
+
+    threading.Thread(target=run, daemon=True).start()
+    return done
+
+
+def _wait_for_subscribers(broker: LocalBroker, count: int) -> None:
+    for _ in range(200):
+        if len(broker._subscribers) >= count:
+            return
+        threading.Event().wait(0.01)
+
+
+def test_messages_reach_every_worker_on_the_channel(broker):
+    """Test that a message published by one worker is received by the workers on its channel only."""
+    url = f"unix://{broker.path}"
+    publisher = UnixSocketManager(url, channel="nexu")
+    listener = UnixSocketManager(url, channel="nexu")
+    other_channel = UnixSocketManager(url, channel="other")
+    received, ignored = [], []
+    done = _listen_in_background(listener, received, 2)
+    _listen_in_background(other_channel, ignored, 1)
+    _wait_for_subscribers(broker, 2)
+
+    publisher._publish({"method": "emit", "event": "new_message", "room": "bob"})
+    publisher._publish({"method": "close_room", "room": "bob"})
+
+    assert done.wait(5)
+    assert [message["method"] for message in received] == ["emit", "close_room"]
+    assert received[0]["room"] == "bob"
+    assert ignored == []
+
+
+def test_publish_reconnects_after_broker_restart(tmp_path):
+    """Test that a worker keeps publishing after the broker is restarted."""
+    path = str(tmp_path / "broker.sock")
+    broker = LocalBroker(path)
+    broker.start()
+    publisher = UnixSocketManager(f"unix://{path}")
+    publisher._publish({"method": "emit"})
+    broker.stop()
+
+    broker = LocalBroker(path)
+    broker.start()
+    listener = UnixSocketManager(f"unix://{path}")
+    received = []
+    done = _listen_in_background(listener, received, 1)
+    _wait_for_subscribers(broker, 1)
+    publisher._publish({"method": "emit", "event": "after_restart"})
+
+    assert done.wait(5)
+    assert received[0]["event"] == "after_restart"
+    broker.stop()
+
+
+def _stalled_subscriber(broker: LocalBroker) -> socket.socket:
+    """Subscribes a client that never reads what the broker sends."""
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(broker.path)
+    connection.sendall(SUBSCRIBE)
+    return connection
+
+
+def test_stalled_subscriber_does_not_block_the_others(broker):
+    """Test that more than a socket buffer of messages reaches a worker while another one never reads."""
+    url = f"unix://{broker.path}"
+    publisher = UnixSocketManager(url)
+    listener = UnixSocketManager(url)
+    stalled = _stalled_subscriber(broker)
+    total = 2000
+    received = []
+    done = _listen_in_background(listener, received, total)
+    _wait_for_subscribers(broker, 2)
+    payload = "x" * 1024
+    buffer_size = stalled.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    assert total * len(payload) > buffer_size
+
+    for number in range(total):
+        publisher._publish({"method": "emit", "number": number, "data": payload})
+
+    assert done.wait(10)
+    assert [message["number"] for message in received] == list(range(total))
+    stalled.close()
+
+
+def test_subscriber_with_too_many_pending_messages_is_dropped(tmp_path):
+    """Test that the broker disconnects a subscriber that falls too far behind."""
+    broker = LocalBroker(str(tmp_path / "broker.sock"), max_pending=10)
+    broker.start()
+    stalled = _stalled_subscriber(broker)
+    _wait_for_subscribers(broker, 1)
+    publisher = UnixSocketManager(f"unix://{broker.path}")
+
+    for number in range(1000):
+        publisher._publish({"method": "emit", "number": number, "data": "x" * 1024})
+    for _ in range(200):
+        if not broker._subscribers:
+            break
+        threading.Event().wait(0.01)
+
+    assert broker._subscribers == {}
+    stalled.close()
+    broker.stop()
@@ -0,0 +1,38 @@
+from app.infraestructure.snapshot_cache import SnapshotCache
+from app.infraestructure.file_service import FileManager
+from app.domain.entities import DbFile
+
+
+def test_get_returns_value_for_same_signature():
+    cache = SnapshotCache()
+    cache.put(DbFile.TEST, (1, 10, 100), {"items": []})
+    assert cache.get(DbFile.TEST, (1, 10, 100)) == {"items": []}
+    assert cache.stats()["hits"] == 1
+
+
+def test_get_misses_when_signature_changes():
+    cache = SnapshotCache()
+    cache.put(DbFile.TEST, (1, 10, 100), {"items": []})
+    assert cache.get(DbFile.TEST, (2, 10, 101)) is None
+    assert cache.get(DbFile.TEST, None) is None
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 0
+
+
+def test_invalidate_drops_entry():
+    cache = SnapshotCache()
+    cache.put(DbFile.TEST, (1, 10, 100), {"items": []})
+    cache.invalidate(DbFile.TEST)
+    assert cache.get(DbFile.TEST, (1, 10, 100)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_write_changes_file_signature():
+    manager = FileManager()
+    manager.write_file(DbFile.TEST, b"primero")
+    first = manager.stat_file(DbFile.TEST)
+    manager.write_file(DbFile.TEST, b"segundo")
+    second = manager.stat_file(DbFile.TEST)
+    assert first is not None and second is not None
+    assert first != second
@@ -0,0 +1,62 @@
+import time
+from app.middleware.auth_cache import AuthCache
+from app.domain.entities import User
+
+
+def _user(user_id: str) -> User:
+    return User(id=user_id, name="User", email=f"{user_id}@example.com", password="pw")
+
+
+def test_get_returns_cached_user_until_ttl():
+    cache = AuthCache(maxsize=10, ttl_seconds=0.05)
+    user = _user("1")
+    cache.put("token", user)
+    assert cache.get("token") is user
+    time.sleep(0.06)
+    assert cache.get("token") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0}
+
+
+def test_entry_does_not_outlive_token_expiry():
+    cache = AuthCache(maxsize=10, ttl_seconds=60)
+    cache.put("token", _user("1"), token_exp=time.time() - 1)
+    assert cache.get("token") is None
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = AuthCache(maxsize=2, ttl_seconds=60)
+    cache.put("a", _user("1"))
+    cache.put("b", _user("2"))
+    cache.get("a")
+    cache.put("c", _user("3"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_invalidate_users_drops_their_tokens_only():
+    cache = AuthCache(maxsize=10, ttl_seconds=60)
+    cache.put("a1", _user("1"))
+    cache.put("a2", _user("1"))
+    cache.put("b", _user("2"))
+    cache.invalidate_users({"1"})
+    assert cache.get("a1") is None and cache.get("a2") is None
+    assert cache.get("b") is not None
+
+
+def test_user_read_before_an_invalidation_is_not_cached():
+    cache = AuthCache(maxsize=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate_users({"1"})
+    cache.put("token", _user("1"), generation=generation)
+    assert cache.get("token") is None
+
+
+def test_entry_stored_under_another_data_version_is_a_miss():
+    cache = AuthCache(maxsize=10, ttl_seconds=60)
+    user = _user("1")
+    cache.put("token", user, data_version=(1,))
+    assert cache.get("token", (1,)) is user
+    # Otro worker escribio los usuarios
+    assert cache.get("token", (2,)) is None
+    assert cache.stats()["entries"] == 0
@@ -2,6 +2,7 @@ import pytest
 import json
 from unittest.mock import MagicMock
 from app.repository.chat_repository import ChatRepository
+from app.repository.write_behind import Durability
 from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
 from app.domain.entities import Chat, DbFile
@@ -188,3 +189,101 @@ def test_find_chat_by_users_not_found(chat_repository, mock_file_manager, mock_e
 
     not_found_chat = chat_repository.find_chat_by_users("non_existent_user_1", "non_existent_user_2")
     assert not_found_chat is None
+
+def test_batched_durability_coalesces_writes(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that in write-behind mode mutations are visible at once and written together on flush."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    mock_file_manager.write_file.return_value = True
+    chat_repository.set_durability(Durability.BATCHED, flush_interval_ms=0, max_pending=10)
+
+    first_chat = chat_repository.add(Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())))
+    second_chat = chat_repository.add(Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())))
+    chat_repository.delete(sample_chats_data["chats"][0]["id"])
+
+    mock_file_manager.write_file.assert_not_called()
+    assert chat_repository.find_by_id(second_chat.id) is not None
+
+    assert chat_repository.flush() is True
+
+    mock_file_manager.write_file.assert_called_once()
+    args, _ = mock_encryption_manager.encrypt_data.call_args
+    saved_ids = [chat["id"] for chat in json.loads(args[0])["chats"]]
+    assert saved_ids == [sample_chats_data["chats"][1]["id"], first_chat.id, second_chat.id]
+
+def test_batched_durability_flushes_after_max_pending(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that reaching max_pending queued mutations writes the file right away."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    mock_file_manager.write_file.return_value = True
+    chat_repository.set_durability(Durability.BATCHED, flush_interval_ms=0, max_pending=2)
+
+    chat_repository.add(Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())))
+    mock_file_manager.write_file.assert_not_called()
+    chat_repository.add(Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())))
+
+    mock_file_manager.write_file.assert_called_once()
+    chat_repository.set_durability(Durability.IMMEDIATE)
+    mock_file_manager.write_file.assert_called_once()
+
+def test_add_many_writes_file_once(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that adding several chats rewrites the file only once."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    new_chats = [Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())) for _ in range(3)]
+
+    chat_repository.add_many(new_chats)
+
+    mock_file_manager.write_file.assert_called_once()
+    args, _ = mock_encryption_manager.encrypt_data.call_args
+    assert len(json.loads(args[0])["chats"]) == 5
+
+def test_modify_chat(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that modify changes the stored chat in place and skips missing ones."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    chat_id = sample_chats_data["chats"][1]["id"]
+
+    chat = chat_repository.modify(chat_id, lambda stored: stored.unread_counts.update({"user": 3}))
+
+    assert chat.unread_counts == {"user": 3}
+    assert chat_repository.find_by_id(chat_id).unread_counts == {"user": 3}
+    assert chat_repository.modify("missing", lambda stored: None) is None
+    mock_file_manager.write_file.assert_called_once()
+
+
+def test_modify_many_chats(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that modify_many changes several chats with a single write and skips missing ones."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    chat_ids = [chat["id"] for chat in sample_chats_data["chats"]]
+
+    chats = chat_repository.modify_many(chat_ids + ["missing"], lambda stored: stored.unread_counts.update({"user": 1}))
+
+    assert [chat.id for chat in chats] == chat_ids
+    assert all(chat.unread_counts == {"user": 1} for chat in chat_repository.find_all())
+    mock_file_manager.write_file.assert_called_once()
+
+
+def test_modify_holds_the_file_lock(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that modify locks the chats file across processes, once even when mutations nest."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    chat_id = sample_chats_data["chats"][0]["id"]
+
+    with chat_repository._mutation():
+        chat_repository.modify(chat_id, lambda stored: stored.unread_counts.update({"user": 2}))
+
+    mock_file_manager.lock_file.assert_called_once_with(DbFile.CHATS)
+    mock_file_manager.write_file.assert_called_once()
+
+
+def test_failed_modify_many_leaves_cached_chats_untouched(chat_repository, mock_file_manager, mock_encryption_manager, sample_chats_data):
+    """Test that a change failing on a later chat does not leave earlier ones changed in the cache."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_chats_data)
+    chat_ids = [chat["id"] for chat in sample_chats_data["chats"]]
+
+    def change(stored):
+        if stored.id == chat_ids[1]:
+            raise RuntimeError("boom")
+        stored.unread_counts.update({"user": 7})
+
+    with pytest.raises(RuntimeError):
+        chat_repository.modify_many(chat_ids, change)
+
+    assert chat_repository.find_by_id(chat_ids[0]).unread_counts == sample_chats_data["chats"][0].get("unread_counts", {})
+    mock_file_manager.write_file.assert_not_called()
@@ -4,7 +4,8 @@ from unittest.mock import MagicMock
 from app.repository.message_repository import MessageRepository
 from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
-from app.domain.entities import Message
+from app.domain.entities import Message, ShardFile
+from app.repository.base_repository import Partition
 from datetime import datetime, timedelta
 import uuid
 
@@ -57,31 +58,54 @@ def sample_messages_data():
         ]
     }
 
-def setup_mocks(mock_file_manager, mock_encryption_manager, data):
-    """Helper to configure mocks for reading data."""
-    json_data = json.dumps(data, indent=4)
-    encrypted_data = b'encrypted_data_mock'
-    
-    mock_file_manager.read_file.return_value = encrypted_data
-    mock_encryption_manager.decrypt_data.return_value = json_data
+def setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, data, logs=None):
+    """
+    Helper to configure mocks for reading data. Each shard file is served with the
+    messages the repository routes to it, and each shard log with the given records.
+    """
+    shards = {}
+    for message in data["messages"]:
+        shard = message_repository._partition_for_item(message).db_file
+        shards.setdefault(shard, []).append(message)
+    tokens = {shard.name.encode(): json.dumps({"messages": messages}) for shard, messages in shards.items()}
+    log_lines = {}
+    for conversation_id, records in (logs or {}).items():
+        log_file = message_repository._partition_for_value(conversation_id).log_file
+        # Two conversations may land in the same shard and share its log
+        lines = log_lines.setdefault(log_file, [])
+        for record in records:
+            token = f"{log_file.name}-{len(lines)}".encode()
+            tokens[token] = json.dumps(record)
+            lines.append(token)
+    log_lines = {log_file: b"\n".join(lines) + b"\n" for log_file, lines in log_lines.items()}
+
+    def read_file(file):
+        if file in shards:
+            return file.name.encode()
+        return log_lines.get(file, b'')
+
+    mock_file_manager.read_file.side_effect = read_file
+    mock_file_manager.append_file.return_value = True
+    mock_encryption_manager.decrypt_data.side_effect = lambda token: tokens[token]
     mock_encryption_manager.encrypt_data.return_value = b'new_encrypted_data'
 
 # --- Repository Tests ---
 
 def test_find_all(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
     """Test finding all messages."""
-    setup_mocks(mock_file_manager, mock_encryption_manager, sample_messages_data)
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
     
     messages = message_repository.find_all()
     
     assert len(messages) == 3
     assert isinstance(messages[0], Message)
-    assert messages[0].id == sample_messages_data["messages"][0]["id"]
+    # Messages come shard by shard, so only the set of ids is guaranteed
+    assert {m.id for m in messages} == {m["id"] for m in sample_messages_data["messages"]}
 
 def test_find_by_id(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
     """Test finding a message by ID."""
     message_id_to_find = sample_messages_data["messages"][1]["id"]
-    setup_mocks(mock_file_manager, mock_encryption_manager, sample_messages_data)
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
     
     message = message_repository.find_by_id(message_id_to_find)
     
@@ -91,7 +115,7 @@ def test_find_by_id(message_repository, mock_file_manager, mock_encryption_manag
 
 def test_add_message(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
     """Test adding a new message."""
-    setup_mocks(mock_file_manager, mock_encryption_manager, sample_messages_data)
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
     
     new_message = Message(
         id=str(uuid.uuid4()),
@@ -103,19 +127,22 @@ def test_add_message(message_repository, mock_file_manager, mock_encryption_mana
     
     message_repository.add(new_message)
     
+    # Only the new record is encrypted and appended; the snapshot file is not rewritten
     mock_encryption_manager.encrypt_data.assert_called_once()
-    mock_file_manager.write_file.assert_called_once()
+    mock_file_manager.write_file.assert_not_called()
+    mock_file_manager.append_file.assert_called_once()
     
     args, _ = mock_encryption_manager.encrypt_data.call_args
-    encrypted_payload_dict = json.loads(args[0])
+    record = json.loads(args[0])
     
-    assert len(encrypted_payload_dict["messages"]) == 4
-    assert encrypted_payload_dict["messages"][-1]["id"] == new_message.id
+    assert record["op"] == "put"
+    assert record["item"]["id"] == new_message.id
+    assert len(message_repository.find_all()) == 4
 
 def test_find_by_conversation_id(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
     """Test finding messages by conversation ID."""
     conversation_id = sample_messages_data["messages"][0]["conversation_id"]
-    setup_mocks(mock_file_manager, mock_encryption_manager, sample_messages_data)
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
 
     messages = message_repository.find_by_conversation_id(conversation_id)
 
@@ -129,8 +156,167 @@ def test_find_by_conversation_id(message_repository, mock_file_manager, mock_enc
 
 def test_find_by_conversation_id_not_found(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
     """Test finding messages for a conversation that has none."""
-    setup_mocks(mock_file_manager, mock_encryption_manager, sample_messages_data)
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
 
     messages = message_repository.find_by_conversation_id(str(uuid.uuid4()))
 
     assert len(messages) == 0
+
+
+def test_log_is_replayed_on_load(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test that log records are applied on top of the snapshot file when loading."""
+    deleted = sample_messages_data["messages"][0]
+    updated = dict(sample_messages_data["messages"][1], content="Edited")
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data, logs={
+        deleted["conversation_id"]: [{"op": "delete", "id": deleted["id"]}],
+        updated["conversation_id"]: [{"op": "put", "item": updated}],
+    })
+
+    messages = message_repository.find_all()
+
+    assert len(messages) == 2
+    assert message_repository.find_by_id(deleted["id"]) is None
+    assert message_repository.find_by_id(updated["id"]).content == "Edited"
+
+def test_legacy_timestamps_sort_with_iso_ones(message_repository, mock_file_manager, mock_encryption_manager):
+    """Test that timestamps stored with default=str are read in ISO format, so they sort by time with the new ones."""
+    conversation_id = str(uuid.uuid4())
+    older = {"id": "older", "conversation_id": conversation_id, "sender_id": "s", "content": "1",
+             "timestamp": "2024-01-01T09:00:00", "delivered": True}
+    newer = {"id": "newer", "conversation_id": conversation_id, "sender_id": "s", "content": "2",
+             "timestamp": "2024-01-01 12:00:00.500000", "delivered": True}
+    logged = {"id": "logged", "conversation_id": conversation_id, "sender_id": "s", "content": "3",
+              "timestamp": "2024-01-01 13:00:00", "delivered": True}
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, {"messages": [newer, older]},
+                logs={conversation_id: [{"op": "batch", "records": [{"op": "put", "item": logged}]}]})
+
+    messages = message_repository.find_by_conversation_id(conversation_id)
+
+    assert [message.id for message in messages] == ["older", "newer", "logged"]
+    assert message_repository._load_snapshot(message_repository._partition_for_value(conversation_id)).get("newer")["timestamp"] == "2024-01-01T12:00:00.500000"
+
+def test_compact_rewrites_snapshot_and_truncates_log(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test that compaction folds the log into the snapshot file of the shard."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+    new_message = Message(conversation_id="c", sender_id="s", content="Hi", delivered=False)
+    message_repository.add(new_message)
+
+    assert message_repository.compact() is True
+
+    shard = message_repository._partition_for_value("c")
+    written = {call.args[0]: call.args[1] for call in mock_file_manager.write_file.call_args_list}
+    assert set(written) == {shard.db_file, shard.log_file}
+    assert written[shard.log_file] == b''
+    args, _ = mock_encryption_manager.encrypt_data.call_args
+    assert new_message.id in [m["id"] for m in json.loads(args[0])["messages"]]
+    assert message_repository.compact() is False
+
+def test_torn_line_followed_by_more_appends(tmp_path, message_repository, mock_file_manager, mock_encryption_manager):
+    """Test that a record torn by a crash mid-append does not hide the records appended after it."""
+    file_manager = FileManager()
+    log_file = ShardFile("MESSAGES_00_LOG", str(tmp_path / "00.log.enc"))
+    records = {b"first": {"op": "delete", "id": "1"}, b"third": {"op": "delete", "id": "3"}}
+    file_manager.append_file(log_file, b"first\n", new_line=True)
+    file_manager.append_file(log_file, b"seco")  # crash in the middle of the second record
+    file_manager.append_file(log_file, b"third\n", new_line=True)
+
+    def decrypt(token):
+        if token not in records:
+            raise ValueError("Invalid token")
+        return json.dumps(records[token])
+
+    mock_file_manager.read_file.side_effect = file_manager.read_file
+    mock_encryption_manager.decrypt_data.side_effect = decrypt
+
+    assert message_repository._read_log(Partition(None, log_file)) == list(records.values())
+
+def test_conversation_queries_only_read_its_shard(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test that reading a conversation only touches the shard that holds it."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+    conversation_id = sample_messages_data["messages"][0]["conversation_id"]
+    shard = message_repository._partition_for_value(conversation_id)
+
+    message_repository.find_by_conversation_id(conversation_id)
+    message_repository.count_unread_by_chat(conversation_id, "someone")
+
+    read_files = {call.args[0] for call in mock_file_manager.read_file.call_args_list}
+    assert read_files == {shard.db_file, shard.log_file}
+
+def test_update_many_writes_one_batch_record(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test that marking several messages as delivered costs a single append."""
+    conversation_id = sample_messages_data["messages"][0]["conversation_id"]
+    sample_messages_data["messages"][0]["delivered"] = False
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+
+    messages = message_repository.find_by_conversation_id(conversation_id)
+    for message in messages:
+        message.delivered = True
+    missing = Message(conversation_id=conversation_id, sender_id=str(uuid.uuid4()), content="?", delivered=True)
+
+    updated = message_repository.update_many(messages + [missing])
+
+    assert {m.id for m in updated} == {m.id for m in messages}
+    mock_encryption_manager.encrypt_data.assert_called_once()
+    mock_file_manager.append_file.assert_called_once()
+    record = json.loads(mock_encryption_manager.encrypt_data.call_args[0][0])
+    assert record["op"] == "batch"
+    assert len(record["records"]) == 2
+    assert message_repository.count_unread_by_chat(conversation_id, str(uuid.uuid4())) == 0
+
+def test_delete_many(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test deleting several messages across shards."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+    ids = [m["id"] for m in sample_messages_data["messages"][:2]]
+
+    deleted = message_repository.delete_many(ids + [str(uuid.uuid4())])
+
+    assert deleted == 2
+    assert [m.id for m in message_repository.find_all()] == [sample_messages_data["messages"][2]["id"]]
+
+def test_unread_count_and_last_message(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test the unread count and last message of a conversation, as used by the chat summaries job."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+    first, other, last = sample_messages_data["messages"]
+
+    assert message_repository.count_unread_by_chat(first["conversation_id"], str(uuid.uuid4())) == 1
+    assert message_repository.find_last_by_conversation_id(first["conversation_id"]).id == last["id"]
+    assert message_repository.find_last_by_conversation_id(str(uuid.uuid4())) is None
+    # Messages sent by the reader are never unread
+    assert message_repository.count_unread_by_chat(first["conversation_id"], last["sender_id"]) == 0
+
+
+def test_find_page_by_cursor(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test scrolling back and syncing forward through a conversation with cursors."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+    first, _, last = sample_messages_data["messages"]
+    conversation_id = first["conversation_id"]
+
+    newest = message_repository.find_page(conversation_id, limit=1)
+    assert [m.id for m in newest.messages] == [last["id"]]
+    assert newest.has_more
+
+    older = message_repository.find_page(conversation_id, before=newest.prev_cursor, limit=1)
+    assert [m.id for m in older.messages] == [first["id"]]
+    assert not older.has_more
+
+    synced = message_repository.find_page(conversation_id, since=older.next_cursor)
+    assert [m.id for m in synced.messages] == [last["id"]]
+
+    # A new message is found by the next sync without re-reading the history
+    new_message = Message(
+        id=str(uuid.uuid4()), conversation_id=conversation_id, sender_id=str(uuid.uuid4()),
+        content="Still there?", delivered=False,
+    )
+    message_repository.add(new_message)
+    newer = message_repository.find_page(conversation_id, since=synced.next_cursor)
+    assert [m.id for m in newer.messages] == [new_message.id]
+    # Nothing new keeps the cursor of the client
+    assert message_repository.find_page(conversation_id, since=newer.next_cursor).next_cursor == newer.next_cursor
+
+
+def test_find_page_rejects_invalid_cursor(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data):
+    """Test that a malformed cursor raises ValueError."""
+    setup_mocks(message_repository, mock_file_manager, mock_encryption_manager, sample_messages_data)
+
+    with pytest.raises(ValueError):
+        message_repository.find_page(sample_messages_data["messages"][0]["conversation_id"], since="not-a-cursor")
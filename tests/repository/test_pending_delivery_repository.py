@@ -0,0 +1,98 @@
+import pytest
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.repository.pending_delivery_repository import PendingDeliveryRepository
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.infraestructure.snapshot_cache import SnapshotCache
+from app.domain.entities import DbFile
+
+@pytest.fixture
+def mock_file_manager():
+    """Mock for FileManager."""
+    return MagicMock(spec=FileManager)
+
+@pytest.fixture
+def mock_encryption_manager():
+    """Mock for EncryptionManager."""
+    return MagicMock(spec=EncryptionManager)
+
+@pytest.fixture
+def pending_delivery_repository(mock_file_manager, mock_encryption_manager):
+    """Fixture for PendingDeliveryRepository with mocked dependencies and its own cache."""
+    repository = PendingDeliveryRepository(mock_file_manager, mock_encryption_manager)
+    repository.snapshot_cache = SnapshotCache()
+    return repository
+
+
+def setup_mocks(mock_file_manager, mock_encryption_manager, data):
+    """Helper to serve the given data and keep whatever is written or appended as the new file contents."""
+    files = {DbFile.PENDING_DELIVERIES: json.dumps(data), DbFile.PENDING_DELIVERIES_LOG: ""}
+
+    def write_file(file, encrypted):
+        files[file] = encrypted.decode()
+        return True
+
+    def append_file(file, encrypted, new_line=False):
+        files[file] += encrypted.decode()
+        return True
+
+    mock_file_manager.read_file.side_effect = lambda file: files[file].encode()
+    mock_file_manager.stat_file.return_value = None
+    mock_file_manager.write_file.side_effect = write_file
+    mock_file_manager.append_file.side_effect = append_file
+    mock_encryption_manager.decrypt_data.side_effect = lambda token: token.decode()
+    mock_encryption_manager.encrypt_data.side_effect = lambda data: data.encode()
+    return files
+
+
+def test_enqueue_appends_to_the_log_and_drops_oldest(pending_delivery_repository, mock_file_manager, mock_encryption_manager):
+    """Test that enqueue appends the user's queue to the log and keeps the max_messages newest, whatever their chat."""
+    files = setup_mocks(mock_file_manager, mock_encryption_manager, {"pending_deliveries": []})
+
+    pending_delivery_repository.enqueue("bob", "chat-1", "m1", datetime(2024, 1, 1, 10), max_messages=2)
+    pending_delivery_repository.enqueue("bob", "chat-2", "m2", datetime(2024, 1, 1, 11), max_messages=2)
+    # Llega tarde desde otro worker, pero es mas nuevo que m1
+    queue = pending_delivery_repository.enqueue("bob", "chat-1", "m3", datetime(2024, 1, 1, 10, 30), max_messages=2)
+
+    assert queue.id == "bob"
+    assert [message_id for _, _, message_id in queue.messages] == ["m3", "m2"]
+    assert pending_delivery_repository.find_by_id("bob").messages == queue.messages
+    mock_file_manager.write_file.assert_not_called()
+    assert len(files[DbFile.PENDING_DELIVERIES_LOG].splitlines()) == 3
+
+
+def test_acknowledge_removes_only_sent_messages(pending_delivery_repository, mock_file_manager, mock_encryption_manager):
+    """Test that peek leaves the queue as it is, and acknowledge removes only the sent messages."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {
+        "pending_deliveries": [{"id": "bob", "messages": [
+            ["2024-01-01T10:00:00", "chat-1", "m1"],
+            ["2024-01-01T11:00:00", "chat-2", "m2"],
+        ]}]
+    })
+
+    queued = pending_delivery_repository.peek("bob")
+    pending_delivery_repository.enqueue("bob", "chat-1", "m3", datetime(2024, 1, 1, 12))
+
+    assert queued == ["m1", "m2"]
+    assert pending_delivery_repository.acknowledge("bob", queued) == 2
+    assert pending_delivery_repository.peek("bob") == ["m3"]
+    assert pending_delivery_repository.peek("nobody") == []
+    appends = mock_file_manager.append_file.call_count
+    assert pending_delivery_repository.acknowledge("bob", queued) == 0
+    assert mock_file_manager.append_file.call_count == appends
+
+
+def test_failed_enqueue_leaves_cached_queue_untouched(pending_delivery_repository, mock_file_manager, mock_encryption_manager):
+    """Test that the lists of a loaded queue are copies, so a failed write does not change the cache."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {
+        "pending_deliveries": [{"id": "bob", "messages": [["2024-01-01T10:00:00", "chat-1", "m1"]]}]
+    })
+    cached = pending_delivery_repository._load_snapshot().get("bob")
+    mock_file_manager.append_file.side_effect = lambda file, encrypted, new_line=False: False
+
+    pending_delivery_repository.enqueue("bob", "chat-1", "m2", datetime(2024, 1, 1, 11), max_messages=1)
+
+    assert cached["messages"] == [["2024-01-01T10:00:00", "chat-1", "m1"]]
+    assert pending_delivery_repository.find_by_id("bob").messages == [["2024-01-01T10:00:00", "chat-1", "m1"]]
@@ -0,0 +1,114 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.domain.entities import Post, Tag, User
+from app.repository.post_feed import PostFeed
+from app.repository.post_repository import PostRepository
+from app.repository.tag_repository import TagRepository
+from app.repository.user_repository import UserRepository
+
+
+@pytest.fixture
+def store():
+    users = {"u1": User(id="u1", name="Ana", email="ana@example.com", password="pw")}
+    tags = {"t1": Tag(id="t1", name="Deportes", description=""), "t2": Tag(id="t2", name="Musica", description="")}
+    posts = {
+        "p1": Post(id="p1", user_id="u1", tag_id="t1", description="viejo", timestamp=datetime(2024, 1, 1)),
+        "p2": Post(id="p2", user_id="u1", tag_id="t2", description="nuevo", timestamp=datetime(2024, 1, 2)),
+        # Sin autor: no aparece en el feed
+        "p3": Post(id="p3", user_id="ghost", tag_id="t1", description="huerfano", timestamp=datetime(2024, 1, 3)),
+    }
+    return {"users": users, "tags": tags, "posts": posts}
+
+
+def repository(spec, entities, version):
+    repo = MagicMock(spec=spec)
+    repo.find_all.side_effect = lambda: list(entities.values())
+    repo.find_by_ids.side_effect = lambda ids: {i: entities[i] for i in ids if i in entities}
+    repo.data_version.side_effect = lambda: version["value"]
+    return repo
+
+
+@pytest.fixture
+def versions():
+    return {"value": (1,)}
+
+
+@pytest.fixture
+def feed(store, versions):
+    return PostFeed(
+        repository(PostRepository, store["posts"], versions),
+        repository(UserRepository, store["users"], versions),
+        repository(TagRepository, store["tags"], versions),
+    )
+
+
+def test_feed_is_joined_and_sorted_newest_first(feed):
+    entries = feed.entries()
+
+    assert [entry["id"] for entry in entries] == ["p2", "p1"]
+    assert entries[0]["user"] == {"id": "u1", "name": "Ana", "career": None, "avatar_url": None}
+    assert entries[0]["tag"] == {"id": "t2", "name": "Musica"}
+    assert [entry["id"] for entry in feed.entries("t1")] == ["p1"]
+
+
+def test_post_changes_are_applied_without_rebuilding(feed, store):
+    feed.entries()
+    feed.post_repository.find_all.reset_mock()
+
+    store["posts"]["p4"] = Post(id="p4", user_id="u1", tag_id="t1", description="otro", timestamp=datetime(2024, 1, 4))
+    del store["posts"]["p1"]
+    feed.on_posts_changed({"p4", "p1"})
+
+    assert [entry["id"] for entry in feed.entries()] == ["p4", "p2"]
+    assert [entry["id"] for entry in feed.entries("t1")] == ["p4"]
+    feed.post_repository.find_all.assert_not_called()
+
+
+def test_profile_changes_update_embedded_user(feed, store):
+    before = feed.entries()
+
+    store["users"]["u1"] = store["users"]["u1"].model_copy(update={"name": "Ana María"})
+    feed.on_users_changed({"u1", "someone-else"})
+    after = feed.entries()
+
+    assert {entry["user"]["name"] for entry in after} == {"Ana María"}
+    # Las listas ya entregadas no cambian
+    assert before[0]["user"]["name"] == "Ana"
+    feed.user_repository.find_by_ids.assert_called_once_with(["u1"])
+
+
+def test_feed_is_rebuilt_when_another_process_changed_the_data(feed, store, versions):
+    feed.entries()
+    store["posts"]["p5"] = Post(id="p5", user_id="u1", tag_id="t2", description="de otro worker", timestamp=datetime(2024, 1, 5))
+
+    versions["value"] = (2,)
+
+    assert feed.entries()[0]["id"] == "p5"
+    assert feed.post_repository.find_all.call_count == 2
+
+
+def test_keyset_pages_follow_the_cursor(feed, store):
+    for day in range(4, 9):
+        store["posts"][f"p{day}"] = Post(id=f"p{day}", user_id="u1", tag_id="t1", description="", timestamp=datetime(2024, 1, day))
+
+    first = feed.page(limit=3)
+    second = feed.page(before=first.next_cursor, limit=3)
+    last = feed.page(before=second.next_cursor, limit=3)
+
+    assert [entry["id"] for entry in first.entries] == ["p8", "p7", "p6"]
+    assert [entry["id"] for entry in second.entries] == ["p5", "p4", "p2"]
+    assert [entry["id"] for entry in last.entries] == ["p1"]
+    assert not last.has_more and last.next_cursor is None
+
+
+def test_keyset_pages_of_a_tag_use_its_posting_list(feed, store):
+    store["posts"]["p4"] = Post(id="p4", user_id="u1", tag_id="t1", description="", timestamp=datetime(2024, 1, 4))
+
+    page = feed.page("t1", limit=1)
+    assert [entry["id"] for entry in page.entries] == ["p4"]
+    assert [entry["id"] for entry in feed.page("t1", before=page.next_cursor, limit=1).entries] == ["p1"]
+    assert feed.page("missing-tag", limit=5).entries == []
+
+    with pytest.raises(ValueError):
+        feed.page(before="not-a-cursor")
@@ -0,0 +1,81 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.repository.presence_repository import PresenceRepository
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.infraestructure.snapshot_cache import SnapshotCache
+
+@pytest.fixture
+def mock_file_manager():
+    """Mock for FileManager."""
+    return MagicMock(spec=FileManager)
+
+@pytest.fixture
+def mock_encryption_manager():
+    """Mock for EncryptionManager."""
+    return MagicMock(spec=EncryptionManager)
+
+@pytest.fixture
+def presence_repository(mock_file_manager, mock_encryption_manager):
+    """Fixture for PresenceRepository with mocked dependencies and its own cache."""
+    repository = PresenceRepository(mock_file_manager, mock_encryption_manager)
+    repository.snapshot_cache = SnapshotCache()
+    return repository
+
+
+def setup_mocks(mock_file_manager, mock_encryption_manager, data):
+    """Helper to serve the given data and keep whatever is written as the new file contents."""
+    files = {"contents": json.dumps(data)}
+
+    def write_file(file, encrypted):
+        files["contents"] = encrypted.decode()
+        return True
+
+    mock_file_manager.read_file.side_effect = lambda file: files["contents"].encode()
+    mock_file_manager.stat_file.return_value = None
+    mock_file_manager.write_file.side_effect = write_file
+    mock_encryption_manager.decrypt_data.side_effect = lambda token: token.decode()
+    mock_encryption_manager.encrypt_data.side_effect = lambda data: data.encode()
+
+
+def test_publish_replaces_the_users_of_a_worker(presence_repository, mock_file_manager, mock_encryption_manager):
+    """Test that publishing a worker's users replaces the previous ones and is found by user."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {"workers": []})
+    since = datetime.now() - timedelta(seconds=30)
+
+    presence_repository.publish("worker-a", ["alice", "bob"])
+    presence_repository.publish("worker-b", ["alice"])
+    presence_repository.publish("worker-a", ["bob"])
+
+    assert [worker.id for worker in presence_repository.find_workers_of("alice", since)] == ["worker-b"]
+    assert [worker.id for worker in presence_repository.find_workers_of("bob", since)] == ["worker-a"]
+    assert presence_repository.find_stale(since) == []
+
+
+def test_stale_workers_are_ignored(presence_repository, mock_file_manager, mock_encryption_manager):
+    """Test that the users of a worker that stopped publishing are not online."""
+    old = (datetime.now() - timedelta(minutes=5)).isoformat()
+    setup_mocks(mock_file_manager, mock_encryption_manager, {
+        "workers": [{"id": "dead", "user_ids": ["alice"], "updated_at": old}],
+    })
+    since = datetime.now() - timedelta(seconds=30)
+
+    assert presence_repository.find_workers_of("alice", since) == []
+    assert [worker.id for worker in presence_repository.find_stale(since)] == ["dead"]
+
+
+def test_heartbeat_keeps_a_worker_alive(presence_repository, mock_file_manager, mock_encryption_manager):
+    """Test that a worker whose users were published long ago is alive while it touches its heartbeat."""
+    old = (datetime.now() - timedelta(minutes=5)).isoformat()
+    setup_mocks(mock_file_manager, mock_encryption_manager, {
+        "workers": [{"id": "idle", "user_ids": ["alice"], "updated_at": old}],
+    })
+    mock_file_manager.stat_file.side_effect = lambda file: (
+        (int(datetime.now().timestamp() * 1e9), 0, 0) if file.value.endswith("idle.alive") else None
+    )
+    since = datetime.now() - timedelta(seconds=30)
+
+    assert [worker.id for worker in presence_repository.find_workers_of("alice", since)] == ["idle"]
+    assert presence_repository.find_stale(since) == []
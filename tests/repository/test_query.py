@@ -0,0 +1,47 @@
+import pytest
+from app.repository.query import compile_query
+
+ITEMS = [
+    {"id": "1", "conversation_id": "a", "sender_id": "u1", "delivered": False},
+    {"id": "2", "conversation_id": "a", "sender_id": "u2", "delivered": False},
+    {"id": "3", "conversation_id": "b", "sender_id": "u2", "delivered": True},
+]
+
+
+def test_compile_query_is_cached():
+    """The same shape must return the same compiled plan."""
+    assert compile_query('conversation_id == ?') is compile_query('conversation_id == ?')
+
+
+def test_filter_with_bound_parameters():
+    query = compile_query('conversation_id == ? & sender_id != ? & delivered == ?')
+    matches = query.filter(ITEMS, "a", "u1", False)
+    assert [item["id"] for item in matches] == ["2"]
+    assert query.count(ITEMS, "a", "u1", False) == 1
+
+
+def test_parameters_are_not_interpolated():
+    """A value with quotes or operators is compared literally."""
+    query = compile_query('sender_id == ?')
+    assert query.filter(ITEMS, '" | @.id != "') == []
+
+
+def test_ordering_against_missing_attribute_does_not_match():
+    query = compile_query('timestamp >= ?')
+    assert query.first(ITEMS, "2025-01-01") is None
+
+
+def test_invalid_shape_raises():
+    with pytest.raises(ValueError):
+        compile_query('conversation_id = "a"')
+
+
+def test_wrong_parameter_count_raises():
+    with pytest.raises(ValueError):
+        compile_query('id == ?').filter(ITEMS)
+
+def test_has_matches_list_elements():
+    """Test that 'has' checks membership in list attributes and never matches scalars."""
+    items = [{"id": "1", "tag_ids": ["a", "b"]}, {"id": "2", "tag_ids": ["b"]}, {"id": "3", "tag_ids": "a"}]
+
+    assert [item["id"] for item in compile_query('tag_ids has ?').filter(items, "a")] == ["1"]
@@ -0,0 +1,161 @@
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.domain.entities import DbFile, Message
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.repository.message_repository import MessageRepository
+from app.repository.search_index import MessageSearchIndex
+from app.utils.text import tokenize
+
+
+@pytest.fixture
+def files():
+    """Contents of the index file and its log, shared by every index of a test like by the workers."""
+    return {DbFile.MESSAGE_SEARCH_INDEX: b'', DbFile.MESSAGE_SEARCH_INDEX_LOG: b''}
+
+
+@pytest.fixture
+def mock_file_manager(files):
+    file_manager = MagicMock(spec=FileManager)
+
+    def write_file(file, data):
+        files[file] = data
+        return True
+
+    def append_file(file, data, new_line=False):
+        files[file] += data
+        return True
+
+    file_manager.read_file.side_effect = lambda file: files[file]
+    file_manager.write_file.side_effect = write_file
+    file_manager.append_file.side_effect = append_file
+    return file_manager
+
+
+@pytest.fixture
+def mock_encryption_manager():
+    encryption_manager = MagicMock(spec=EncryptionManager)
+    encryption_manager.encrypt_data.side_effect = lambda data: data.encode()
+    encryption_manager.decrypt_data.side_effect = lambda token: token.decode()
+    return encryption_manager
+
+
+@pytest.fixture
+def messages():
+    return [
+        Message(id="m1", conversation_id="c1", sender_id="a", content="¿Vamos a la canción de mañana?",
+                delivered=True, timestamp=datetime(2024, 1, 1, 10)),
+        Message(id="m2", conversation_id="c1", sender_id="b", content="La cancion, la cancion otra vez",
+                delivered=True, timestamp=datetime(2024, 1, 1, 11)),
+        Message(id="m3", conversation_id="c2", sender_id="a", content="Canción nueva en el otro chat",
+                delivered=True, timestamp=datetime(2024, 1, 1, 12)),
+    ]
+
+
+@pytest.fixture
+def message_repository(messages):
+    repository = MagicMock(spec=MessageRepository)
+
+    def by_conversation(conversation_id):
+        return [m for m in messages if m.conversation_id == conversation_id]
+
+    repository.find_by_conversation_id.side_effect = by_conversation
+    repository.count.side_effect = lambda shape, conversation_id: len(by_conversation(conversation_id))
+    repository.find_by_ids.side_effect = lambda ids: {m.id: m for m in messages if m.id in ids}
+    return repository
+
+
+@pytest.fixture
+def search_index(mock_file_manager, mock_encryption_manager, message_repository):
+    return MessageSearchIndex(mock_file_manager, mock_encryption_manager, message_repository)
+
+
+def test_tokenize_ignores_case_and_accents():
+    assert tokenize("¡Canción del AÑO, qué día!") == ["cancion", "del", "ano", "que", "dia"]
+
+
+def test_search_is_accent_insensitive_and_scoped(search_index):
+    hits, total = search_index.search("CANCIÓN", ["c1"])
+
+    assert total == 2
+    # m2 repite la palabra, asi que va primero
+    assert [hit.message_id for hit in hits] == ["m2", "m1"]
+    assert all(hit.conversation_id == "c1" for hit in hits)
+
+
+def test_search_requires_every_word_and_paginates(search_index):
+    hits, total = search_index.search("cancion manana", ["c1", "c2"])
+    assert [hit.message_id for hit in hits] == ["m1"]
+
+    hits, total = search_index.search("cancion", ["c1", "c2"], limit=1, offset=1)
+    assert total == 3
+    assert len(hits) == 1
+
+
+def test_new_messages_are_indexed_from_change_notifications(search_index, messages, message_repository):
+    search_index.search("cancion", ["c1"])
+    message_repository.count.side_effect = None
+    message_repository.count.return_value = 3
+    new_message = Message(id="m4", conversation_id="c1", sender_id="a", content="Otra canción", delivered=False)
+    messages.append(new_message)
+    message_repository.find_by_conversation_id.reset_mock()
+
+    search_index.on_messages_changed({"m4", "m1"})
+    hits, total = search_index.search("cancion", ["c1"])
+
+    assert total == 3
+    # Solo se leyo el mensaje nuevo, no la conversacion entera
+    message_repository.find_by_ids.assert_called_once_with(["m4"])
+    message_repository.find_by_conversation_id.assert_not_called()
+
+
+def test_index_is_saved_encrypted_and_reloaded(search_index, files, mock_file_manager, mock_encryption_manager, message_repository):
+    search_index.search("cancion", ["c1", "c2"])
+    search_index.save()
+
+    mock_encryption_manager.encrypt_data.assert_called_once()
+    mock_file_manager.write_file.assert_not_called()
+    record = json.loads(files[DbFile.MESSAGE_SEARCH_INDEX_LOG])
+    assert set(record["documents"]) == {"m1", "m2", "m3"}
+
+    reloaded = MessageSearchIndex(mock_file_manager, mock_encryption_manager, message_repository)
+    message_repository.find_by_conversation_id.reset_mock()
+    hits, total = reloaded.search("otro chat", ["c2"])
+    assert [hit.message_id for hit in hits] == ["m3"]
+    message_repository.find_by_conversation_id.assert_not_called()
+
+
+def test_save_appends_only_the_changes(search_index, files, message_repository):
+    search_index.search("cancion", ["c1"])
+    search_index.save()
+    search_index.search("cancion", ["c2"])
+    search_index.remove_messages(["m1"])
+    search_index.save()
+    search_index.save()
+
+    first, second = [json.loads(line) for line in files[DbFile.MESSAGE_SEARCH_INDEX_LOG].splitlines()]
+    assert set(first["documents"]) == {"m1", "m2"}
+    assert set(second["documents"]) == {"m3"} and second["removed"] == ["m1"]
+
+
+def test_workers_add_to_the_same_index_and_compact_it(files, mock_file_manager, mock_encryption_manager, message_repository):
+    worker_a = MessageSearchIndex(mock_file_manager, mock_encryption_manager, message_repository, compact_every=2)
+    worker_b = MessageSearchIndex(mock_file_manager, mock_encryption_manager, message_repository, compact_every=2)
+    worker_a.load()
+    worker_b.load()
+
+    worker_a.search("cancion", ["c1"])
+    worker_a.save()
+    worker_b.search("cancion", ["c2"])
+    worker_b.save()
+    assert len(files[DbFile.MESSAGE_SEARCH_INDEX_LOG].splitlines()) == 2
+
+    worker_a.remove_messages(["m2"])
+    worker_a.save()
+
+    # El segundo registro de worker_a compacta el log, con lo que agrego worker_b
+    assert files[DbFile.MESSAGE_SEARCH_INDEX_LOG] == b''
+    assert set(json.loads(files[DbFile.MESSAGE_SEARCH_INDEX])["documents"]) == {"m1", "m3"}
+    mock_file_manager.lock_file.assert_called_with(DbFile.MESSAGE_SEARCH_INDEX_LOG)
@@ -0,0 +1,85 @@
+from app.repository.snapshot import Snapshot
+
+
+def build_snapshot():
+    data = {
+        "users": [
+            {"id": "1", "email": "a@example.com", "tag_ids": ["t1", "t2"]},
+            {"id": "2", "email": "b@example.com", "tag_ids": ["t2"]},
+        ]
+    }
+    return Snapshot(data, "users", ("id", "email", "tag_ids"))
+
+
+def test_indexes_are_built_on_load():
+    snapshot = build_snapshot()
+    assert snapshot.get("2")["email"] == "b@example.com"
+    assert snapshot.lookup("email", "a@example.com")[0]["id"] == "1"
+    assert {item["id"] for item in snapshot.lookup("tag_ids", "t2")} == {"1", "2"}
+
+
+def test_append_updates_indexes():
+    snapshot = build_snapshot()
+    snapshot.append({"id": "3", "email": "c@example.com", "tag_ids": []})
+    assert snapshot.get("3") is not None
+    assert len(snapshot.items) == 3
+
+
+def test_replace_moves_item_between_buckets():
+    snapshot = build_snapshot()
+    old = snapshot.get("1")
+    assert snapshot.replace(old, {"id": "1", "email": "new@example.com", "tag_ids": ["t3"]})
+    assert snapshot.lookup("email", "a@example.com") == []
+    assert snapshot.lookup("email", "new@example.com")[0]["id"] == "1"
+    assert [item["id"] for item in snapshot.lookup("tag_ids", "t2")] == ["2"]
+    assert snapshot.items[0]["email"] == "new@example.com"
+
+
+def test_remove_drops_item_from_indexes():
+    snapshot = build_snapshot()
+    assert snapshot.remove(snapshot.get("2"))
+    assert snapshot.get("2") is None
+    assert snapshot.lookup("tag_ids", "t2")[0]["id"] == "1"
+    assert not snapshot.remove({"id": "2"})
+
+
+def test_lazy_index_on_unindexed_attribute():
+    snapshot = build_snapshot()
+    assert not snapshot.has_index("name")
+    snapshot.ensure_index("name")
+    assert snapshot.lookup("name", None) == snapshot.items
+
+
+def test_ordered_index_follows_writes():
+    data = {
+        "messages": [
+            {"id": "b", "conversation_id": "c1", "timestamp": "2024-01-01T10:00:00"},
+            {"id": "a", "conversation_id": "c1", "timestamp": "2024-01-01T09:00:00"},
+            {"id": "x", "conversation_id": "c2", "timestamp": "2024-01-01T08:00:00"},
+        ]
+    }
+    snapshot = Snapshot(data, "messages", ("id", "conversation_id"))
+
+    def order():
+        return [entry[1] for entry in snapshot.ordered("conversation_id", "c1", "timestamp")]
+
+    assert order() == ["a", "b"]
+
+    snapshot.append({"id": "c", "conversation_id": "c1", "timestamp": "2024-01-01T09:30:00"})
+    assert order() == ["a", "c", "b"]
+    snapshot.replace(snapshot.get("a"), {"id": "a", "conversation_id": "c1", "timestamp": "2024-01-01T11:00:00"})
+    assert order() == ["c", "b", "a"]
+    snapshot.remove(snapshot.get("b"))
+    assert order() == ["c", "a"]
+
+
+def test_writes_do_not_modify_lists_already_read():
+    snapshot = build_snapshot()
+    before = snapshot.items
+    snapshot.replace(snapshot.get("1"), {"id": "1", "email": "new@example.com", "tag_ids": []})
+    snapshot.remove(snapshot.get("2"))
+    snapshot.append({"id": "3", "email": "c@example.com", "tag_ids": []})
+
+    assert [item["email"] for item in before] == ["a@example.com", "b@example.com"]
+    assert [item["id"] for item in snapshot.items] == ["1", "3"]
+    assert snapshot.data["users"] is snapshot.items
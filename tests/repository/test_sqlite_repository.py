@@ -0,0 +1,177 @@
+import pytest
+from unittest.mock import MagicMock
+from app.repository.chat_repository import ChatRepository
+from app.repository.message_repository import MessageRepository
+from app.repository.user_repository import UserRepository
+from app.repository.sqlite_repository import SqliteRepository, sqlite_variant
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.infraestructure.sqlite_service import SqliteDatabase
+from app.domain.entities import Message, User
+import threading
+import uuid
+
+@pytest.fixture
+def mock_file_manager():
+    """Mock for FileManager."""
+    return MagicMock(spec=FileManager)
+
+@pytest.fixture
+def mock_encryption_manager():
+    """Mock for EncryptionManager that marks data as encrypted with a prefix."""
+    encryption_manager = MagicMock(spec=EncryptionManager)
+    encryption_manager.encrypt_data.side_effect = lambda data: b"enc:" + data.encode()
+    encryption_manager.decrypt_data.side_effect = lambda token: token.removeprefix(b"enc:").decode()
+    encryption_manager.fingerprint.side_effect = lambda data: f"fp:{data}"
+    return encryption_manager
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh SQLite database per test."""
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    monkeypatch.setattr("app.repository.sqlite_repository.sqlite_database", database)
+    yield database
+    database.close()
+
+@pytest.fixture
+def message_repository(database, mock_file_manager, mock_encryption_manager):
+    return sqlite_variant(MessageRepository)(mock_file_manager, mock_encryption_manager)
+
+def make_message(conversation_id, sender_id="sender", delivered=False):
+    return Message(conversation_id=conversation_id, sender_id=sender_id, content="Hola", delivered=delivered)
+
+def test_backend_is_selected_by_configuration(database, mock_file_manager, mock_encryption_manager, monkeypatch):
+    """Test that concrete repositories become their SQLite variant when configured."""
+    monkeypatch.setattr("app.config.settings.Config.STORAGE_BACKEND", "sqlite")
+
+    repository = ChatRepository(mock_file_manager, mock_encryption_manager)
+
+    assert isinstance(repository, ChatRepository)
+    assert isinstance(repository, SqliteRepository)
+
+def test_rows_are_encrypted_at_rest(database, message_repository):
+    """Test that the stored blob is the encrypted item, not plain JSON."""
+    message = message_repository.add(make_message("conversation-1"))
+
+    stored = database.query('SELECT data FROM "messages" WHERE id = ?', (message.id,))[0][0]
+
+    assert stored.startswith(b"enc:")
+
+def test_queries_match_the_json_backend(message_repository):
+    """Test that repository-specific queries work unchanged on SQLite."""
+    message_repository.add_many([
+        make_message("conversation-1", sender_id="a"),
+        make_message("conversation-1", sender_id="b"),
+        make_message("conversation-1", sender_id="b", delivered=True),
+        make_message("conversation-2", sender_id="b"),
+    ])
+
+    assert len(message_repository.find_by_conversation_id("conversation-1")) == 3
+    assert message_repository.count_unread_by_chat("conversation-1", "a") == 1
+    assert message_repository.find_last_by_conversation_id("missing") is None
+
+def test_update_and_delete(message_repository):
+    """Test that updates keep the row order and missing entities are skipped."""
+    first = message_repository.add(make_message("conversation-1"))
+    second = message_repository.add(make_message("conversation-1"))
+
+    first.delivered = True
+    assert message_repository.update(first) is not None
+    assert message_repository.update(make_message("conversation-1")) is None
+    assert [m.id for m in message_repository.find_all()] == [first.id, second.id]
+    assert message_repository.find_by_id(first.id).delivered is True
+
+    assert message_repository.delete_many([second.id, str(uuid.uuid4())]) == 1
+    assert message_repository.delete(second.id) is False
+    assert [m.id for m in message_repository.find_all()] == [first.id]
+
+def test_sensitive_indexes_store_fingerprints(database, mock_file_manager, mock_encryption_manager):
+    """Test that emails are searchable without being stored in clear."""
+    user_repository = sqlite_variant(UserRepository)(mock_file_manager, mock_encryption_manager)
+    user = user_repository.add(User(name="Ana", email="ana@example.com", password="secret"))
+
+    values = [row[0] for row in database.query('SELECT value FROM "users_index" WHERE attribute = \'email\'')]
+
+    assert values == ["fp:ana@example.com"]
+    assert user_repository.find_by_email("ana@example.com").id == user.id
+
+def test_has_conditions_use_the_index_table(database, mock_file_manager, mock_encryption_manager):
+    """Test that list attributes are filtered by element and paged by id."""
+    user_repository = sqlite_variant(UserRepository)(mock_file_manager, mock_encryption_manager)
+    user_repository.add_many([
+        User(id="u1", name="Ana", email="ana@example.com", password="secret", career="ISC", tag_ids=["a", "b"]),
+        User(id="u2", name="Beto", email="beto@example.com", password="secret", career="ISC", tag_ids=["b"]),
+        User(id="u3", name="Caro", email="caro@example.com", password="secret", career="IME", tag_ids=["a", "b"]),
+    ])
+
+    users, has_more = user_repository.find_page(tag_ids=["a", "b"], limit=1, fields=["id", "name"])
+
+    assert users == [{"id": "u1", "name": "Ana"}]
+    assert has_more
+    assert user_repository.find_page(career="ISC", tag_ids=["b"], after="u1")[0][0].id == "u2"
+
+def test_new_indexes_are_backfilled(database, mock_file_manager, mock_encryption_manager, monkeypatch):
+    """Test that attributes indexed after the table was created are indexed for the existing rows."""
+    monkeypatch.setattr(UserRepository, "indexes", ("id", "email"))
+    sqlite_variant(UserRepository)(mock_file_manager, mock_encryption_manager).add(
+        User(id="u1", name="Ana", email="ana@example.com", password="secret", career="ISC")
+    )
+    monkeypatch.undo()
+    monkeypatch.setattr("app.repository.sqlite_repository.sqlite_database", database)
+    SqliteRepository._schemas_ready.clear()
+
+    user_repository = sqlite_variant(UserRepository)(mock_file_manager, mock_encryption_manager)
+
+    assert [user.id for user in user_repository.find_page(career="ISC")[0]] == ["u1"]
+    emails = database.query('SELECT COUNT(*) FROM "users_index" WHERE attribute = \'email\'')[0][0]
+    assert emails == 1
+
+
+def test_transactions_and_reads_run_in_the_offload_pool(database, message_repository, monkeypatch):
+    """Test that opening the database, the transactions and the reads are offloaded when a pool is set."""
+    pool_threads = set()
+
+    def in_pool(func, *args):
+        result = []
+        # Un hilo nuevo por llamada, como los hilos nativos del pool de gevent
+        thread = threading.Thread(target=lambda: result.append(func(*args)))
+        thread.start()
+        thread.join()
+        pool_threads.add(thread.ident)
+        return result[0]
+
+    monkeypatch.setattr("app.utils.offload._executor", in_pool)
+    message = make_message("chat-1")
+
+    message_repository.add(message)
+
+    assert message_repository.find_by_id(message.id).id == message.id
+    assert pool_threads
+
+
+def test_data_version_changes_only_on_writes_of_other_instances(database, mock_file_manager, mock_encryption_manager):
+    """Test that data_version ignores the own writes, reported to listeners, but sees the others'."""
+    repository = sqlite_variant(MessageRepository)(mock_file_manager, mock_encryption_manager)
+    other = sqlite_variant(MessageRepository)(mock_file_manager, mock_encryption_manager)
+    version = repository.data_version()
+
+    repository.add(make_message("chat-1"))
+    assert repository.data_version() == version
+
+    other.add(make_message("chat-1"))
+    assert repository.data_version() != version
+
+
+def test_connections_are_reused_across_threads(database, message_repository, monkeypatch):
+    """Test that requests served by new threads (or greenlets) borrow pooled connections instead of opening one each."""
+    opened = []
+    open_connection = database._open
+    monkeypatch.setattr(database, "_open", lambda: opened.append(1) or open_connection())
+    message = message_repository.add(make_message("chat-1"))
+
+    for _ in range(5):
+        thread = threading.Thread(target=lambda: message_repository.find_by_id(message.id))
+        thread.start()
+        thread.join()
+
+    assert len(opened) <= 1
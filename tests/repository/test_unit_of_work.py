@@ -0,0 +1,83 @@
+import pytest
+import json
+from unittest.mock import MagicMock
+from app.repository.chat_repository import ChatRepository
+from app.repository.user_repository import UserRepository
+from app.repository.unit_of_work import UnitOfWork
+from app.infraestructure.file_service import FileManager
+from app.infraestructure.encription_service import EncryptionManager
+from app.domain.entities import Chat, DbFile
+from datetime import datetime
+import uuid
+
+@pytest.fixture
+def mock_file_manager():
+    """Mock for FileManager."""
+    return MagicMock(spec=FileManager)
+
+@pytest.fixture
+def mock_encryption_manager():
+    """Mock for EncryptionManager."""
+    return MagicMock(spec=EncryptionManager)
+
+@pytest.fixture
+def chat_repository(mock_file_manager, mock_encryption_manager):
+    return ChatRepository(mock_file_manager, mock_encryption_manager)
+
+@pytest.fixture
+def user_repository(mock_file_manager, mock_encryption_manager):
+    return UserRepository(mock_file_manager, mock_encryption_manager)
+
+@pytest.fixture
+def sample_chat():
+    return Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4()))
+
+def setup_mocks(mock_file_manager, mock_encryption_manager, files):
+    """Helper to serve each DbFile with its own data; the token is the file name."""
+    tokens = {file.name.encode(): json.dumps(data) for file, data in files.items()}
+    mock_file_manager.read_file.side_effect = lambda file: file.name.encode() if file in files else b''
+    mock_file_manager.write_file.return_value = True
+    mock_encryption_manager.decrypt_data.side_effect = lambda token: tokens[token]
+    mock_encryption_manager.encrypt_data.return_value = b'new_encrypted_data'
+
+def test_identity_map_returns_same_entity(chat_repository, mock_file_manager, mock_encryption_manager, sample_chat):
+    """Test that an entity is loaded once and the same object is returned afterwards."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {DbFile.CHATS: {"chats": [sample_chat.model_dump(mode='json')]}})
+    uow = UnitOfWork()
+
+    first = uow.get(chat_repository, sample_chat.id)
+    second = uow.get(chat_repository, sample_chat.id)
+
+    assert first is second
+    mock_file_manager.read_file.assert_called_once_with(DbFile.CHATS)
+
+def test_commit_writes_only_changed_repositories(chat_repository, user_repository, mock_file_manager, mock_encryption_manager, sample_chat):
+    """Test that only the files with new or modified entities are written, once each."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {
+        DbFile.CHATS: {"chats": [sample_chat.model_dump(mode='json')]},
+        DbFile.USERS: {"users": []},
+    })
+
+    with UnitOfWork() as uow:
+        chat = uow.get(chat_repository, sample_chat.id)
+        chat.last_message_at = datetime(2030, 1, 1)
+        uow.add(chat_repository, Chat(user_a=str(uuid.uuid4()), user_b=str(uuid.uuid4())))
+        assert uow.get(user_repository, str(uuid.uuid4())) is None
+        mock_file_manager.write_file.assert_not_called()
+
+    written = [call.args[0] for call in mock_file_manager.write_file.call_args_list]
+    assert written == [DbFile.CHATS]
+    saved = json.loads(mock_encryption_manager.encrypt_data.call_args[0][0])["chats"]
+    assert saved[0]["last_message_at"].startswith("2030-01-01")
+    assert len(saved) == 2
+
+def test_exception_discards_changes(chat_repository, mock_file_manager, mock_encryption_manager, sample_chat):
+    """Test that nothing is written when the block raises."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, {DbFile.CHATS: {"chats": [sample_chat.model_dump(mode='json')]}})
+
+    with pytest.raises(RuntimeError):
+        with UnitOfWork() as uow:
+            uow.get(chat_repository, sample_chat.id).last_message_at = datetime(2030, 1, 1)
+            raise RuntimeError("boom")
+
+    mock_file_manager.write_file.assert_not_called()
@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from app.repository.user_repository import UserRepository
 from app.infraestructure.file_service import FileManager
 from app.infraestructure.encription_service import EncryptionManager
+from app.infraestructure.snapshot_cache import SnapshotCache
 from app.domain.entities import User, DbFile
 
 @pytest.fixture
@@ -167,3 +168,105 @@ def test_delete_user(user_repository, mock_file_manager, mock_encryption_manager
     
     assert len(encrypted_payload_dict["users"]) == 1
     assert encrypted_payload_dict["users"][0]["id"] == "2"
+
+
+def test_find_by_id_reuses_cached_snapshot(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test that consecutive reads of an unchanged file decrypt it only once."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+    user_repository.snapshot_cache = SnapshotCache()
+    mock_file_manager.stat_file.return_value = (1, 100, 7)
+
+    assert user_repository.find_by_id("1") is not None
+    assert user_repository.find_by_id("2") is not None
+
+    mock_encryption_manager.decrypt_data.assert_called_once()
+    assert user_repository.snapshot_cache.stats()["hits"] == 1
+
+    # The file changed on disk: the snapshot must be read again
+    mock_file_manager.stat_file.return_value = (2, 120, 8)
+    user_repository.find_by_id("1")
+    assert mock_encryption_manager.decrypt_data.call_count == 2
+
+def test_loaded_users_skip_validation(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test that stored rows are hydrated as-is: passwords are not re-hashed and unknown fields are dropped."""
+    sample_users_data["users"][0]["tag_ids"] = ["tag-1"]
+    sample_users_data["users"][0]["date_of_birth"] = "2000-01-31"
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+
+    user = user_repository.find_by_id("1")
+    user.tag_ids.append("tag-2")
+
+    assert user.password == "hashed_password1"
+    assert user.date_of_birth.isoformat() == "2000-01-31"
+    assert not hasattr(user, "reputation")
+    assert user.avatar_url is None
+    # The list is a copy, the cached row is untouched
+    assert user_repository.find_by_id("1").tag_ids == ["tag-1"]
+
+def test_find_by_ids(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test finding several users by ID at once."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+
+    users = user_repository.find_by_ids(["2", "missing", "1", "2"])
+
+    assert list(users) == ["2", "1"]
+    assert users["1"].email == "test1@example.com"
+
+
+def test_change_listener_receives_written_ids(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test that change listeners are called with the IDs of the written users."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+    calls = []
+    user_repository.add_change_listener(calls.append)
+    try:
+        user = user_repository.find_by_id(sample_users_data["users"][0]["id"])
+        user.name = "Renamed"
+        user_repository.update(user)
+        user_repository.delete(sample_users_data["users"][1]["id"])
+    finally:
+        user_repository.remove_change_listener(calls.append)
+
+    assert calls == [{sample_users_data["users"][0]["id"]}, {sample_users_data["users"][1]["id"]}]
+
+
+
+def test_change_listener_is_not_called_when_the_write_fails(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test that listeners only hear about changes that reached the disk."""
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+    mock_file_manager.write_file.return_value = False
+    calls = []
+    user_repository.add_change_listener(calls.append)
+    try:
+        user = user_repository.find_by_id(sample_users_data["users"][0]["id"])
+        user.name = "Renamed"
+        user_repository.update(user)
+    finally:
+        user_repository.remove_change_listener(calls.append)
+
+    assert calls == []
+
+
+def test_find_page_projects_filters_and_pages(user_repository, mock_file_manager, mock_encryption_manager, sample_users_data):
+    """Test that a page of users is filtered, ordered by id and projected without building entities."""
+    sample_users_data["users"][0]["tag_ids"] = ["tag-1", "tag-2"]
+    sample_users_data["users"][1]["tag_ids"] = ["tag-1"]
+    setup_mocks(mock_file_manager, mock_encryption_manager, sample_users_data)
+
+    first, has_more = user_repository.find_page(tag_ids=["tag-1"], limit=1, fields=["id", "name", "career"])
+    second, last = user_repository.find_page(tag_ids=["tag-1"], after="1", limit=1, fields=["id", "name"])
+
+    assert first == [{"id": "1", "name": "Test User One", "career": None}] and has_more
+    assert second == [{"id": "2", "name": "Test User Two"}] and not last
+    assert user_repository.find_page(tag_ids=["tag-1", "tag-2"])[0][0].email == "test1@example.com"
+    assert [user.id for user in user_repository.find_page(is_active=False)[0]] == ["2"]
+
+def test_missing_file_is_cached(user_repository, mock_file_manager, mock_encryption_manager):
+    """Test that a missing users file is read once and keeps the same data version."""
+    mock_file_manager.stat_file.return_value = None
+    mock_file_manager.read_file.return_value = b""
+
+    version = user_repository.data_version()
+
+    assert user_repository.find_all() == []
+    assert user_repository.data_version() == version
+    mock_file_manager.read_file.assert_called_once()
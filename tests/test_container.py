@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+from app.container import Container, container, provide
+from app.repository.user_repository import UserRepository
+
+
+def test_instances_are_built_lazily_and_once():
+    test_container = Container()
+    factory = MagicMock(side_effect=lambda c: object())
+    test_container.register('thing', factory)
+
+    factory.assert_not_called()
+    assert test_container.thing is test_container.thing
+    factory.assert_called_once_with(test_container)
+
+
+def test_services_share_the_same_repositories():
+    assert container.user_service.user_repository is container.login_service.user_repository
+    assert container.chat_service.user_repository is container.presence_service.user_repository
+    assert container.post_service.tag_repository is container.user_service.tag_repository
+
+
+def test_override_rebuilds_dependents_and_restores_previous_instances():
+    original_service = container.tag_service
+    fake_repository = MagicMock()
+
+    with container.override(tag_repository=fake_repository):
+        assert container.tag_service.tag_repository is fake_repository
+        assert provide('tag_service').tag_repository is fake_repository
+
+    assert container.tag_service is original_service
+
+
+def test_change_listeners_are_removed_with_their_instances():
+    test_container = Container()
+    repository = UserRepository(MagicMock(), MagicMock())
+    listener = MagicMock()
+
+    def build_cache(c):
+        c.add_change_listener(c.user_repository, listener)
+        return object()
+
+    test_container.register('user_repository', lambda c: repository)
+    test_container.register('cache', build_cache)
+    listeners = UserRepository._change_listeners
+
+    test_container.cache
+    assert listener in listeners['users']
+    test_container.reset()
+    assert listener not in listeners['users']
+
+    with test_container.override(user_repository=repository):
+        test_container.cache
+        assert listener in listeners['users']
+    assert listener not in listeners['users']
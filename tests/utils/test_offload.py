@@ -0,0 +1,33 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.utils import offload
+from app.utils.offload import disable_offload, enable_offload, run_blocking
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Patches the executor with a native thread pool, like enable_offload does under gevent."""
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(func, *args):
+        return executor.submit(func, *args).result()
+
+    monkeypatch.setattr(offload, "_executor", submit)
+    yield executor
+    executor.shutdown()
+
+
+def test_run_blocking_dispatches_to_the_pool(pool):
+    """Test that blocking calls run in a pool thread once the executor is set."""
+    assert run_blocking(threading.get_ident) != threading.get_ident()
+    assert run_blocking(divmod, 7, 2) == (3, 1)
+
+
+def test_run_blocking_runs_inline_without_executor():
+    """Test that blocking calls run in the calling thread when offload is not enabled."""
+    enable_offload("threading", 4)
+
+    assert offload._executor is None
+    assert run_blocking(threading.get_ident) == threading.get_ident()
+    disable_offload()